@@ -1,51 +1,177 @@
 from django.contrib import admin
-from .models import Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from .models import (
+    Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta, MovimientoInventario, Tarea, VentaArchivada,
+    OrdenCompra, LineaOrdenCompra, PrecioHistorico,
+)
+from . import busqueda
+from .replicas import solo_lectura
+
+class ListadoEnReplicaAdmin(admin.ModelAdmin):
+    """El listado (GET) se lee de la réplica; las acciones y list_editable llegan por POST a la primaria"""
+
+    @method_decorator(solo_lectura)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
 
 @admin.register(Empleado)
-class EmpleadoAdmin(admin.ModelAdmin):
+class EmpleadoAdmin(ListadoEnReplicaAdmin):
     list_display = ['nombre', 'apellido', 'puesto', 'salario', 'fecha_contratacion']
     list_filter = ['puesto', 'fecha_contratacion']
     search_fields = ['nombre', 'apellido', 'puesto']
     list_per_page = 20
 
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
+class ClienteAdmin(ListadoEnReplicaAdmin):
     list_display = ['nombre', 'telefono', 'correo', 'fecha_compra', 'id_empleado', 'productos_comprados_display']
     list_filter = ['fecha_compra', 'id_empleado']
     search_fields = ['nombre', 'telefono', 'correo']
     list_per_page = 20
+    list_select_related = ['id_empleado', 'resumen']
     
     def productos_comprados_display(self, obj):
-        """Muestra los productos comprados por el cliente"""
+        """Muestra los productos comprados por el cliente (desde su resumen)"""
         return obj.productos_comprados_str()
     productos_comprados_display.short_description = 'Productos Comprados'
 
 @admin.register(Venta)
-class VentaAdmin(admin.ModelAdmin):
+class VentaAdmin(ListadoEnReplicaAdmin):
     list_display = ['id', 'fecha', 'total', 'id_cliente', 'id_empleado']
     list_filter = ['fecha', 'id_empleado']
     search_fields = ['id_cliente__nombre', 'id_empleado__nombre']
     list_per_page = 20
     date_hierarchy = 'fecha'
+    readonly_fields = ['total']  # Se mantiene a partir de los detalles
+    show_full_result_count = False  # Evita un segundo COUNT(*) de toda la tabla en cada página
 
 @admin.register(Proveedor)
-class ProveedorAdmin(admin.ModelAdmin):
+class ProveedorAdmin(ListadoEnReplicaAdmin):
     list_display = ['empresa', 'contacto', 'telefono', 'email', 'categoria']
     list_filter = ['categoria']
     search_fields = ['empresa', 'contacto', 'telefono', 'email', 'productos']
     list_per_page = 20
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Usa el índice de texto completo en lugar de LIKE '%...%' sobre cada campo"""
+        if not search_term.strip():
+            return queryset, False
+        return busqueda.filtrar(queryset, search_term), False
 
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
+class ProductoAdmin(ListadoEnReplicaAdmin):
     list_display = ['nombre', 'categoria', 'precio', 'proveedor', 'existencias']
     list_filter = ['categoria', 'proveedor']
     search_fields = ['nombre', 'categoria', 'descripcion', 'proveedor__empresa']
     list_per_page = 20
     list_editable = ['precio', 'existencias']
+    
+    def get_search_results(self, request, queryset, search_term):
+        """Usa el índice de texto completo en lugar de LIKE '%...%' sobre cada campo"""
+        if not search_term.strip():
+            return queryset, False
+        return busqueda.filtrar(queryset, search_term), False
 
 @admin.register(DetalleVenta)
-class DetalleVentaAdmin(admin.ModelAdmin):
+class DetalleVentaAdmin(ListadoEnReplicaAdmin):
     list_display = ['id', 'venta', 'producto', 'cantidad', 'precio_unitario', 'subtotal']
     list_filter = ['venta', 'producto']
     search_fields = ['venta__id', 'producto__nombre']
-    list_per_page = 20
\ No newline at end of file
+    list_per_page = 20
+    show_full_result_count = False  # Evita un segundo COUNT(*) de toda la tabla en cada página
+
+@admin.register(MovimientoInventario)
+class MovimientoInventarioAdmin(ListadoEnReplicaAdmin):
+    list_display = ['id', 'fecha', 'tipo', 'producto', 'cantidad', 'venta_id']
+    list_filter = ['tipo', 'fecha']
+    search_fields = ['producto__nombre']
+    list_per_page = 20
+    list_select_related = ['producto']
+    show_full_result_count = False
+
+    # El libro solo crece: los movimientos no se editan ni se borran a mano
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(PrecioHistorico)
+class PrecioHistoricoAdmin(ListadoEnReplicaAdmin):
+    list_display = ['id', 'fecha', 'producto', 'precio_anterior', 'precio', 'origen']
+    list_filter = ['origen', 'fecha']
+    search_fields = ['producto__nombre']
+    list_per_page = 20
+    list_select_related = ['producto']
+    date_hierarchy = 'fecha'
+    show_full_result_count = False
+
+    # El historial lo escriben las ediciones, importaciones y ajustes (precios.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(ListadoEnReplicaAdmin):
+    list_display = ['id', 'fecha', 'total', 'id_cliente', 'id_empleado', 'archivada']
+    list_filter = ['fecha', 'id_empleado']
+    search_fields = ['id_cliente__nombre', 'id_empleado__nombre']
+    list_per_page = 20
+    list_select_related = ['id_cliente', 'id_empleado']
+    date_hierarchy = 'fecha'
+    show_full_result_count = False
+
+    # El archivo es de consulta: se llena con archivar_ventas
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class LineaOrdenCompraInline(admin.TabularInline):
+    model = LineaOrdenCompra
+    extra = 0
+    raw_id_fields = ['producto']
+    readonly_fields = ['existencias', 'velocidad', 'punto_reorden']
+
+@admin.register(OrdenCompra)
+class OrdenCompraAdmin(ListadoEnReplicaAdmin):
+    list_display = ['id', 'proveedor', 'estado', 'creada']
+    list_filter = ['estado', 'proveedor']
+    list_per_page = 20
+    list_select_related = ['proveedor']
+    inlines = [LineaOrdenCompraInline]
+
+# El estado de las tareas cambia a cada momento: se lee de la primaria
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'nombre', 'estado', 'progreso', 'intentos', 'creada', 'terminada', 'trabajador']
+    list_filter = ['estado', 'nombre']
+    list_per_page = 20
+    show_full_result_count = False
+    readonly_fields = [
+        'nombre', 'argumentos', 'intentos', 'progreso', 'mensaje', 'resultado', 'error',
+        'creada', 'iniciada', 'terminada', 'trabajador', 'latido',
+    ]
+    actions = ['reintentar']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Reintentar las tareas fallidas seleccionadas')
+    def reintentar(self, request, queryset):
+        reintentadas = queryset.filter(estado=Tarea.FALLIDA).update(
+            estado=Tarea.PENDIENTE, intentos=0, disponible_desde=timezone.now(), terminada=None, mensaje='',
+        )
+        self.message_user(request, f'{reintentadas} tareas devueltas a la cola.')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AppAbarrotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_Abarrotes'
+
+    def ready(self):
+        from . import signals, trabajos  # noqa: F401
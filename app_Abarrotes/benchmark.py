@@ -0,0 +1,426 @@
+"""
+Banco de pruebas de las vistas: recorre cada ruta GET de la app y el flujo
+de cobro (agregar_venta) con el cliente de pruebas de Django sobre la base
+configurada y reporta latencia p50/p95, consultas y memoria pico en JSON.
+Las escrituras del cobro se revierten, así que la base no cambia.
+
+concurrencia() corre las vistas de solo lectura bajo WSGI (hilos) y ASGI
+(vistas asíncronas) con muchos clientes lentos a la vez y reporta latencias
+e hilos ocupados. No mide throughput: la lentitud del cliente se simula y no
+pasa por sockets (ver la sección MODELO WSGI VS ASGI).
+"""
+import asyncio
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from time import perf_counter
+
+import django
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import urls, views_async
+from .models import Cliente, DetalleVenta, Empleado, Producto, Proveedor, Tarea, Venta
+
+# Modelo del que se toma el pk para las rutas con <int:pk>, según el sufijo del nombre
+_ENTIDADES = {
+    'empleado': Empleado,
+    'cliente': Cliente,
+    'venta': Venta,
+    'proveedor': Proveedor,
+    'producto': Producto,
+    'tarea': Tarea,
+}
+
+
+class _Revertir(Exception):
+    pass
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista no vacía"""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def _rutas():
+    """(nombre, url) de cada ruta GET de la app con argumentos tomados de la base"""
+    venta = Venta.objects.filter(detalles__isnull=False).order_by('-pk').first()
+    palabra = (Producto.objects.order_by('pk').values_list('nombre', flat=True).first() or 'a').split()[0]
+    rutas = []
+    for patron in urls.urlpatterns:
+        nombre = patron.name
+        if '<int:pk>' in str(patron.pattern):
+            modelo = _ENTIDADES[nombre.rsplit('_', 1)[-1]]
+            objeto = venta if modelo is Venta else modelo.objects.order_by('pk').first()
+            if objeto is None:
+                continue
+            rutas.append((nombre, reverse(nombre, args=[objeto.pk])))
+        elif nombre.startswith(('buscar', 'consultar')):
+            rutas.append((nombre, f'{reverse(nombre)}?q={palabra}'))
+        elif nombre == 'exportar_ventas':
+            # Solo el último día: exportar toda la historia mide el disco, no la vista
+            rutas.append((nombre, f'{reverse(nombre)}?desde={timezone.localdate().isoformat()}'))
+        else:
+            rutas.append((nombre, reverse(nombre)))
+    return rutas
+
+
+def _datos_cobro(n_productos):
+    productos = list(Producto.objects.filter(existencias__gte=100).order_by('pk').values_list('pk', 'precio')[:n_productos])
+    return {
+        'id_cliente': Cliente.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'id_empleado': Empleado.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'total': '0',
+        'producto': [pk for pk, _ in productos],
+        'cantidad': ['1'] * len(productos),
+        'precio': [str(precio) for _, precio in productos],
+    }
+
+
+def _peticion(cliente, metodo, url, datos=None):
+    """Hace la petición y devuelve (segundos, consultas, status)"""
+    inicio = perf_counter()
+    response = getattr(cliente, metodo)(url, datos) if datos is not None else getattr(cliente, metodo)(url)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    segundos = perf_counter() - inicio
+    medicion = getattr(response.wsgi_request, 'medicion', None)
+    return segundos, (medicion.consultas if medicion else None), response.status_code
+
+
+def _medir(cliente, metodo, url, datos, repeticiones, calentamiento, revertir):
+    def una_vez():
+        if not revertir:
+            return _peticion(cliente, metodo, url, datos)
+        # El cobro escribe: se ejecuta dentro de una transacción que se revierte
+        resultado = None
+        try:
+            with transaction.atomic():
+                resultado = _peticion(cliente, metodo, url, datos)
+                raise _Revertir
+        except _Revertir:
+            pass
+        return resultado
+
+    for _ in range(calentamiento):
+        una_vez()
+    tiempos = []
+    consultas = status = None
+    for _ in range(repeticiones):
+        segundos, consultas, status = una_vez()
+        tiempos.append(segundos * 1000)
+
+    tracemalloc.start()
+    try:
+        una_vez()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': status,
+        'p50_ms': round(percentil(tiempos, 50), 2),
+        'p95_ms': round(percentil(tiempos, 95), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas': consultas,
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def _entorno():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base_de_datos': connection.vendor,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar(repeticiones=20, calentamiento=2, productos_por_cobro=(1, 10), filtro=None, progreso=None):
+    """Corre el banco completo y devuelve el reporte como diccionario"""
+    progreso = progreso or (lambda mensaje: None)
+    # localhost está permitido con DEBUG aunque ALLOWED_HOSTS esté vacío
+    cliente = Client(HTTP_HOST='localhost')
+    casos = [(nombre, 'get', url, None, False) for nombre, url in _rutas()]
+    for n in productos_por_cobro:
+        casos.append((f'cobro_{n}_productos', 'post', reverse('agregar_venta'), _datos_cobro(n), True))
+
+    resultados = {}
+    for nombre, metodo, url, datos, revertir in casos:
+        if filtro and filtro not in nombre:
+            continue
+        resultados[nombre] = {'url': url, **_medir(cliente, metodo, url, datos, repeticiones, calentamiento, revertir)}
+        progreso(f'{nombre}: p50 {resultados[nombre]["p50_ms"]} ms, {resultados[nombre]["consultas"]} consultas')
+
+    return {
+        'commit': _commit(),
+        'fecha': timezone.now().isoformat(),
+        'entorno': _entorno(),
+        'repeticiones': repeticiones,
+        'volumen': {
+            modelo._meta.model_name: modelo.objects.count()
+            for modelo in (Empleado, Proveedor, Producto, Cliente, Venta, DetalleVenta)
+        },
+        'rutas': resultados,
+    }
+
+
+def comparar(anterior, actual, umbral=0.10):
+    """
+    Líneas legibles con las diferencias entre dos reportes: cambios de
+    consultas y variaciones de p50/p95 mayores que `umbral` (proporción).
+    """
+    lineas = []
+    for nombre, ahora in actual['rutas'].items():
+        antes = anterior.get('rutas', {}).get(nombre)
+        if antes is None:
+            lineas.append(f'{nombre}: nueva')
+            continue
+        if antes.get('consultas') != ahora.get('consultas'):
+            lineas.append(f'{nombre}: consultas {antes.get("consultas")} -> {ahora.get("consultas")}')
+        for metrica in ('p50_ms', 'p95_ms'):
+            previo, nuevo = antes.get(metrica), ahora.get(metrica)
+            if previo and nuevo and abs(nuevo - previo) / previo > umbral:
+                lineas.append(f'{nombre}: {metrica} {previo} -> {nuevo} ({(nuevo - previo) / previo:+.0%})')
+    return lineas
+
+
+def guardar(reporte, ruta):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+
+# ========== MODELO WSGI VS ASGI ==========
+# Cada cliente hace una petición a la vez (la siguiente cuando terminó de
+# recibir la anterior). Un cliente lento tarda `espera_cliente` segundos en
+# recibir la respuesta: bajo WSGI se modela con time.sleep en el hilo que la
+# atiende y bajo ASGI con asyncio.sleep en el bucle de eventos. Todo corre en
+# este proceso, sin sockets ni servidor HTTP, así que la ventaja de ASGI con
+# clientes lentos es un supuesto del modelo y no algo que se mida. Lo que sí
+# sale de ejecutar las vistas es su costo: el modelo sirve para ver cuánto
+# pesa ese costo frente a la espera, no para comparar despliegues reales,
+# y por eso no reporta peticiones por segundo ni una razón entre los modos.
+# Para eso hay que medir con un servidor de verdad (gunicorn vs uvicorn, por
+# ejemplo) y clientes que lean despacio del socket.
+
+def rutas_de_lectura():
+    """(nombre, url) de las rutas que tienen versión asíncrona"""
+    asincronas = {patron.name for patron in urls.patrones(views_async) if iscoroutinefunction(patron.callback)}
+    return [(nombre, url) for nombre, url in _rutas() if nombre in asincronas]
+
+
+def _environ(url):
+    ruta, _, query = url.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': ruta,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _scope(url):
+    ruta, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': ruta,
+        'raw_path': ruta.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+
+
+class _Medidas:
+    """Latencias, errores y máximo de hilos del servidor de una corrida concurrente"""
+
+    def __init__(self, hilos_simulacion=0):
+        self._lock = threading.Lock()
+        self.latencias = []
+        self.errores = 0
+        # Los hilos que ya existían y los que simulan clientes no cuentan
+        self._hilos_base = threading.active_count() + hilos_simulacion
+        self.hilos_max = 0
+
+    def registrar(self, segundos, status):
+        with self._lock:
+            self.latencias.append(segundos * 1000)
+            self.errores += status != 200
+            self.hilos_max = max(self.hilos_max, threading.active_count() - self._hilos_base)
+
+    def resumen(self):
+        return {
+            'peticiones': len(self.latencias),
+            'errores': self.errores,
+            'p50_ms': round(percentil(self.latencias, 50), 1),
+            'p95_ms': round(percentil(self.latencias, 95), 1),
+            'max_ms': round(max(self.latencias), 1),
+            'hilos_servidor_max': self.hilos_max,
+        }
+
+
+def medir_wsgi(lista_urls, clientes, hilos, espera_cliente):
+    """Atiende `lista_urls` con `hilos` hilos de WSGI (como gunicorn --threads) y `clientes` a la vez"""
+    aplicacion = get_wsgi_application()
+    medidas = _Medidas(hilos_simulacion=clientes)
+    pendientes = queue.SimpleQueue()
+    for url in lista_urls:
+        pendientes.put(url)
+
+    def atender(url):
+        estado = []
+        respuesta = aplicacion(_environ(url), lambda status, headers, exc_info=None: estado.append(status))
+        try:
+            for _ in respuesta:
+                pass
+            # El hilo queda ocupado mientras el cliente lento recibe la respuesta
+            time.sleep(espera_cliente)
+        finally:
+            respuesta.close()
+        return int(estado[0].split()[0])
+
+    def cliente(trabajadores):
+        while True:
+            try:
+                url = pendientes.get_nowait()
+            except queue.Empty:
+                return
+            inicio = perf_counter()
+            status = trabajadores.submit(atender, url).result()
+            medidas.registrar(perf_counter() - inicio, status)
+
+    with ThreadPoolExecutor(hilos) as trabajadores, ThreadPoolExecutor(clientes) as simulados:
+        for futuro in [simulados.submit(cliente, trabajadores) for _ in range(clientes)]:
+            futuro.result()
+    return medidas.resumen()
+
+
+def medir_asgi(lista_urls, clientes, espera_cliente):
+    """Atiende `lista_urls` con el handler ASGI en un solo bucle de eventos y `clientes` a la vez"""
+    aplicacion = get_asgi_application()
+    medidas = _Medidas()
+    pendientes = list(reversed(lista_urls))
+
+    async def atender(url):
+        estado = []
+        cuerpo_enviado = False
+
+        async def receive():
+            nonlocal cuerpo_enviado
+            if not cuerpo_enviado:
+                cuerpo_enviado = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # El cliente no se desconecta: Django cancela esta espera al terminar
+            await asyncio.Future()
+
+        async def send(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                estado.append(mensaje['status'])
+            elif not mensaje.get('more_body'):
+                # El envío al cliente lento se espera sin ocupar un hilo
+                await asyncio.sleep(espera_cliente)
+
+        await aplicacion(_scope(url), receive, send)
+        return estado[0]
+
+    async def cliente():
+        while pendientes:
+            url = pendientes.pop()
+            inicio = perf_counter()
+            status = await atender(url)
+            medidas.registrar(perf_counter() - inicio, status)
+
+    async def todos():
+        await asyncio.gather(*(cliente() for _ in range(clientes)))
+
+    asyncio.run(todos())
+    return medidas.resumen()
+
+
+def concurrencia(modo, clientes=100, peticiones=500, hilos=8, espera_cliente=0.25, cache=False):
+    """
+    Corre el modelo concurrente en `modo` ('wsgi' o 'asgi') sobre las rutas
+    de lectura, repartiendo `peticiones` entre ellas por turnos. Sin `cache`
+    se desactiva la caché de páginas para medir las vistas y no la caché.
+    Las vistas que se usan son las de settings.VISTAS_ASYNC: el comando
+    benchmark_concurrencia corre cada modo en su propio proceso.
+    """
+    rutas = rutas_de_lectura()
+    lista_urls = [rutas[i % len(rutas)][1] for i in range(peticiones)]
+    config = dict(getattr(settings, 'CACHE_RESPUESTAS', {}))
+    if not cache:
+        config['ACTIVO'] = False
+    # Las conexiones de este hilo no se usan durante la medición
+    connection.close()
+    with override_settings(CACHE_RESPUESTAS=config):
+        if modo == 'wsgi':
+            resultado = medir_wsgi(lista_urls, clientes, hilos, espera_cliente)
+        else:
+            resultado = medir_asgi(lista_urls, clientes, espera_cliente)
+    return {
+        'modo': modo,
+        'vistas_async': settings.VISTAS_ASYNC,
+        'rutas': [nombre for nombre, _ in rutas],
+        **resultado,
+    }
+
+
+def reporte_concurrencia(modos, parametros):
+    """Reporte de benchmark_concurrencia con los resultados de cada modo"""
+    return {
+        'tipo': 'modelo',
+        'advertencia': (
+            'La espera de los clientes lentos se simula (time.sleep en WSGI, asyncio.sleep en ASGI) '
+            'sin sockets: las latencias la incluyen y no sirven para comparar el throughput de los despliegues.'
+        ),
+        'commit': _commit(),
+        'fecha': timezone.now().isoformat(),
+        'entorno': _entorno(),
+        'parametros': parametros,
+        'modos': modos,
+    }
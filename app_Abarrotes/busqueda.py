@@ -0,0 +1,94 @@
+import re
+
+from django.db import connection, connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Producto, Proveedor
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+
+# Tabla FTS5, pesos bm25 por columna y campos del respaldo icontains de cada modelo
+_INDICES = {
+    Producto: ('busqueda_producto', (10.0, 3.0, 1.0, 2.0), ['nombre', 'categoria', 'descripcion', 'proveedor__empresa']),
+    Proveedor: (
+        'busqueda_proveedor', (10.0, 4.0, 2.0, 1.0, 1.0, 1.0),
+        ['empresa', 'contacto', 'categoria', 'productos', 'telefono', 'email'],
+    ),
+}
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_disponible():
+    """La búsqueda de texto completo solo existe en SQLite (ver migración 0007)"""
+    return connection.vendor == 'sqlite'
+
+
+def expresion_fts(texto):
+    """
+    Convierte lo que escribe el usuario en una consulta FTS5 segura: cada
+    palabra se busca como prefijo y todas deben aparecer ("azu blan" ->
+    "azu"* "blan"*). Devuelve None si no queda ninguna palabra.
+    """
+    palabras = _PALABRA.findall(texto or '')
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def filtrar(queryset, texto):
+    """Filtra un queryset de Producto o Proveedor por el texto buscado, sin ordenar por relevancia"""
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return queryset.none()
+
+    tabla, _, campos = _INDICES[queryset.model]
+    if fts_disponible():
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s', [expresion]
+        ))
+
+    condicion = Q()
+    for palabra in _PALABRA.findall(texto):
+        condicion &= Q(*[Q(**{f'{campo}__icontains': palabra}) for campo in campos], _connector=Q.OR)
+    return queryset.filter(condicion)
+
+
+def buscar(modelo, texto, limite=LIMITE_POR_DEFECTO):
+    """Devuelve hasta `limite` instancias de `modelo` ordenadas por relevancia"""
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return []
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    tabla, pesos, campos = _INDICES[modelo]
+
+    if not fts_disponible():
+        # Respaldo: primero los que empiezan con el texto, luego el resto
+        principal = campos[0]
+        return list(
+            filtrar(modelo.objects.all(), texto)
+            .annotate(_prioridad=Case(
+                When(**{f'{principal}__istartswith': texto.strip()}, then=Value(0)),
+                default=Value(1), output_field=IntegerField(),
+            ))
+            .order_by('_prioridad', principal, 'pk')[:limite]
+        )
+
+    # El índice y las filas se leen de la misma base (réplica o primaria)
+    alias = router.db_for_read(modelo)
+    with connections[alias].cursor() as cursor:
+        # `rank` con la función bm25 ponderada: FTS5 ordena todas las
+        # coincidencias y SQLite conserva solo las `limite` mejores
+        cursor.execute(
+            f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s AND rank MATCH %s ORDER BY rank LIMIT %s',
+            [expresion, f'bm25({", ".join(str(p) for p in pesos)})', limite],
+        )
+        ids = [fila[0] for fila in cursor.fetchall()]
+
+    queryset = modelo.objects.using(alias)
+    if modelo is Producto:
+        queryset = queryset.select_related('proveedor')
+    encontrados = queryset.in_bulk(ids)
+    return [encontrados[pk] for pk in ids if pk in encontrados]
@@ -0,0 +1,294 @@
+"""
+Caché de respuestas completas para páginas que se leen mucho más de lo que
+cambian sus tablas. La clave de cada página incluye la versión de los
+modelos de los que depende; guardar o borrar una instancia de esos modelos
+(señales post_save/post_delete, o invalidar() desde escrituras masivas)
+cambia la versión al confirmar la transacción, así que la página se sigue
+sirviendo de la caché hasta la siguiente escritura relevante.
+
+Se configura en settings.CACHE_RESPUESTAS (ver CONFIGURACION_POR_DEFECTO);
+el alias de caché debe ser compartido entre procesos si hay varios workers.
+"""
+import hashlib
+import threading
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import replicas
+
+CONFIGURACION_POR_DEFECTO = {
+    'ACTIVO': True,
+    # Alias de settings.CACHES donde se guardan páginas y versiones
+    'ALIAS': 'default',
+    # Segundos que vive una página aunque no haya escrituras
+    'TIMEOUT': 300,
+    # Segundos que vive un fragmento (su clave ya cambia con el objeto)
+    'TIMEOUT_FRAGMENTOS': 24 * 60 * 60,
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'CACHE_RESPUESTAS', {})}
+
+
+def _cache():
+    return caches[configuracion()['ALIAS']]
+
+
+class _Estadisticas:
+    """Aciertos y fallos por vista e invalidaciones por modelo desde que arrancó el proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = {}
+        self._invalidaciones = {}
+
+    def registrar(self, vista, acierto, veces=1):
+        with self._lock:
+            fila = self._vistas.setdefault(vista, {'aciertos': 0, 'fallos': 0})
+            fila['aciertos' if acierto else 'fallos'] += veces
+
+    def invalidado(self, modelo):
+        with self._lock:
+            self._invalidaciones[modelo] = self._invalidaciones.get(modelo, 0) + 1
+
+    def resumen(self):
+        with self._lock:
+            vistas = {}
+            for vista, fila in self._vistas.items():
+                total = fila['aciertos'] + fila['fallos']
+                vistas[vista] = {**fila, 'proporcion_aciertos': round(fila['aciertos'] / total, 3) if total else None}
+            return {'vistas': vistas, 'invalidaciones': dict(self._invalidaciones)}
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas.clear()
+            self._invalidaciones.clear()
+
+
+estadisticas = _Estadisticas()
+
+
+# ========== VERSIONES POR MODELO ==========
+def _clave_version(modelo):
+    return f'version:{modelo._meta.label_lower}'
+
+
+# Cambia con cada refresco de la réplica de lectura
+_CLAVE_VERSION_REPLICA = 'version:replica'
+
+
+def _claves_version(modelos, replica):
+    claves = [_clave_version(modelo) for modelo in modelos]
+    return claves + [_CLAVE_VERSION_REPLICA] if replica else claves
+
+
+def versiones(modelos, replica=False):
+    """
+    Versión actual de cada modelo. Una versión es un valor nuevo y único en
+    cada invalidación (no un incremento), así dos procesos que invalidan a la
+    vez sobre una caché en archivos no pueden terminar con el mismo valor.
+    Con `replica` se agrega la versión de la réplica de lectura.
+    """
+    cache = _cache()
+    claves = _claves_version(modelos, replica)
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            cache.add(clave, uuid.uuid4().hex, timeout=None)
+            actuales[clave] = cache.get(clave)
+    return [actuales[clave] for clave in claves]
+
+
+async def aversiones(modelos, replica=False):
+    """versiones() con la API asíncrona de la caché"""
+    cache = _cache()
+    claves = _claves_version(modelos, replica)
+    actuales = await cache.aget_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            await cache.aadd(clave, uuid.uuid4().hex, timeout=None)
+            actuales[clave] = await cache.aget(clave)
+    return [actuales[clave] for clave in claves]
+
+
+def _cambiar_versiones(modelos):
+    _cache().set_many({_clave_version(modelo): uuid.uuid4().hex for modelo in modelos}, timeout=None)
+    for modelo in modelos:
+        estadisticas.invalidado(modelo._meta.label_lower)
+
+
+def invalidar(*modelos):
+    """
+    Invalida las páginas que dependen de los modelos al confirmar la
+    transacción en curso: antes, una petición concurrente todavía leería los
+    datos viejos y los guardaría con la versión nueva.
+    """
+    transaction.on_commit(lambda: _cambiar_versiones(modelos))
+
+
+def invalidar_replica():
+    """
+    Invalida las páginas leídas de la réplica. Una página que se renderizó
+    después de una escritura pero antes del refresco tiene ya la versión
+    nueva del modelo con los datos viejos de la réplica.
+    """
+    _cache().set(_CLAVE_VERSION_REPLICA, uuid.uuid4().hex, timeout=None)
+    estadisticas.invalidado('replica')
+
+
+# ========== DECORADOR DE VISTAS ==========
+def _clave_respuesta(nombre, request, versiones_actuales):
+    ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'respuesta:{nombre}:{ruta}:{"-".join(versiones_actuales)}'
+
+
+def _guardable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def cache_por_version(*modelos):
+    """
+    Sirve la vista desde la caché mientras no cambien los modelos indicados.
+    Solo se guardan respuestas 200 a GET/HEAD, no streaming y sin cookies.
+    Funciona igual con vistas asíncronas (usa la API asíncrona de la caché).
+    Con @replicas.solo_lectura debe ir debajo de él, para saber si la
+    página se lee de la réplica.
+    """
+    def decorador(vista):
+        nombre = vista.__name__
+
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_async(request, *args, **kwargs):
+                config = configuracion()
+                if not config['ACTIVO'] or request.method not in ('GET', 'HEAD'):
+                    return await vista(request, *args, **kwargs)
+
+                cache = _cache()
+                clave = _clave_respuesta(nombre, request, await aversiones(modelos, replicas.leyendo_de_replica()))
+                response = await cache.aget(clave)
+                if response is not None:
+                    estadisticas.registrar(nombre, acierto=True)
+                    response['X-Cache'] = 'HIT'
+                    return response
+
+                estadisticas.registrar(nombre, acierto=False)
+                response = await vista(request, *args, **kwargs)
+                if _guardable(response):
+                    await cache.aset(clave, response, config['TIMEOUT'])
+                response['X-Cache'] = 'MISS'
+                return response
+
+            return envoltura_async
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            config = configuracion()
+            if not config['ACTIVO'] or request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+
+            cache = _cache()
+            # La versión se lee antes de consultar la base: si cambia durante
+            # el render la página queda guardada bajo una versión ya vieja
+            clave = _clave_respuesta(nombre, request, versiones(modelos, replicas.leyendo_de_replica()))
+            response = cache.get(clave)
+            if response is not None:
+                estadisticas.registrar(nombre, acierto=True)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            estadisticas.registrar(nombre, acierto=False)
+            response = vista(request, *args, **kwargs)
+            if _guardable(response):
+                cache.set(clave, response, config['TIMEOUT'])
+            response['X-Cache'] = 'MISS'
+            return response
+
+        return envoltura
+    return decorador
+
+
+# ========== FRAGMENTOS POR OBJETO ==========
+def fragmentos(objetos, plantilla, clave, nombre='objeto', modelos=(), preparar=None, contexto=None):
+    """
+    HTML de `plantilla` renderizada para cada objeto (en el contexto como
+    `nombre`), en el mismo orden, leyendo de la caché los que ya estén. `clave(objeto)` debe cambiar
+    cuando cambia lo que se muestra del objeto (p. ej. pk y fecha de
+    modificación); los `modelos` agregan su versión a todas las claves.
+    `preparar(faltantes)` carga solo para los objetos sin caché lo que la
+    plantilla necesita (p. ej. prefetch_related_objects).
+    """
+    objetos = list(objetos)
+    contexto = contexto or {}
+
+    def renderizar(lista):
+        if preparar and lista:
+            preparar(lista)
+        return _renderizar(plantilla, nombre, contexto, lista)
+
+    config = configuracion()
+    if not config['ACTIVO']:
+        return renderizar(objetos)
+
+    cache = _cache()
+    claves = _claves_fragmentos(plantilla, clave, objetos, versiones(modelos))
+    guardados = cache.get_many(claves)
+    faltantes = _faltantes(plantilla, claves, objetos, guardados)
+    if faltantes:
+        nuevos = dict(zip((c for c, _ in faltantes), renderizar([objeto for _, objeto in faltantes])))
+        cache.set_many(nuevos, config['TIMEOUT_FRAGMENTOS'])
+        guardados.update(nuevos)
+    return [mark_safe(guardados[c]) for c in claves]
+
+
+async def afragmentos(objetos, plantilla, clave, nombre='objeto', modelos=(), preparar=None, contexto=None):
+    """
+    fragmentos() para vistas asíncronas: `preparar` es una corrutina (p. ej.
+    aprefetch_related_objects) y la caché se usa con su API asíncrona.
+    """
+    objetos = list(objetos)
+    contexto = contexto or {}
+
+    async def renderizar(lista):
+        if preparar and lista:
+            await preparar(lista)
+        return _renderizar(plantilla, nombre, contexto, lista)
+
+    config = configuracion()
+    if not config['ACTIVO']:
+        return await renderizar(objetos)
+
+    cache = _cache()
+    claves = _claves_fragmentos(plantilla, clave, objetos, await aversiones(modelos))
+    guardados = await cache.aget_many(claves)
+    faltantes = _faltantes(plantilla, claves, objetos, guardados)
+    if faltantes:
+        nuevos = dict(zip((c for c, _ in faltantes), await renderizar([objeto for _, objeto in faltantes])))
+        await cache.aset_many(nuevos, config['TIMEOUT_FRAGMENTOS'])
+        guardados.update(nuevos)
+    return [mark_safe(guardados[c]) for c in claves]
+
+
+def _renderizar(plantilla, nombre, contexto, lista):
+    return [render_to_string(plantilla, {**contexto, nombre: objeto}) for objeto in lista]
+
+
+def _claves_fragmentos(plantilla, clave, objetos, versiones_actuales):
+    version = '-'.join(versiones_actuales)
+    return [f'fragmento:{plantilla}:{clave(objeto)}:{version}' for objeto in objetos]
+
+
+def _faltantes(plantilla, claves, objetos, guardados):
+    """(clave, objeto) sin caché; registra aciertos y fallos"""
+    faltantes = [(c, objeto) for c, objeto in zip(claves, objetos) if c not in guardados]
+    estadisticas.registrar(f'fragmento:{plantilla}', acierto=True, veces=len(objetos) - len(faltantes))
+    estadisticas.registrar(f'fragmento:{plantilla}', acierto=False, veces=len(faltantes))
+    return faltantes
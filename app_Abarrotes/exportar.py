@@ -0,0 +1,127 @@
+import csv
+import heapq
+import io
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Venta, VentaArchivada
+
+# Filas que trae la base por cada viaje del cursor
+FILAS_POR_LECTURA = 2000
+# Tamaño aproximado (en caracteres) de cada trozo que se entrega al cliente
+TAMANO_TROZO = 64 * 1024
+
+FORMATOS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+}
+
+COLUMNAS = [
+    'venta_id', 'fecha', 'cliente_id', 'cliente', 'empleado_id', 'empleado', 'total_venta',
+    'producto_id', 'producto', 'categoria', 'cantidad', 'precio_unitario', 'subtotal',
+]
+
+_CAMPOS = [
+    'id', 'fecha', 'id_cliente_id', 'id_cliente__nombre', 'id_empleado_id',
+    'id_empleado__nombre', 'id_empleado__apellido', 'total',
+    'detalles__producto_id', 'detalles__producto__nombre', 'detalles__producto__categoria',
+    'detalles__cantidad', 'detalles__precio_unitario', 'detalles__subtotal',
+]
+
+
+def filas_ventas(ventas):
+    """
+    Recorre las ventas con sus líneas como filas planas (una por detalle,
+    o una sola con los campos de detalle vacíos si la venta no tiene líneas).
+    Usa un cursor por trozos, así que nunca se carga el resultado completo.
+    """
+    consulta = (
+        ventas.order_by('fecha', 'id', 'detalles__id')
+        .values_list(*_CAMPOS)
+        .iterator(chunk_size=FILAS_POR_LECTURA)
+    )
+    for (venta_id, fecha, cliente_id, cliente, empleado_id, nombre, apellido, total,
+         producto_id, producto, categoria, cantidad, precio, subtotal) in consulta:
+        yield (
+            venta_id, fecha, cliente_id, cliente, empleado_id, f'{nombre} {apellido}', total,
+            producto_id, producto, categoria, cantidad, precio, subtotal,
+        )
+
+
+class _Buffer:
+    """Pseudo-archivo para csv.writer: devuelve lo escrito en lugar de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(filas):
+    escritor = csv.writer(_Buffer())
+    yield escritor.writerow(COLUMNAS)
+    for fila in filas:
+        yield escritor.writerow(
+            [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in fila]
+        )
+
+
+def _json(filas):
+    """Arreglo JSON de ventas, cada una con su lista de líneas"""
+    yield '['
+    actual = None
+    primera = True
+    for fila in filas:
+        venta = dict(zip(COLUMNAS[:7], fila[:7]))
+        if actual is None or actual['venta_id'] != venta['venta_id']:
+            if actual is not None:
+                yield ('' if primera else ',') + json.dumps(actual, cls=DjangoJSONEncoder)
+                primera = False
+            actual = {**venta, 'lineas': []}
+        if fila[7] is not None:
+            actual['lineas'].append(dict(zip(COLUMNAS[7:], fila[7:])))
+    if actual is not None:
+        yield ('' if primera else ',') + json.dumps(actual, cls=DjangoJSONEncoder)
+    yield ']'
+
+
+def _agrupar(partes):
+    """Junta las partes pequeñas en trozos de ~TAMANO_TROZO para no emitir una escritura por fila"""
+    buffer = io.StringIO()
+    for parte in partes:
+        buffer.write(parte)
+        if buffer.tell() >= TAMANO_TROZO:
+            yield buffer.getvalue()
+            buffer = io.StringIO()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _comprimir(trozos):
+    compresor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # formato gzip
+    for trozo in trozos:
+        datos = compresor.compress(trozo)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def exportar_ventas(ventas=None, formato='csv', comprimir=False, archivadas=None):
+    """
+    Generador con la exportación de `ventas` (por defecto todas) en `formato`
+    ('csv' o 'json'), en trozos de bytes, opcionalmente comprimidos con gzip.
+    Las `archivadas` (queryset de VentaArchivada, p. ej. de historico.ambas())
+    se intercalan por fecha con las activas. La memoria usada no depende del
+    número de ventas.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato no soportado: {formato}')
+    if ventas is None:
+        ventas, archivadas = Venta.objects.all(), VentaArchivada.objects.all()
+    filas = filas_ventas(ventas)
+    if archivadas is not None:
+        # Las dos consultas ya vienen ordenadas por fecha e id
+        filas = heapq.merge(filas_ventas(archivadas), filas, key=lambda fila: (fila[1], fila[0]))
+    partes = _csv(filas) if formato == 'csv' else _json(filas)
+    trozos = (trozo.encode('utf-8') for trozo in _agrupar(partes))
+    return _comprimir(trozos) if comprimir else trozos
@@ -1,5 +1,11 @@
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
 from django import forms
-from .models import Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta
+from django.utils import timezone
+from .exportar import FORMATOS
+from .models import Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta, Tarea
+from .precios import REDONDEOS
 
 class EmpleadoForm(forms.ModelForm):
     class Meta:
@@ -83,4 +89,189 @@ class ProductoForm(forms.ModelForm):
         labels = {
             'proveedor': 'Proveedor',
             'existencias': 'Existencias en Inventario',
-        }
\ No newline at end of file
+        }
+
+# ========== FILTROS DE LISTADOS ==========
+class FiltroListaForm(forms.Form):
+    """Base de los filtros de listados: tamaño de página y filtrado del queryset"""
+    tamano = forms.TypedChoiceField(
+        choices=[(10, '10'), (25, '25'), (50, '50'), (100, '100')],
+        coerce=int, required=False, label='Por página',
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            clase = 'form-select' if isinstance(field.widget, forms.Select) else 'form-control'
+            field.widget.attrs.setdefault('class', f'{clase} form-control-sm')
+
+    def filtrar(self, queryset):
+        if not self.is_bound:
+            return queryset
+        self.is_valid()
+        # Los campos con errores simplemente no se aplican
+        datos = {campo: valor for campo, valor in self.cleaned_data.items() if valor not in (None, '')}
+        return self.aplicar(queryset, datos)
+
+    async def afiltrar(self, queryset):
+        """
+        filtrar() para vistas asíncronas. Carga antes las opciones de los
+        campos con modelos y los valida en un hilo (consultan la base), así
+        el render del formulario ya no consulta nada.
+        """
+        for field in self.fields.values():
+            if isinstance(field, forms.ModelChoiceField):
+                field.widget.choices = [('', field.empty_label)] + [
+                    (field.prepare_value(obj), field.label_from_instance(obj)) async for obj in field.queryset
+                ]
+        if self.is_bound:
+            await sync_to_async(self.is_valid)()
+        return self.filtrar(queryset)
+
+    def aplicar(self, queryset, datos):
+        return queryset
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class FiltroVentasForm(FiltroListaForm):
+    desde = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    empleado = forms.ModelChoiceField(queryset=Empleado.objects.all(), required=False)
+    cliente = forms.IntegerField(required=False, min_value=1, label='ID Cliente')
+
+    def aplicar(self, queryset, datos):
+        # Rangos sobre la columna fecha tal cual para poder usar su índice
+        if 'desde' in datos:
+            queryset = queryset.filter(fecha__gte=_inicio_del_dia(datos['desde']))
+        if 'hasta' in datos:
+            queryset = queryset.filter(fecha__lt=_inicio_del_dia(datos['hasta'] + timedelta(days=1)))
+        if 'empleado' in datos:
+            queryset = queryset.filter(id_empleado=datos['empleado'])
+        if 'cliente' in datos:
+            queryset = queryset.filter(id_cliente_id=datos['cliente'])
+        return queryset
+
+
+class FiltroClientesForm(FiltroListaForm):
+    empleado = forms.ModelChoiceField(queryset=Empleado.objects.all(), required=False)
+
+    def aplicar(self, queryset, datos):
+        if 'empleado' in datos:
+            queryset = queryset.filter(id_empleado=datos['empleado'])
+        return queryset
+
+
+class FiltroProductosForm(FiltroListaForm):
+    categoria = forms.CharField(required=False, label='Categoría')
+    proveedor = forms.ModelChoiceField(queryset=Proveedor.objects.all(), required=False)
+
+    def aplicar(self, queryset, datos):
+        if 'categoria' in datos:
+            queryset = queryset.filter(categoria=datos['categoria'])
+        if 'proveedor' in datos:
+            queryset = queryset.filter(proveedor=datos['proveedor'])
+        return queryset
+
+
+class FiltroProveedoresForm(FiltroListaForm):
+    categoria = forms.CharField(required=False, label='Categoría')
+
+    def aplicar(self, queryset, datos):
+        if 'categoria' in datos:
+            queryset = queryset.filter(categoria=datos['categoria'])
+        return queryset
+
+
+class FiltroEmpleadosForm(FiltroListaForm):
+    puesto = forms.CharField(required=False)
+
+    def aplicar(self, queryset, datos):
+        if 'puesto' in datos:
+            queryset = queryset.filter(puesto=datos['puesto'])
+        return queryset
+
+
+class FiltroTareasForm(FiltroListaForm):
+    estado = forms.ChoiceField(choices=[('', 'Todos')] + Tarea.ESTADOS, required=False)
+
+    def aplicar(self, queryset, datos):
+        if 'estado' in datos:
+            queryset = queryset.filter(estado=datos['estado'])
+        return queryset
+
+
+# ========== AJUSTE DE PRECIOS ==========
+class ReajustePreciosForm(forms.Form):
+    """Ajuste masivo de precios (ver precios.py): a quién se aplica y cómo cambia el precio"""
+    categoria = forms.CharField(required=False, max_length=Producto._meta.get_field('categoria').max_length)
+    proveedor = forms.ModelChoiceField(queryset=Proveedor.objects.order_by('empresa', 'id'), required=False)
+    productos = forms.CharField(required=False, help_text='Ids de productos separados por comas')
+    porcentaje = forms.DecimalField(required=False, max_digits=6, decimal_places=2, min_value=-99, initial=0)
+    monto = forms.DecimalField(required=False, max_digits=10, decimal_places=2, initial=0)
+    redondeo = forms.ChoiceField(choices=[(nombre, descripcion) for nombre, (descripcion, _) in REDONDEOS.items()])
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for nombre, campo in self.fields.items():
+            campo.widget.attrs['class'] = 'form-select' if nombre in ('proveedor', 'redondeo') else 'form-control'
+
+    def clean_productos(self):
+        texto = self.cleaned_data['productos']
+        try:
+            return [int(pk) for pk in texto.replace(' ', '').split(',') if pk]
+        except ValueError:
+            raise forms.ValidationError('Escriba los ids de los productos separados por comas.')
+
+    def clean(self):
+        datos = super().clean()
+        if not (datos.get('categoria') or datos.get('proveedor') or datos.get('productos')):
+            raise forms.ValidationError('Indique una categoría, un proveedor o una lista de productos.')
+        if not (datos.get('porcentaje') or datos.get('monto')) and datos.get('redondeo') == 'centavo':
+            raise forms.ValidationError('Indique un porcentaje, un monto o una regla de redondeo.')
+        return datos
+
+
+# ========== IMPORTACIÓN DE CATÁLOGO ==========
+class ImportarCatalogoForm(forms.Form):
+    tipo = forms.ChoiceField(choices=[('productos', 'Productos'), ('proveedores', 'Proveedores')])
+    archivo = forms.FileField(help_text='Archivo CSV (UTF-8) con encabezados en la primera fila')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['tipo'].widget.attrs['class'] = 'form-select'
+        self.fields['archivo'].widget.attrs.update({'class': 'form-control', 'accept': '.csv,text/csv'})
+
+
+class ExportarVentasForm(FiltroVentasForm):
+    """Filtros y formato de la exportación de ventas en segundo plano"""
+    tamano = None
+    formato = forms.ChoiceField(choices=[(formato, formato.upper()) for formato in FORMATOS], initial='csv')
+    gzip = forms.BooleanField(required=False, initial=True, label='Comprimir (gzip)')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['gzip'].widget.attrs['class'] = 'form-check-input'
+
+
+class FilaProductoForm(forms.Form):
+    """Valida una fila del CSV de productos; el proveedor viene por nombre de empresa"""
+    nombre = Producto._meta.get_field('nombre').formfield()
+    categoria = Producto._meta.get_field('categoria').formfield()
+    precio = Producto._meta.get_field('precio').formfield(min_value=0)
+    proveedor = forms.CharField(max_length=Proveedor._meta.get_field('empresa').max_length)
+    descripcion = forms.CharField(required=False)
+    existencias = forms.IntegerField(required=False, min_value=0)
+
+
+class FilaProveedorForm(forms.Form):
+    """Valida una fila del CSV de proveedores (se identifican por empresa)"""
+    empresa = Proveedor._meta.get_field('empresa').formfield()
+    contacto = Proveedor._meta.get_field('contacto').formfield()
+    telefono = Proveedor._meta.get_field('telefono').formfield()
+    email = Proveedor._meta.get_field('email').formfield()
+    direccion = Proveedor._meta.get_field('direccion').formfield()
+    categoria = Proveedor._meta.get_field('categoria').formfield()
+    productos = Proveedor._meta.get_field('productos').formfield()
@@ -0,0 +1,140 @@
+"""
+Archivo de ventas históricas. Las ventas cerradas (sin cambios desde hace
+EDAD_DIAS) se mueven por lotes de Venta/DetalleVenta a VentaArchivada/
+DetalleVentaArchivado, así las tablas que usan el cobro y los listados del
+día a día no crecen con los años de historia.
+
+Mover una venta no es borrarla: los acumulados diarios, los resúmenes de
+clientes y el libro de inventario no cambian (el resumen guarda una línea
+base de lo archivado, que se recalcula al archivar). Quien necesita toda la
+historia (detalle de clientes, reportes, exportaciones) la lee con las
+funciones de este módulo, que juntan ambas tablas.
+
+Se configura en settings.ARCHIVO_VENTAS (ver CONFIGURACION_POR_DEFECTO).
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DetalleVenta, DetalleVentaArchivado, Venta, VentaArchivada, borrar_sin_senales
+from .resumenes import actualizar_archivados
+
+CONFIGURACION_POR_DEFECTO = {
+    # Una venta se archiva cuando su fecha y su última modificación son más viejas que esto
+    'EDAD_DIAS': 365,
+    # Ventas movidas por transacción
+    'LOTE': 1000,
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'ARCHIVO_VENTAS', {})}
+
+
+# ========== ARCHIVADO ==========
+def archivables(edad_dias=None):
+    """Ventas cerradas: vendidas y modificadas por última vez antes del corte"""
+    edad_dias = configuracion()['EDAD_DIAS'] if edad_dias is None else edad_dias
+    corte = timezone.now() - timedelta(days=edad_dias)
+    return Venta.objects.filter(fecha__lt=corte, modificada__lt=corte)
+
+
+def _archivar_lote(venta_ids):
+    ahora = timezone.now()
+    archivadas = [
+        VentaArchivada(
+            id=pk, fecha=fecha, total=total, id_cliente_id=cliente_id, id_empleado_id=empleado_id, archivada=ahora,
+        )
+        for pk, fecha, total, cliente_id, empleado_id in Venta.objects.filter(pk__in=venta_ids).values_list(
+            'pk', 'fecha', 'total', 'id_cliente_id', 'id_empleado_id',
+        )
+    ]
+    VentaArchivada.objects.bulk_create(archivadas)
+    detalles = DetalleVenta.objects.filter(venta_id__in=venta_ids)
+    DetalleVentaArchivado.objects.bulk_create([
+        DetalleVentaArchivado(
+            id=pk, venta_id=venta_id, producto_id=producto_id, cantidad=cantidad,
+            precio_unitario=precio, subtotal=subtotal,
+        )
+        for pk, venta_id, producto_id, cantidad, precio, subtotal in detalles.values_list(
+            'pk', 'venta_id', 'producto_id', 'cantidad', 'precio_unitario', 'subtotal',
+        )
+    ], batch_size=configuracion()['LOTE'])
+    # Sin señales: las ventas siguen existiendo para acumulados, resúmenes e inventario
+    borrar_sin_senales(detalles)
+    borrar_sin_senales(Venta.objects.filter(pk__in=venta_ids))
+    # Los resúmenes no cambian, pero su parte archivada pasa a la línea base
+    actualizar_archivados({venta.id_cliente_id for venta in archivadas})
+
+
+def archivar(edad_dias=None, lote=None, al_avanzar=None):
+    """
+    Mueve al archivo las ventas cerradas, de la más vieja a la más nueva, en
+    una transacción por lote para no retener el candado de escritura.
+    `al_avanzar(archivadas)` se llama después de cada lote. Devuelve el
+    número de ventas archivadas.
+    """
+    lote = max(1, lote or configuracion()['LOTE'])
+    pendientes = archivables(edad_dias).order_by('fecha', 'id')
+    archivadas = 0
+    while True:
+        with transaction.atomic():
+            venta_ids = list(pendientes.values_list('pk', flat=True)[:lote])
+            if not venta_ids:
+                break
+            _archivar_lote(venta_ids)
+        archivadas += len(venta_ids)
+        if al_avanzar:
+            al_avanzar(archivadas)
+    return archivadas
+
+
+# ========== LECTURA UNIFICADA ==========
+def ambas(aplicar=None):
+    """
+    (ventas, archivadas): los querysets de ventas activas y archivadas con el
+    mismo filtro. `aplicar(queryset)` recibe cada uno; ambos modelos tienen
+    los mismos nombres de campos (p. ej. FiltroVentasForm.filtrar).
+    """
+    ventas, archivadas = Venta.objects.all(), VentaArchivada.objects.all()
+    if aplicar is not None:
+        ventas, archivadas = aplicar(ventas), aplicar(archivadas)
+    return ventas, archivadas
+
+
+def ventas_de_cliente(cliente, relacionados=('detalles__producto',)):
+    """Todas las compras del cliente, activas y archivadas, por fecha, con `relacionados` precargados"""
+    ventas = cliente.compras_realizadas.prefetch_related(*relacionados)
+    archivadas = cliente.compras_archivadas.prefetch_related(*relacionados)
+    return sorted(chain(archivadas, ventas), key=lambda venta: (venta.fecha, venta.pk))
+
+
+async def aventas_de_cliente(cliente, relacionados=('detalles__producto',)):
+    """ventas_de_cliente() con el ORM asíncrono"""
+    ventas = [venta async for venta in cliente.compras_realizadas.prefetch_related(*relacionados)]
+    archivadas = [venta async for venta in cliente.compras_archivadas.prefetch_related(*relacionados)]
+    return sorted(chain(archivadas, ventas), key=lambda venta: (venta.fecha, venta.pk))
+
+
+def obtener_venta(pk, relacionados=('id_cliente', 'id_empleado')):
+    """La venta activa o, si ya se archivó, la archivada; Venta.DoesNotExist si no existe"""
+    try:
+        return Venta.objects.select_related(*relacionados).get(pk=pk)
+    except Venta.DoesNotExist:
+        try:
+            return VentaArchivada.objects.select_related(*relacionados).get(pk=pk)
+        except VentaArchivada.DoesNotExist:
+            raise Venta.DoesNotExist(f'No existe la venta {pk}.')
+
+
+async def aobtener_venta(pk, relacionados=('id_cliente', 'id_empleado')):
+    """obtener_venta() con el ORM asíncrono"""
+    venta = await Venta.objects.select_related(*relacionados).filter(pk=pk).afirst()
+    if venta is None:
+        venta = await VentaArchivada.objects.select_related(*relacionados).filter(pk=pk).afirst()
+    if venta is None:
+        raise Venta.DoesNotExist(f'No existe la venta {pk}.')
+    return venta
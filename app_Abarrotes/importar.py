@@ -0,0 +1,215 @@
+import csv
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import cache_vistas, inventario, precios, rollups
+from .forms import FilaProductoForm, FilaProveedorForm
+from .models import MovimientoInventario, PrecioHistorico, Producto, Proveedor
+
+TAMANO_LOTE = 1000
+# Errores que se guardan con detalle; los demás solo se cuentan
+MAX_ERRORES = 1000
+
+
+class ResultadoImportacion:
+    """Conteos de la importación y errores por número de línea del archivo"""
+
+    def __init__(self):
+        self.filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self.errores = []
+        self.total_errores = 0
+
+    def error(self, linea, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((linea, mensaje))
+
+    @property
+    def errores_omitidos(self):
+        return self.total_errores - len(self.errores)
+
+
+def _lotes(lector, tamano):
+    """Agrupa las filas del lector en listas de (línea, fila) sin leer el archivo completo"""
+    filas = ((lector.line_num, fila) for fila in lector)
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def _validar(form_class, filas, resultado):
+    """
+    Limpia cada fila con los campos del formulario. Se usan los campos
+    directamente en lugar de instanciar un formulario por fila: crear el
+    formulario copia todos sus campos y eso dominaba el tiempo de importación.
+    """
+    campos = form_class.base_fields
+    validas = []
+    for linea, fila in filas:
+        datos, errores = {}, []
+        for nombre, campo in campos.items():
+            try:
+                datos[nombre] = campo.clean(fila.get(nombre))
+            except ValidationError as e:
+                errores.append(f'{nombre}: {" ".join(e.messages)}')
+        if errores:
+            resultado.error(linea, '; '.join(errores))
+        else:
+            validas.append((linea, datos))
+    return validas
+
+
+def _guardar(modelo, existentes, nuevos, resultado, relativos=()):
+    """
+    Aplica los cambios de un lote. Solo se actualizan las filas y columnas
+    que cambiaron (p. ej. las existencias no se tocan si el archivo no las trae).
+    Los campos `relativos` cuentan como cambio y quedan en los objetos, pero
+    no se escriben aquí: el llamador los aplica con un UPDATE relativo.
+    """
+    modificados, campos = [], set()
+    for objeto, valores in existentes:
+        cambios = {campo: valor for campo, valor in valores.items() if getattr(objeto, campo) != valor}
+        if cambios:
+            for campo, valor in cambios.items():
+                setattr(objeto, campo, valor)
+            modificados.append(objeto)
+            campos.update(cambios)
+        else:
+            resultado.sin_cambios += 1
+
+    with transaction.atomic():
+        campos = sorted(campos.difference(relativos))
+        if modificados and campos:
+            # Upsert por clave primaria: bulk_update arma un CASE por fila y
+            # columna, mucho más lento de construir para lotes grandes
+            modelo.objects.bulk_create(
+                modificados, update_conflicts=True, unique_fields=['pk'], update_fields=campos,
+            )
+        if nuevos:
+            modelo.objects.bulk_create(nuevos)
+        if modificados or nuevos:
+            # Las escrituras masivas no disparan señales
+            cache_vistas.invalidar(modelo)
+    resultado.actualizados += len(modificados)
+    resultado.creados += len(nuevos)
+
+
+def _importar_productos(filas, columnas, resultado):
+    validas = _validar(FilaProductoForm, filas, resultado)
+
+    # Una consulta por lote para resolver los proveedores por nombre de empresa
+    proveedores = {}
+    empresas = {datos['proveedor'] for _, datos in validas}
+    for pk, empresa in Proveedor.objects.filter(empresa__in=empresas).order_by('pk').values_list('pk', 'empresa'):
+        proveedores.setdefault(empresa, pk)
+
+    campos = ['categoria', 'precio']
+    if 'descripcion' in columnas:
+        campos.append('descripcion')
+
+    # Un producto se identifica por (proveedor, nombre); si se repite en el lote gana la última fila
+    por_clave = {}
+    for linea, datos in validas:
+        proveedor_id = proveedores.get(datos['proveedor'])
+        if proveedor_id is None:
+            resultado.error(linea, f'proveedor: no existe un proveedor con empresa "{datos["proveedor"]}".')
+            continue
+        valores = {campo: datos[campo] for campo in campos}
+        if datos['existencias'] is not None:
+            valores['existencias'] = datos['existencias']
+        por_clave[(proveedor_id, datos['nombre'])] = valores
+
+    with transaction.atomic():
+        encontrados = {}
+        for producto in Producto.objects.filter(
+            proveedor_id__in={clave[0] for clave in por_clave},
+            nombre__in={clave[1] for clave in por_clave},
+        ).order_by('pk'):
+            encontrados.setdefault((producto.proveedor_id, producto.nombre), producto)
+
+        existentes, nuevos = [], []
+        for (proveedor_id, nombre), valores in por_clave.items():
+            producto = encontrados.get((proveedor_id, nombre))
+            if producto is None:
+                nuevos.append(Producto(proveedor_id=proveedor_id, nombre=nombre, **valores))
+            else:
+                existentes.append((producto, valores))
+
+        # Las existencias del archivo se aplican como diferencia con lo leído,
+        # en el mismo UPDATE relativo que anota el ajuste en el libro: una venta
+        # entre la lectura y la escritura se conserva y el libro no se desvía
+        _guardar(Producto, existentes, nuevos, resultado, relativos=['existencias'])
+        inventario.mover(
+            {producto.pk: producto.existencias - producto._existencias_original for producto, _ in existentes},
+            MovimientoInventario.AJUSTE,
+        )
+        # Las escrituras masivas no disparan señales: el libro de inventario se anota aquí
+        inventario.registrar({producto.pk: producto.existencias for producto in nuevos}, MovimientoInventario.ENTRADA)
+        precios.registrar(
+            {producto.pk: (producto._precio_original, producto.precio) for producto, _ in existentes},
+            PrecioHistorico.IMPORTACION,
+        )
+        rollups.mover_categorias(
+            {producto.pk: (producto._categoria_original, producto.categoria) for producto, _ in existentes}
+        )
+
+
+def _importar_proveedores(filas, columnas, resultado):
+    validas = _validar(FilaProveedorForm, filas, resultado)
+
+    # Un proveedor se identifica por empresa; si se repite en el lote gana la última fila
+    por_empresa = {datos['empresa']: datos for _, datos in validas}
+    encontrados = {}
+    for proveedor in Proveedor.objects.filter(empresa__in=por_empresa).order_by('pk'):
+        encontrados.setdefault(proveedor.empresa, proveedor)
+
+    campos = ['contacto', 'telefono', 'email', 'direccion', 'categoria', 'productos']
+    existentes, nuevos = [], []
+    for empresa, datos in por_empresa.items():
+        valores = {campo: datos[campo] for campo in campos}
+        if empresa in encontrados:
+            existentes.append((encontrados[empresa], valores))
+        else:
+            nuevos.append(Proveedor(empresa=empresa, **valores))
+    _guardar(Proveedor, existentes, nuevos, resultado)
+
+
+# tipo -> (función del lote, columnas obligatorias)
+IMPORTADORES = {
+    'productos': (_importar_productos, {'nombre', 'categoria', 'precio', 'proveedor'}),
+    'proveedores': (
+        _importar_proveedores,
+        {'empresa', 'contacto', 'telefono', 'email', 'direccion', 'categoria', 'productos'},
+    ),
+}
+
+
+def importar_catalogo(tipo, archivo, lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Importa productos o proveedores desde un CSV (archivo de texto abierto)
+    leyéndolo por lotes: cada lote se valida, resuelve sus referencias con
+    una consulta y se guarda con inserciones masivas (upsert) en su propia
+    transacción. Las filas inválidas se reportan sin detener la importación.
+    `al_avanzar(resultado)` se llama después de cada lote.
+    """
+    importar_lote, obligatorias = IMPORTADORES[tipo]
+    lector = csv.DictReader(archivo)
+    columnas = set(lector.fieldnames or [])
+    faltantes = obligatorias - columnas
+    if faltantes:
+        raise ValidationError(f'Faltan columnas en el archivo: {", ".join(sorted(faltantes))}')
+
+    resultado = ResultadoImportacion()
+    for filas in _lotes(lector, lote):
+        resultado.filas += len(filas)
+        importar_lote(filas, columnas, resultado)
+        if al_avanzar:
+            al_avanzar(resultado)
+    return resultado
@@ -0,0 +1,228 @@
+"""
+Instrumentación por petición: número de consultas, tiempo de SQL, tiempo
+de render de plantillas y consultas repetidas (la huella de un N+1),
+agregados por nombre de vista y comparados contra un presupuesto.
+
+Se activa con `InstrumentacionMiddleware` y, para medir el render, con el
+backend de plantillas `DjangoTemplatesMedidos`. Se configura en
+settings.INSTRUMENTACION_CONSULTAS (ver CONFIGURACION_POR_DEFECTO).
+"""
+import logging
+import re
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+logger = logging.getLogger('app_Abarrotes.consultas')
+
+CONFIGURACION_POR_DEFECTO = {
+    # Consultas permitidas por petición para vistas sin presupuesto propio
+    'PRESUPUESTO_POR_DEFECTO': 30,
+    # nombre de vista -> consultas permitidas por petición
+    'PRESUPUESTOS': {},
+    # Veces que puede repetirse una misma consulta (con otros parámetros)
+    'MAX_REPETICIONES': 5,
+    # True: exceder el presupuesto lanza PresupuestoExcedido (para pruebas);
+    # False: solo se registra una advertencia
+    'ESTRICTO': False,
+}
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+_NUMEROS = re.compile(r'\b\d+\b')
+_LISTAS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'INSTRUMENTACION_CONSULTAS', {})}
+
+
+def huella(sql):
+    """
+    Normaliza el SQL para agrupar consultas iguales salvo por sus valores:
+    literales numéricos y listas IN de cualquier largo cuentan como la misma.
+    """
+    return _LISTAS.sub('(...)', _NUMEROS.sub('?', sql))
+
+
+class Medicion:
+    """Lo que se midió durante una petición"""
+
+    def __init__(self, vista):
+        self.vista = vista
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_render = 0.0
+        self.tiempo_total = 0.0
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Envoltura de connection.execute_wrapper()
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_sql += perf_counter() - inicio
+            self.consultas += 1
+            self.huellas[huella(sql)] += 1
+
+    def repetidas(self, minimo=2):
+        """Huellas ejecutadas al menos `minimo` veces, de la más repetida a la menos"""
+        return [(sql, veces) for sql, veces in self.huellas.most_common() if veces >= minimo]
+
+
+class _Estadisticas:
+    """Totales por vista acumulados desde que arrancó el proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = {}
+
+    def registrar(self, medicion):
+        with self._lock:
+            fila = self._vistas.setdefault(medicion.vista, {
+                'peticiones': 0, 'consultas': 0, 'max_consultas': 0,
+                'tiempo_sql': 0.0, 'tiempo_render': 0.0, 'tiempo_total': 0.0,
+            })
+            fila['peticiones'] += 1
+            fila['consultas'] += medicion.consultas
+            fila['max_consultas'] = max(fila['max_consultas'], medicion.consultas)
+            fila['tiempo_sql'] += medicion.tiempo_sql
+            fila['tiempo_render'] += medicion.tiempo_render
+            fila['tiempo_total'] += medicion.tiempo_total
+
+    def resumen(self):
+        with self._lock:
+            return {vista: dict(fila) for vista, fila in self._vistas.items()}
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas.clear()
+
+
+estadisticas = _Estadisticas()
+
+
+def verificar_presupuesto(medicion, config=None):
+    """Devuelve la lista de problemas de la medición frente a su presupuesto"""
+    config = config or configuracion()
+    presupuesto = config['PRESUPUESTOS'].get(medicion.vista, config['PRESUPUESTO_POR_DEFECTO'])
+    problemas = []
+    if presupuesto is not None and medicion.consultas > presupuesto:
+        problemas.append(f'{medicion.consultas} consultas (presupuesto: {presupuesto})')
+    for sql, veces in medicion.repetidas(config['MAX_REPETICIONES'] + 1):
+        problemas.append(f'consulta repetida {veces} veces: {sql[:200]}')
+    return problemas
+
+
+class InstrumentacionMiddleware:
+    """Mide cada petición, la acumula por vista y aplica el presupuesto de consultas"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion(vista=None)
+        token = _medicion_actual.set(medicion)
+        inicio = perf_counter()
+        try:
+            with ExitStack() as pila:
+                _medir_conexiones(pila, medicion)
+                response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        medicion.tiempo_total = perf_counter() - inicio
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        # Las conexiones son por hilo y el ORM asíncrono consulta desde el hilo
+        # de la petición (sync_to_async con thread_sensitive): ahí se instalan
+        medicion = Medicion(vista=None)
+        token = _medicion_actual.set(medicion)
+        inicio = perf_counter()
+        pila = ExitStack()
+        try:
+            await sync_to_async(_medir_conexiones)(pila, medicion)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(pila.close)()
+        finally:
+            _medicion_actual.reset(token)
+        medicion.tiempo_total = perf_counter() - inicio
+        return self._terminar(request, response, medicion)
+
+    def _terminar(self, request, response, medicion):
+        match = getattr(request, 'resolver_match', None)
+        medicion.vista = match.view_name if match else request.path
+        request.medicion = medicion
+        estadisticas.registrar(medicion)
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={medicion.tiempo_sql * 1000:.1f};desc="{medicion.consultas} consultas"',
+            f'render;dur={medicion.tiempo_render * 1000:.1f}',
+            f'total;dur={medicion.tiempo_total * 1000:.1f}',
+        ])
+        logger.debug(
+            '%s: %d consultas, sql %.1f ms, render %.1f ms, total %.1f ms', medicion.vista,
+            medicion.consultas, medicion.tiempo_sql * 1000, medicion.tiempo_render * 1000,
+            medicion.tiempo_total * 1000,
+        )
+
+        config = configuracion()
+        problemas = verificar_presupuesto(medicion, config)
+        if problemas:
+            mensaje = f'{medicion.vista} excedió su presupuesto: ' + '; '.join(problemas)
+            if config['ESTRICTO']:
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+        return response
+
+
+def _medir_conexiones(pila, medicion):
+    for alias in connections:
+        pila.enter_context(connections[alias].execute_wrapper(medicion))
+
+
+# ========== RENDER DE PLANTILLAS ==========
+class _TemplateMedido(Template):
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            # Incluye las consultas perezosas que se ejecutan desde la plantilla
+            medicion.tiempo_render += perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend de plantillas de Django que suma el tiempo de render a la petición en curso"""
+
+    def from_string(self, template_code):
+        return _TemplateMedido(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return _TemplateMedido(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,209 @@
+"""
+Libro de inventario: cada entrada o salida de mercancía es una fila de
+MovimientoInventario que nunca se edita. Producto.existencias es una
+proyección en caché del libro que se mantiene con un UPDATE relativo en la
+misma transacción que agrega los movimientos.
+
+Los cortes (CorteInventario) guardan las existencias de cada producto hasta
+cierto movimiento; las existencias a una fecha se calculan desde el último
+corte anterior sumando solo los movimientos posteriores, así que compactar
+periódicamente mantiene esa suma corta aunque el historial crezca.
+"""
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import cache_vistas
+from .models import CorteInventario, MovimientoInventario, Producto
+
+TAMANO_LOTE = 1000
+# Productos por UPDATE condicional de existencias
+PRODUCTOS_POR_UPDATE = 400
+
+
+def mover(cantidades, tipo, venta=None):
+    """
+    Registra un movimiento por producto y ajusta su proyección con un solo
+    UPDATE condicional. `cantidades` es {producto_id: cantidad} con cantidad
+    positiva si entra al inventario y negativa si sale. Si algún producto no
+    tiene existencias para una salida no se actualiza y se lanza
+    ValidationError para que la transacción se revierta; no hace falta
+    bloquear las filas antes de leerlas.
+    """
+    cantidades = {pk: cantidad for pk, cantidad in cantidades.items() if cantidad}
+    if not cantidades:
+        return
+    with transaction.atomic():
+        _ajustar_existencias(cantidades)
+        registrar(cantidades, tipo, venta)
+        # El UPDATE masivo no dispara señales: las páginas con existencias se invalidan aquí
+        cache_vistas.invalidar(MovimientoInventario)
+
+
+def mover_ventas(por_venta, tipo):
+    """
+    mover() de varias ventas a la vez: un solo UPDATE condicional con el neto
+    de cada producto y un movimiento por venta y producto. `por_venta` es
+    {venta: {producto_id: cantidad}}.
+    """
+    netos = defaultdict(int)
+    for cantidades in por_venta.values():
+        for producto_id, cantidad in cantidades.items():
+            netos[producto_id] += cantidad
+    netos = {pk: cantidad for pk, cantidad in netos.items() if cantidad}
+    if not netos:
+        return
+    ahora = timezone.now()
+    with transaction.atomic():
+        _ajustar_existencias(netos)
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(producto_id=producto_id, tipo=tipo, cantidad=cantidad, fecha=ahora, venta=venta)
+            for venta, cantidades in por_venta.items()
+            for producto_id, cantidad in cantidades.items() if cantidad
+        ], batch_size=TAMANO_LOTE)
+        cache_vistas.invalidar(MovimientoInventario)
+
+
+def _ajustar_existencias(cantidades):
+    # Por tramos: SQLite limita la profundidad de la cadena de OR
+    pendientes = list(cantidades.items())
+    for inicio in range(0, len(pendientes), PRODUCTOS_POR_UPDATE):
+        tramo = pendientes[inicio:inicio + PRODUCTOS_POR_UPDATE]
+        condicion = Q()
+        for producto_id, cantidad in tramo:
+            if cantidad < 0:
+                condicion |= Q(pk=producto_id, existencias__gte=-cantidad)
+            else:
+                condicion |= Q(pk=producto_id)
+
+        delta = Case(
+            *[When(pk=producto_id, then=Value(cantidad)) for producto_id, cantidad in tramo],
+            output_field=IntegerField(),
+        )
+        actualizados = Producto.objects.filter(condicion).update(existencias=F('existencias') + delta)
+        if actualizados != len(tramo):
+            # Otro proceso consumió el stock entre la lectura y la escritura
+            raise ValidationError('Stock insuficiente: las existencias cambiaron durante la operación, intente de nuevo.')
+
+
+def registrar(cantidades, tipo, venta=None):
+    """Agrega los movimientos sin tocar la proyección (para quien ya escribió las existencias)"""
+    ahora = timezone.now()
+    MovimientoInventario.objects.bulk_create([
+        MovimientoInventario(producto_id=producto_id, tipo=tipo, cantidad=cantidad, fecha=ahora, venta=venta)
+        for producto_id, cantidad in cantidades.items() if cantidad
+    ], batch_size=TAMANO_LOTE)
+
+
+# ========== CONSULTAS DEL LIBRO ==========
+def _ultimos_cortes(producto_ids=None, fecha=None):
+    """{producto_id: (existencias, ultimo_movimiento)} del corte más reciente de cada producto"""
+    cortes = CorteInventario.objects.all()
+    if producto_ids is not None:
+        cortes = cortes.filter(producto_id__in=producto_ids)
+    if fecha is not None:
+        cortes = cortes.filter(fecha__lte=fecha)
+    # Los cortes se crean en orden: el de id mayor es el más reciente
+    ultimos = cortes.values('producto').annotate(ultimo=Max('id')).values('ultimo')
+    return {
+        producto_id: (existencias, ultimo_movimiento)
+        for producto_id, existencias, ultimo_movimiento in CorteInventario.objects.filter(
+            pk__in=ultimos
+        ).values_list('producto_id', 'existencias', 'ultimo_movimiento')
+    }
+
+
+def existencias_segun_libro(producto_ids=None, fecha=None, hasta_movimiento=None):
+    """
+    {producto_id: existencias} calculadas desde el libro: el último corte (a
+    la `fecha`, si se indica) más los movimientos posteriores a él. Incluye
+    todos los productos pedidos; sin corte ni movimientos su saldo es 0.
+    """
+    if producto_ids is None:
+        producto_ids = list(Producto.objects.values_list('pk', flat=True))
+    producto_ids = list(producto_ids)
+    cortes = _ultimos_cortes(producto_ids, fecha)
+    saldos = {pk: cortes.get(pk, (0, 0))[0] for pk in producto_ids}
+
+    # Los productos comparten el último movimiento de su corte (se compactan
+    # juntos): un filtro por cada valor distinto, no uno por producto
+    por_corte = defaultdict(list)
+    for pk in producto_ids:
+        por_corte[cortes.get(pk, (0, 0))[1]].append(pk)
+    if not por_corte:
+        return saldos
+    posteriores = Q()
+    for ultimo_movimiento, pks in por_corte.items():
+        posteriores |= Q(producto_id__in=pks, id__gt=ultimo_movimiento)
+
+    movimientos = MovimientoInventario.objects.filter(posteriores)
+    if fecha is not None:
+        movimientos = movimientos.filter(fecha__lte=fecha)
+    if hasta_movimiento is not None:
+        movimientos = movimientos.filter(id__lte=hasta_movimiento)
+    for producto_id, suma in movimientos.values('producto').annotate(suma=Sum('cantidad')).values_list('producto', 'suma'):
+        saldos[producto_id] += suma
+    return saldos
+
+
+def existencias_al(fecha, producto_ids=None):
+    """Existencias de los productos al momento `fecha`"""
+    return existencias_segun_libro(producto_ids, fecha=fecha)
+
+
+# ========== MANTENIMIENTO ==========
+def compactar(lote=TAMANO_LOTE):
+    """
+    Crea un corte para cada producto con movimientos posteriores a su último
+    corte. Los movimientos se conservan; el corte solo acota cuántos hay que
+    sumar para calcular existencias. Devuelve el número de cortes creados.
+    """
+    creados = 0
+    with transaction.atomic():
+        tope = MovimientoInventario.objects.aggregate(tope=Max('id'))['tope']
+        if tope is None:
+            return 0
+        ahora = timezone.now()
+        ultimo_movimiento = MovimientoInventario.objects.filter(producto=OuterRef('pk')).order_by('-id').values('id')[:1]
+        ultimo_corte = CorteInventario.objects.filter(producto=OuterRef('pk')).order_by('-id').values('ultimo_movimiento')[:1]
+        pendientes = list(
+            Producto.objects.annotate(
+                movimiento=Subquery(ultimo_movimiento),
+                cortado=Coalesce(Subquery(ultimo_corte), Value(0)),
+            ).filter(movimiento__gt=F('cortado'), movimiento__lte=tope).order_by('pk').values_list('pk', flat=True)
+        )
+        for inicio in range(0, len(pendientes), lote):
+            saldos = existencias_segun_libro(pendientes[inicio:inicio + lote], hasta_movimiento=tope)
+            CorteInventario.objects.bulk_create([
+                CorteInventario(producto_id=pk, fecha=ahora, existencias=existencias, ultimo_movimiento=tope)
+                for pk, existencias in saldos.items()
+            ])
+            creados += len(saldos)
+    return creados
+
+
+def diferencias(lote=TAMANO_LOTE):
+    """{producto_id: (existencias en caché, existencias según el libro)} de los productos que no coinciden"""
+    resultado = {}
+    pks = list(Producto.objects.order_by('pk').values_list('pk', flat=True))
+    for inicio in range(0, len(pks), lote):
+        saldos = existencias_segun_libro(pks[inicio:inicio + lote])
+        for pk, existencias in Producto.objects.filter(pk__in=saldos).values_list('pk', 'existencias'):
+            if existencias != saldos[pk]:
+                resultado[pk] = (existencias, saldos[pk])
+    return resultado
+
+
+def corregir_proyeccion(lote=TAMANO_LOTE):
+    """Reescribe Producto.existencias con el saldo del libro donde no coincidan; devuelve cuántos"""
+    pendientes = diferencias(lote)
+    with transaction.atomic():
+        for pk, (_, saldo) in pendientes.items():
+            Producto.objects.filter(pk=pk).update(existencias=saldo)
+        if pendientes:
+            cache_vistas.invalidar(MovimientoInventario)
+    return len(pendientes)
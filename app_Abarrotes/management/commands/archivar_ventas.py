@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import historico, tareas
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve a las tablas de archivo las ventas cerradas (vendidas y modificadas antes de '
+        'ARCHIVO_VENTAS["EDAD_DIAS"] días), por lotes, sin alterar acumulados ni resúmenes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--edad-dias', type=int, help='Antigüedad mínima en días; por defecto la de settings')
+        parser.add_argument('--lote', type=int, help='Ventas movidas por transacción')
+        parser.add_argument('--en-cola', action='store_true', help='Encola el archivado para runworker en lugar de ejecutarlo')
+
+    def handle(self, *args, **options):
+        edad_dias = options['edad_dias']
+        if edad_dias is not None and edad_dias < 0:
+            raise CommandError('--edad-dias no puede ser negativo')
+
+        if options['en_cola']:
+            tarea = tareas.encolar('archivar_ventas', edad_dias=edad_dias)
+            self.stdout.write(self.style.SUCCESS(f'Archivado encolado como tarea {tarea.pk}.'))
+            return
+
+        archivadas = historico.archivar(
+            edad_dias, options['lote'], al_avanzar=lambda hechas: self.stdout.write(f'{hechas} ventas archivadas'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archivado terminado: {archivadas} ventas.'))
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import benchmark
+
+MODOS = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Corre las vistas de solo lectura bajo WSGI (vistas síncronas en hilos) y ASGI (vistas asíncronas) '
+        'con muchos clientes lentos a la vez y reporta latencias e hilos del servidor. La lentitud de los '
+        'clientes se simula sin sockets, así que no mide throughput ni reemplaza medir con un servidor real. '
+        'Cada modo corre en su propio proceso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=MODOS + ('ambos',), default='ambos')
+        parser.add_argument('--clientes', type=int, default=100, help='Clientes concurrentes')
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones en total')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del servidor WSGI')
+        parser.add_argument(
+            '--espera-cliente', type=float, default=250,
+            help='Milisegundos que se simula que tarda cada cliente en recibir la respuesta',
+        )
+        parser.add_argument('--con-cache', action='store_true', help='Mantener la caché de páginas activa')
+        parser.add_argument('--salida', help='Archivo JSON de destino; por defecto la salida estándar')
+
+    def handle(self, *args, **options):
+        if options['modo'] != 'ambos':
+            resultado = benchmark.concurrencia(
+                options['modo'],
+                clientes=max(1, options['clientes']),
+                peticiones=max(1, options['peticiones']),
+                hilos=max(1, options['hilos']),
+                espera_cliente=max(0.0, options['espera_cliente']) / 1000,
+                cache=options['con_cache'],
+            )
+            self.stdout.write(json.dumps(resultado, ensure_ascii=False))
+            return
+
+        modos = {}
+        for modo in MODOS:
+            self.stderr.write(f'Modelando {modo}...')
+            modos[modo] = self._en_proceso(modo, options)
+            self.stderr.write(
+                f'{modo}: p50 {modos[modo]["p50_ms"]} ms, p95 {modos[modo]["p95_ms"]} ms, '
+                f'{modos[modo]["hilos_servidor_max"]} hilos'
+            )
+
+        reporte = benchmark.reporte_concurrencia(modos, {
+            'clientes': options['clientes'],
+            'peticiones': options['peticiones'],
+            'hilos_wsgi': options['hilos'],
+            'espera_cliente_ms': options['espera_cliente'],
+            'cache': options['con_cache'],
+        })
+        if options['salida']:
+            benchmark.guardar(reporte, options['salida'])
+            self.stderr.write(self.style.SUCCESS(f'Reporte guardado en {options["salida"]}'))
+        else:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+    def _en_proceso(self, modo, options):
+        """Corre un modo en otro proceso con las vistas que le corresponden (ver asgi.py)"""
+        comando = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'benchmark_concurrencia',
+            '--modo', modo,
+            '--clientes', str(options['clientes']),
+            '--peticiones', str(options['peticiones']),
+            '--hilos', str(options['hilos']),
+            '--espera-cliente', str(options['espera_cliente']),
+        ]
+        if options['con_cache']:
+            comando.append('--con-cache')
+        if options.get('settings'):
+            comando += ['--settings', options['settings']]
+        entorno = {**os.environ, 'ABARROTES_VISTAS_ASYNC': '1' if modo == 'asgi' else '0'}
+        proceso = subprocess.run(comando, capture_output=True, text=True, env=entorno)
+        if proceso.returncode != 0:
+            raise CommandError(f'Falló la medición de {modo}:\n{proceso.stderr}')
+        return json.loads(proceso.stdout)
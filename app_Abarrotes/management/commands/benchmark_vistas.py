@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide cada vista y el flujo de cobro sobre la base actual (p50/p95, consultas, memoria pico) '
+        'y escribe el reporte en JSON. Sembrar antes con sembrar_datos para medir con volumen.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--calentamiento', type=int, default=2)
+        parser.add_argument('--filtro', help='Solo las rutas cuyo nombre contenga este texto')
+        parser.add_argument('--salida', help='Archivo JSON de destino; por defecto la salida estándar')
+        parser.add_argument('--comparar', help='Reporte JSON anterior contra el cual comparar')
+        parser.add_argument('--umbral', type=float, default=0.10, help='Variación de latencia a reportar (0.10 = 10%%)')
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'No se pudo leer {options["comparar"]}: {e}')
+
+        reporte = benchmark.ejecutar(
+            repeticiones=max(1, options['repeticiones']),
+            calentamiento=max(0, options['calentamiento']),
+            filtro=options['filtro'],
+            progreso=self.stderr.write,
+        )
+
+        if options['salida']:
+            benchmark.guardar(reporte, options['salida'])
+            self.stderr.write(self.style.SUCCESS(f'Reporte guardado en {options["salida"]}'))
+        else:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+
+        if anterior is not None:
+            diferencias = benchmark.comparar(anterior, reporte, options['umbral'])
+            self.stderr.write('\n'.join(diferencias) if diferencias else 'Sin diferencias relevantes.')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import inventario
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea cortes de inventario para los productos con movimientos desde su último corte. '
+        'Con --verificar compara Producto.existencias contra el libro de movimientos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true', help='Reporta productos cuyas existencias no coinciden con el libro')
+        parser.add_argument('--corregir', action='store_true', help='Reescribe las existencias con el saldo del libro donde difieran')
+        parser.add_argument('--lote', type=int, default=inventario.TAMANO_LOTE)
+
+    def handle(self, *args, **options):
+        lote = max(1, options['lote'])
+        creados = inventario.compactar(lote)
+        self.stdout.write(self.style.SUCCESS(f'{creados} cortes creados.'))
+
+        if options['corregir']:
+            corregidos = inventario.corregir_proyeccion(lote)
+            self.stdout.write(self.style.SUCCESS(f'{corregidos} productos corregidos.'))
+        elif options['verificar']:
+            diferencias = inventario.diferencias(lote)
+            for pk, (existencias, saldo) in sorted(diferencias.items()):
+                self.stdout.write(f'Producto {pk}: existencias {existencias}, libro {saldo}')
+            if diferencias:
+                raise CommandError(f'{len(diferencias)} productos no coinciden con el libro de inventario.')
+            self.stdout.write(self.style.SUCCESS('Las existencias coinciden con el libro.'))
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import historico
+from app_Abarrotes.exportar import FORMATOS, exportar_ventas
+from app_Abarrotes.forms import FiltroVentasForm
+
+
+class Command(BaseCommand):
+    help = 'Exporta las ventas con sus líneas a CSV o JSON escribiendo por trozos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--desde', help='Primer día (AAAA-MM-DD)')
+        parser.add_argument('--hasta', help='Último día (AAAA-MM-DD)')
+        parser.add_argument('--gzip', action='store_true', help='Comprimir la salida con gzip')
+        parser.add_argument('--salida', help='Archivo de destino; por defecto la salida estándar')
+
+    def handle(self, *args, **options):
+        filtro = FiltroVentasForm({'desde': options['desde'] or '', 'hasta': options['hasta'] or ''})
+        if not filtro.is_valid():
+            raise CommandError(f'Fechas inválidas: {filtro.errors.as_text()}')
+        ventas, archivadas = historico.ambas(filtro.filtrar)
+
+        trozos = exportar_ventas(ventas, options['formato'], options['gzip'], archivadas)
+        if options['salida']:
+            with open(options['salida'], 'wb') as archivo:
+                for trozo in trozos:
+                    archivo.write(trozo)
+            self.stderr.write(self.style.SUCCESS(f'Exportación guardada en {options["salida"]}'))
+        else:
+            for trozo in trozos:
+                sys.stdout.buffer.write(trozo)
+            sys.stdout.buffer.flush()
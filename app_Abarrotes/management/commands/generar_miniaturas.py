@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+
+from app_Abarrotes import cache_vistas, miniaturas
+from app_Abarrotes.models import Empleado, Proveedor
+
+MODELOS = {'empleados': Empleado, 'proveedores': Proveedor}
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes reducidas (listado, detalle, WebP) de las fotos existentes en paralelo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', choices=sorted(MODELOS), help='Solo las fotos de este modelo')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--forzar', action='store_true', help='Regenera aunque las variantes ya existan')
+
+    def handle(self, *args, **options):
+        modelos = [MODELOS[options['modelo']]] if options['modelo'] else MODELOS.values()
+        nombres = sorted({
+            nombre
+            for modelo in modelos
+            for nombre in modelo.objects.exclude(foto='').exclude(foto__isnull=True).values_list('foto', flat=True)
+        })
+        if not nombres:
+            self.stdout.write('No hay fotos que procesar.')
+            return
+
+        generadas = omitidas = 0
+        errores = []
+        procesos = max(1, options['procesos'])
+        tarea = partial(miniaturas.generar_seguro, forzar=options['forzar'])
+        with ProcessPoolExecutor(max_workers=procesos, initializer=miniaturas.iniciar_proceso) as pool:
+            for nombre, escritos, error in pool.map(tarea, nombres, chunksize=max(1, len(nombres) // (procesos * 4))):
+                if error:
+                    errores.append((nombre, error))
+                elif escritos:
+                    generadas += 1
+                else:
+                    omitidas += 1
+
+        if generadas:
+            # Los listados en caché todavía apuntan a las fotos originales
+            cache_vistas.invalidar(Empleado, Proveedor)
+        for nombre, error in errores:
+            self.stderr.write(f'{nombre}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{generadas} fotos procesadas, {omitidas} ya tenían variantes, {len(errores)} con error.'
+        ))
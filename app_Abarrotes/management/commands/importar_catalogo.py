@@ -0,0 +1,31 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes.importar import IMPORTADORES, TAMANO_LOTE, importar_catalogo
+
+
+class Command(BaseCommand):
+    help = 'Importa (crea o actualiza) productos o proveedores desde un archivo CSV por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES))
+        parser.add_argument('archivo', help='Ruta del CSV (UTF-8, con encabezados)')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = importar_catalogo(options['tipo'], archivo, max(1, options['lote']))
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'No se pudo leer el archivo: {e}')
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f'Línea {linea}: {mensaje}')
+        if resultado.errores_omitidos:
+            self.stderr.write(f'... y {resultado.errores_omitidos} errores más.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.filas} filas: {resultado.creados} creados, {resultado.actualizados} actualizados, '
+            f'{resultado.sin_cambios} sin cambios, {resultado.total_errores} con errores.'
+        ))
@@ -0,0 +1,29 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import precios
+
+
+class Command(BaseCommand):
+    help = (
+        'Ajusta en bloque el precio de los productos de una categoría, un proveedor o una lista de ids: '
+        'porcentaje y/o monto fijo más una regla de redondeo. Cada cambio queda en el historial de precios.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categoria', help='Solo productos de esta categoría')
+        parser.add_argument('--proveedor', type=int, help='Solo productos del proveedor con este id')
+        parser.add_argument('--productos', type=int, nargs='+', help='Ids de productos')
+        parser.add_argument('--porcentaje', default='0', help='Porcentaje de aumento (negativo para bajar)')
+        parser.add_argument('--monto', default='0', help='Monto fijo a sumar (negativo para restar)')
+        parser.add_argument('--redondeo', default='centavo', choices=list(precios.REDONDEOS), help='Regla de redondeo')
+
+    def handle(self, *args, **options):
+        try:
+            cambiados = precios.reajustar(
+                precios.seleccionar(options['categoria'], options['proveedor'], options['productos']),
+                porcentaje=options['porcentaje'], monto=options['monto'], redondeo=options['redondeo'],
+            )
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        self.stdout.write(self.style.SUCCESS(f'Precio actualizado en {cambiados} productos.'))
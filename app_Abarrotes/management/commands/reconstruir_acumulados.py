@@ -0,0 +1,45 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from app_Abarrotes import rollups, tareas
+from app_Abarrotes.models import Venta, VentaArchivada
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los acumulados diarios (producto, empleado y categoría) por lotes de días'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primer día (AAAA-MM-DD); por defecto la primera venta')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Último día (AAAA-MM-DD); por defecto hoy')
+        parser.add_argument('--dias-por-lote', type=int, default=7, help='Días procesados por transacción')
+        parser.add_argument('--en-cola', action='store_true', help='Encola la reconstrucción para runworker en lugar de ejecutarla')
+
+    def handle(self, *args, **options):
+        hasta = options['hasta'] or timezone.localdate()
+        desde = options['desde']
+        if desde is None:
+            primeras = [
+                primera for modelo in (Venta, VentaArchivada)
+                if (primera := modelo.objects.aggregate(primera=Min('fecha'))['primera']) is not None
+            ]
+            if not primeras:
+                self.stdout.write('No hay ventas registradas.')
+                return
+            desde = timezone.localdate(min(primeras))
+        if desde > hasta:
+            raise CommandError('--desde debe ser anterior o igual a --hasta')
+
+        if options['en_cola']:
+            tarea = tareas.encolar(
+                'reconstruir_acumulados', desde=desde.isoformat(), hasta=hasta.isoformat(),
+                dias_por_lote=options['dias_por_lote'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Reconstrucción encolada como tarea {tarea.pk}.'))
+            return
+
+        for inicio, fin in rollups.reconstruir_por_lotes(desde, hasta, options['dias_por_lote']):
+            self.stdout.write(f'Acumulados reconstruidos del {inicio} al {fin}')
+        self.stdout.write(self.style.SUCCESS('Reconstrucción terminada.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app_Abarrotes.models import Cliente
+from app_Abarrotes.resumenes import TAMANO_LOTE, actualizar_resumenes
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen de compras de todos los clientes por lotes, incluida la línea base del archivo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Clientes por lote')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        procesados = 0
+        ultimo_id = 0
+        while True:
+            ids = list(
+                Cliente.objects.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:lote]
+            )
+            if not ids:
+                break
+            actualizar_resumenes(ids, con_archivo=True)
+            procesados += len(ids)
+            ultimo_id = ids[-1]
+            self.stdout.write(f'{procesados} clientes procesados...')
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes reconstruidos para {procesados} clientes.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia la base primaria sobre la réplica de lectura (SQLite, API de respaldo en línea). '
+        'Con --cada repite la copia cada N segundos hasta Ctrl+C.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cada', type=float, help='Segundos entre refrescos; sin él se refresca una vez')
+
+    def handle(self, *args, **options):
+        cada = options['cada']
+        try:
+            while True:
+                inicio = time.perf_counter()
+                replicas.refrescar()
+                duracion = time.perf_counter() - inicio
+                self.stdout.write(self.style.SUCCESS(f'Réplica refrescada en {duracion * 1000:.0f} ms.'))
+                if not cada:
+                    return
+                time.sleep(max(0.0, cada - duracion))
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+        except KeyboardInterrupt:
+            pass
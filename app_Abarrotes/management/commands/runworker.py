@@ -0,0 +1,35 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from app_Abarrotes import tareas
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa la cola de tareas en segundo plano (importaciones, exportaciones, miniaturas, '
+        'reconstrucciones) con un pool de hilos o de procesos. Ctrl+C o SIGTERM terminan después '
+        'de esperar a las tareas en curso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, help='Tareas simultáneas (por defecto TAREAS["HILOS"])')
+        parser.add_argument('--procesos', action='store_true', help='Usa procesos en lugar de hilos (tareas de CPU)')
+        parser.add_argument('--una-vez', action='store_true', help='Termina cuando no quedan tareas disponibles')
+        parser.add_argument('--espera', type=float, help='Segundos entre consultas a la cola vacía')
+
+    def handle(self, *args, **options):
+        purgadas = tareas.purgar()
+        if purgadas:
+            self.stdout.write(f'{purgadas} tareas antiguas borradas.')
+
+        trabajador = tareas.Trabajador(options['hilos'], options['procesos'], options['espera'])
+        if not options['una_vez']:
+            for senal in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(senal, lambda *_: trabajador.detener.set())
+        modo = 'procesos' if options['procesos'] else 'hilos'
+        self.stdout.write(
+            f'Trabajador {trabajador.nombre} con {trabajador.hilos} {modo}; tareas: {", ".join(tareas.registradas())}'
+        )
+        ejecutadas = trabajador.trabajar(una_vez=options['una_vez'])
+        self.stdout.write(self.style.SUCCESS(f'{ejecutadas} tareas ejecutadas.'))
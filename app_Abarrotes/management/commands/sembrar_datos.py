@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_Abarrotes.sembrado import LINEAS_POR_VENTA, TAMANO_LOTE, VOLUMEN_POR_DEFECTO, sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos deterministas (empleados, proveedores, productos, clientes, '
+        'ventas y detalles) con inserciones masivas. Se agregan a los existentes; usar flush para empezar de cero.'
+    )
+
+    def add_arguments(self, parser):
+        for modelo, cantidad in VOLUMEN_POR_DEFECTO.items():
+            parser.add_argument(f'--{modelo}', type=int, default=cantidad, help=f'Cantidad de {modelo} (por defecto {cantidad})')
+        parser.add_argument('--lineas-por-venta', type=int, default=LINEAS_POR_VENTA, help='Promedio de detalles por venta')
+        parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás en que se reparten las ventas')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por inserción masiva')
+        parser.add_argument('--sin-derivados', action='store_true',
+                            help='No reconstruir resúmenes de clientes ni acumulados diarios')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        creados = sembrar(
+            volumen={modelo: max(0, options[modelo]) for modelo in VOLUMEN_POR_DEFECTO},
+            lineas_por_venta=max(1, options['lineas_por_venta']),
+            dias=max(1, options['dias']),
+            semilla=options['semilla'],
+            lote=max(1, options['lote']),
+            derivados=not options['sin_derivados'],
+            progreso=lambda mensaje: self.stdout.write(f'[{time.perf_counter() - inicio:7.1f}s] {mensaje}'),
+        )
+        resumen = ', '.join(f'{cantidad} {modelo}' for modelo, cantidad in creados.items())
+        self.stdout.write(self.style.SUCCESS(f'Creados {resumen} en {time.perf_counter() - inicio:.1f}s.'))
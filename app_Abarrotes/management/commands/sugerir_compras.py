@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from app_Abarrotes import reabasto
+
+
+class Command(BaseCommand):
+    help = (
+        'Lista por proveedor los productos en su punto de reorden y la cantidad sugerida a pedir. '
+        'Con --guardar reemplaza las órdenes de compra en borrador por estas listas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--proveedor', type=int, help='Solo el proveedor con este id')
+        parser.add_argument('--guardar', action='store_true', help='Guarda las listas como órdenes de compra en borrador')
+        parser.add_argument('--resumen', action='store_true', help='Solo totales por proveedor, sin las líneas')
+
+    def handle(self, *args, **options):
+        proveedor = options['proveedor']
+        if options['guardar']:
+            ordenes = reabasto.guardar_borradores(proveedor)
+            self.stdout.write(self.style.SUCCESS(f'{len(ordenes)} órdenes de compra guardadas como borrador.'))
+            return
+
+        listas = reabasto.por_proveedor(reabasto.sugerencias(proveedor).iterator())
+        for lista in listas:
+            self.stdout.write(
+                f"{lista['empresa']} (proveedor {lista['proveedor']}): "
+                f"{len(lista['lineas'])} productos, {lista['unidades']} unidades"
+            )
+            if options['resumen']:
+                continue
+            for linea in lista['lineas']:
+                self.stdout.write(
+                    f"  {linea['nombre']}: pedir {linea['sugerida']} "
+                    f"(existencias {linea['existencias']}, reorden {linea['punto_reorden']}, "
+                    f"{linea['velocidad']:.2f} por día)"
+                )
+        if not listas:
+            self.stdout.write('Ningún producto ha llegado a su punto de reorden.')
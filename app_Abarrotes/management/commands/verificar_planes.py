@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_Abarrotes import planes
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra el plan de ejecución de cada consulta crítica y falla si alguna '
+        'recorre una tabla completa u ordena en un B-tree temporal.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filtro', help='Solo las consultas cuyo nombre contenga este texto')
+
+    def handle(self, *args, **options):
+        try:
+            resultados = planes.verificar()
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        degradadas = []
+        for nombre, (texto, problemas) in resultados.items():
+            if options['filtro'] and options['filtro'] not in nombre:
+                continue
+            estilo = self.style.ERROR if problemas else self.style.SUCCESS
+            self.stdout.write(estilo(f'== {nombre}'))
+            self.stdout.write(texto)
+            for problema in problemas:
+                self.stdout.write(self.style.WARNING(f'  -> {problema}'))
+            if problemas:
+                degradadas.append(nombre)
+
+        if degradadas:
+            raise CommandError(f'Planes degradados: {", ".join(degradadas)}')
+        self.stdout.write(self.style.SUCCESS('Todos los planes usan índices.'))
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.15 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+
+def calcular_resumenes(apps, schema_editor):
+    """Resumen inicial de cada cliente con sus ventas actuales, por lotes como resumenes.actualizar_resumenes()"""
+    Cliente = apps.get_model('app_Abarrotes', 'Cliente')
+    DetalleVenta = apps.get_model('app_Abarrotes', 'DetalleVenta')
+    ResumenCliente = apps.get_model('app_Abarrotes', 'ResumenCliente')
+    Venta = apps.get_model('app_Abarrotes', 'Venta')
+    ultimo = DetalleVenta.objects.filter(venta__id_cliente=OuterRef('pk')).order_by('-venta__fecha', '-id')
+    cliente_ids = list(Cliente.objects.values_list('pk', flat=True))
+    for inicio in range(0, len(cliente_ids), 500):
+        lote = cliente_ids[inicio:inicio + 500]
+        ventas = {
+            fila['id_cliente']: fila
+            for fila in (
+                Venta.objects.filter(id_cliente__in=lote)
+                .values('id_cliente')
+                .annotate(num=Count('id'), total=Sum('total'), ultima=Max('fecha'))
+            )
+        }
+        # Por cantidad comprada y, a igual cantidad, por nombre
+        productos = defaultdict(list)
+        for cliente_id, nombre in (
+            DetalleVenta.objects.filter(venta__id_cliente__in=lote)
+            .values('venta__id_cliente', 'producto_id', 'producto__nombre')
+            .annotate(cantidad=Sum('cantidad'))
+            .order_by('venta__id_cliente', '-cantidad', 'producto__nombre')
+            .values_list('venta__id_cliente', 'producto__nombre')
+        ):
+            productos[cliente_id].append(nombre)
+        resumenes = []
+        for cliente_id, producto_id in (
+            Cliente.objects.filter(pk__in=lote)
+            .annotate(producto=Subquery(ultimo.values('producto_id')[:1]))
+            .values_list('pk', 'producto')
+        ):
+            venta = ventas.get(cliente_id, {})
+            nombres = productos[cliente_id]
+            resumenes.append(ResumenCliente(
+                cliente_id=cliente_id,
+                num_compras=venta.get('num', 0),
+                total_gastado=venta.get('total') or 0,
+                ultima_compra=venta.get('ultima'),
+                ultimo_producto_id=producto_id,
+                productos_frecuentes=", ".join(nombres[:3])[:255],
+                productos_distintos=len(nombres),
+            ))
+        ResumenCliente.objects.bulk_create(resumenes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0005_remove_venta_productos_alter_venta_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='app_Abarrotes.cliente')),
+                ('num_compras', models.IntegerField(default=0)),
+                ('total_gastado', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ultima_compra', models.DateTimeField(blank=True, null=True)),
+                ('productos_frecuentes', models.CharField(blank=True, help_text='Los tres productos más comprados', max_length=255)),
+                ('productos_distintos', models.IntegerField(default=0)),
+                ('ultimo_producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_Abarrotes.producto')),
+            ],
+        ),
+        migrations.RunPython(calcular_resumenes, migrations.RunPython.noop),
+    ]
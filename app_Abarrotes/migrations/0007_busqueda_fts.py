@@ -0,0 +1,106 @@
+from django.db import migrations
+
+# Índices de texto completo (SQLite FTS5) para productos y proveedores.
+# `remove_diacritics 2` hace que "azucar" encuentre "Azúcar" y los índices
+# de prefijo aceleran la búsqueda mientras se escribe. Los triggers los
+# mantienen sincronizados con cualquier escritura, incluidas las masivas.
+CREAR = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_producto USING fts5(
+        nombre, categoria, descripcion, proveedor,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_proveedor USING fts5(
+        empresa, contacto, categoria, productos, telefono, email,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '1 2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_producto_ai AFTER INSERT ON app_Abarrotes_producto BEGIN
+        INSERT INTO busqueda_producto(rowid, nombre, categoria, descripcion, proveedor)
+        VALUES (new.id, new.nombre, new.categoria, new.descripcion,
+                (SELECT empresa FROM app_Abarrotes_proveedor WHERE id = new.proveedor_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_producto_au
+    AFTER UPDATE OF nombre, categoria, descripcion, proveedor_id ON app_Abarrotes_producto BEGIN
+        DELETE FROM busqueda_producto WHERE rowid = old.id;
+        INSERT INTO busqueda_producto(rowid, nombre, categoria, descripcion, proveedor)
+        VALUES (new.id, new.nombre, new.categoria, new.descripcion,
+                (SELECT empresa FROM app_Abarrotes_proveedor WHERE id = new.proveedor_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_producto_ad AFTER DELETE ON app_Abarrotes_producto BEGIN
+        DELETE FROM busqueda_producto WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_proveedor_ai AFTER INSERT ON app_Abarrotes_proveedor BEGIN
+        INSERT INTO busqueda_proveedor(rowid, empresa, contacto, categoria, productos, telefono, email)
+        VALUES (new.id, new.empresa, new.contacto, new.categoria, new.productos, new.telefono, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_proveedor_au
+    AFTER UPDATE OF empresa, contacto, categoria, productos, telefono, email ON app_Abarrotes_proveedor BEGIN
+        DELETE FROM busqueda_proveedor WHERE rowid = old.id;
+        INSERT INTO busqueda_proveedor(rowid, empresa, contacto, categoria, productos, telefono, email)
+        VALUES (new.id, new.empresa, new.contacto, new.categoria, new.productos, new.telefono, new.email);
+        UPDATE busqueda_producto SET proveedor = new.empresa
+        WHERE new.empresa IS NOT old.empresa
+          AND rowid IN (SELECT id FROM app_Abarrotes_producto WHERE proveedor_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS busqueda_proveedor_ad AFTER DELETE ON app_Abarrotes_proveedor BEGIN
+        DELETE FROM busqueda_proveedor WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO busqueda_producto(rowid, nombre, categoria, descripcion, proveedor)
+    SELECT p.id, p.nombre, p.categoria, p.descripcion, pr.empresa
+    FROM app_Abarrotes_producto p LEFT JOIN app_Abarrotes_proveedor pr ON pr.id = p.proveedor_id
+    """,
+    """
+    INSERT INTO busqueda_proveedor(rowid, empresa, contacto, categoria, productos, telefono, email)
+    SELECT id, empresa, contacto, categoria, productos, telefono, email FROM app_Abarrotes_proveedor
+    """,
+]
+
+BORRAR = [
+    "DROP TRIGGER IF EXISTS busqueda_producto_ai",
+    "DROP TRIGGER IF EXISTS busqueda_producto_au",
+    "DROP TRIGGER IF EXISTS busqueda_producto_ad",
+    "DROP TRIGGER IF EXISTS busqueda_proveedor_ai",
+    "DROP TRIGGER IF EXISTS busqueda_proveedor_au",
+    "DROP TRIGGER IF EXISTS busqueda_proveedor_ad",
+    "DROP TABLE IF EXISTS busqueda_producto",
+    "DROP TABLE IF EXISTS busqueda_proveedor",
+]
+
+
+def _ejecutar(sentencias):
+    def operacion(apps, schema_editor):
+        # En otros motores la búsqueda usa el respaldo con icontains
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0006_resumencliente'),
+    ]
+
+    operations = [
+        migrations.RunPython(_ejecutar(CREAR), _ejecutar(BORRAR)),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0008_acumulados_diarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['proveedor', 'nombre'], name='producto_proveedor_nombre'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0009_producto_proveedor_nombre'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nombre', 'id'], name='cliente_nombre'),
+        ),
+        migrations.AddIndex(
+            model_name='empleado',
+            index=models.Index(fields=['apellido', 'nombre', 'id'], name='empleado_apellido_nombre'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre', 'id'], name='producto_nombre'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', 'nombre', 'id'], name='producto_categoria_nombre'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('existencias__gt', 0)), fields=['nombre', 'id'], name='producto_con_stock'),
+        ),
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(fields=['empresa', 'id'], name='proveedor_empresa'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha', 'id'], name='venta_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['id_cliente', 'fecha'], name='venta_cliente_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['id_empleado', 'fecha'], name='venta_empleado_fecha'),
+        ),
+    ]
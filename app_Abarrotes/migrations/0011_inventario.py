@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def abrir_cortes(apps, schema_editor):
+    """Corte de apertura: las existencias actuales de cada producto son el punto de partida del libro"""
+    Producto = apps.get_model('app_Abarrotes', 'Producto')
+    CorteInventario = apps.get_model('app_Abarrotes', 'CorteInventario')
+    ahora = django.utils.timezone.now()
+    productos = Producto.objects.values_list('pk', 'existencias').iterator(chunk_size=2000)
+    CorteInventario.objects.bulk_create(
+        (CorteInventario(producto_id=pk, fecha=ahora, existencias=existencias) for pk, existencias in productos),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0010_indices_de_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('existencias', models.IntegerField()),
+                ('ultimo_movimiento', models.BigIntegerField(default=0, help_text='Id del último movimiento incluido')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes', to='app_Abarrotes.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='corte_producto_fecha')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('venta', 'Venta'), ('devolucion', 'Devolución'), ('ajuste', 'Ajuste'), ('entrada', 'Entrada de mercancía')], max_length=20)),
+                ('cantidad', models.IntegerField(help_text='Positiva si entra al inventario, negativa si sale')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='app_Abarrotes.producto')),
+                ('venta', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_Abarrotes.venta')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'id'], name='movimiento_producto')],
+            },
+        ),
+        migrations.RunPython(abrir_cortes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.15 on 2026-10-18 09:29
+
+from django.db import migrations, models
+
+
+def modificada_desde_fecha(apps, schema_editor):
+    """Las ventas existentes se consideran modificadas por última vez cuando se registraron"""
+    Venta = apps.get_model('app_Abarrotes', 'Venta')
+    Venta.objects.update(modificada=models.F('fecha'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0011_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='modificada',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(modificada_desde_fecha, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0013_tareas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField()),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('archivada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('id_cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compras_archivadas', to='app_Abarrotes.cliente')),
+                ('id_empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_archivadas', to='app_Abarrotes.empleado')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('cantidad', models.IntegerField()),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles_archivados', to='app_Abarrotes.producto')),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='detalles', to='app_Abarrotes.ventaarchivada')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['fecha', 'id'], name='venta_archivada_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['id_cliente', 'fecha'], name='venta_archivada_cliente'),
+        ),
+        migrations.AddIndex(
+            model_name='ventaarchivada',
+            index=models.Index(fields=['id_empleado', 'fecha'], name='venta_archivada_empleado'),
+        ),
+    ]
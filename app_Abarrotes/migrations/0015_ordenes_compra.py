@@ -0,0 +1,40 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0014_ventas_archivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrdenCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('borrador', 'Borrador'), ('enviada', 'Enviada')], default='borrador', max_length=20)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ordenes_compra', to='app_Abarrotes.proveedor')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LineaOrdenCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('existencias', models.IntegerField(help_text='Existencias al sugerir la compra')),
+                ('velocidad', models.DecimalField(decimal_places=3, help_text='Unidades vendidas por día', max_digits=12)),
+                ('punto_reorden', models.PositiveIntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Abarrotes.producto')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='app_Abarrotes.ordencompra')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ordencompra',
+            index=models.Index(fields=['estado', 'proveedor'], name='orden_compra_estado'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0015_ordenes_compra'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveVenta',
+            fields=[
+                ('clave', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('creada', models.DateTimeField(default=django.utils.timezone.now)),
+                ('venta', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app_Abarrotes.venta')),
+            ],
+        ),
+    ]
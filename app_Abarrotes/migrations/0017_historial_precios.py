@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0016_claves_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio_anterior', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('origen', models.CharField(choices=[('edicion', 'Edición'), ('importacion', 'Importación de catálogo'), ('ajuste', 'Ajuste masivo')], max_length=20)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='app_Abarrotes.producto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha', 'id'], name='precio_producto_fecha')],
+            },
+        ),
+    ]
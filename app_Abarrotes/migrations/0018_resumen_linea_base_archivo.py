@@ -0,0 +1,84 @@
+# Generated by Django 5.1.15 on 2026-10-18 16:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+
+def calcular_linea_base(apps, schema_editor):
+    """Lo ya archivado pasa a la línea base de cada resumen (ver resumenes.actualizar_archivados)"""
+    Cliente = apps.get_model('app_Abarrotes', 'Cliente')
+    CompraArchivada = apps.get_model('app_Abarrotes', 'CompraArchivada')
+    DetalleVentaArchivado = apps.get_model('app_Abarrotes', 'DetalleVentaArchivado')
+    ResumenCliente = apps.get_model('app_Abarrotes', 'ResumenCliente')
+    VentaArchivada = apps.get_model('app_Abarrotes', 'VentaArchivada')
+
+    ultimo = DetalleVentaArchivado.objects.filter(venta__id_cliente=OuterRef('id_cliente')).order_by('-venta__fecha', '-id')
+    ResumenCliente.objects.bulk_create(
+        (
+            ResumenCliente(
+                cliente_id=fila['id_cliente'], archivadas_num=fila['num'], archivadas_total=fila['total'] or 0,
+                archivadas_ultima=fila['ultima'], archivadas_ultimo_producto_id=fila['producto'],
+            )
+            for fila in VentaArchivada.objects.values('id_cliente').annotate(
+                num=Count('id'), total=Sum('total'), ultima=Max('fecha'),
+                producto=Subquery(ultimo.values('producto_id')[:1]),
+            )
+        ),
+        update_conflicts=True,
+        unique_fields=['cliente'],
+        update_fields=['archivadas_num', 'archivadas_total', 'archivadas_ultima', 'archivadas_ultimo_producto'],
+        batch_size=500,
+    )
+    CompraArchivada.objects.bulk_create(
+        (
+            CompraArchivada(cliente_id=cliente_id, producto_id=producto_id, cantidad=cantidad)
+            for cliente_id, producto_id, cantidad in DetalleVentaArchivado.objects.values(
+                'venta__id_cliente', 'producto_id',
+            ).annotate(cantidad=Sum('cantidad')).values_list('venta__id_cliente', 'producto_id', 'cantidad')
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_Abarrotes', '0017_historial_precios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumencliente',
+            name='archivadas_num',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencliente',
+            name='archivadas_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='resumencliente',
+            name='archivadas_ultima',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resumencliente',
+            name='archivadas_ultimo_producto',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='app_Abarrotes.producto'),
+        ),
+        migrations.CreateModel(
+            name='CompraArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Abarrotes.cliente')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app_Abarrotes.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'producto'), name='unica_compra_archivada')],
+            },
+        ),
+        migrations.RunPython(calcular_linea_base, migrations.RunPython.noop),
+    ]
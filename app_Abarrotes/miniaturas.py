@@ -0,0 +1,129 @@
+"""
+Variantes reducidas de las fotos de empleados y proveedores. Cada foto
+genera, junto al original, una miniatura cuadrada para los listados y una
+versión mediana para los formularios, en JPEG y también en WebP cuando
+Pillow lo soporta:
+
+    empleados/ana.png -> empleados/ana.lista.jpg, empleados/ana.lista.webp,
+                         empleados/ana.detalle.jpg, empleados/ana.detalle.webp
+
+Se generan en la cola de tareas al subir o cambiar la foto (señal
+post_save) y, para las fotos que ya existían, con el comando
+generar_miniaturas.
+"""
+import os
+from io import BytesIO
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+# nombre -> (ancho, alto, recortar al cuadro)
+VARIANTES = {
+    'lista': (100, 100, True),    # se muestra a 50x50: el doble para pantallas de alta densidad
+    'detalle': (400, 400, False),
+}
+CALIDAD_JPEG = 82
+CALIDAD_WEBP = 80
+WEBP = features.check('webp')
+
+
+def formatos():
+    return ['jpg', 'webp'] if WEBP else ['jpg']
+
+
+def ruta_variante(nombre, variante, formato='jpg'):
+    """Nombre en el storage de la variante de la foto `nombre`"""
+    base, _ = os.path.splitext(nombre)
+    return f'{base}.{variante}.{formato}'
+
+
+def variantes_de(nombre):
+    return [ruta_variante(nombre, variante, formato) for variante in VARIANTES for formato in formatos()]
+
+
+def generadas(nombre, storage=None):
+    """Indica si ya existen todas las variantes de la foto `nombre`"""
+    storage = storage or default_storage
+    return all(storage.exists(ruta) for ruta in variantes_de(nombre))
+
+
+def _reducir(imagen, ancho, alto, recortar):
+    if recortar:
+        return ImageOps.fit(imagen, (ancho, alto), Image.LANCZOS)
+    copia = imagen.copy()
+    copia.thumbnail((ancho, alto), Image.LANCZOS)
+    return copia
+
+
+def _codificar(imagen, formato):
+    salida = BytesIO()
+    if formato == 'webp':
+        imagen.save(salida, 'WEBP', quality=CALIDAD_WEBP, method=4)
+    else:
+        if imagen.mode != 'RGB':
+            # JPEG no tiene transparencia: se aplana sobre blanco
+            fondo = Image.new('RGB', imagen.size, 'white')
+            fondo.paste(imagen, mask=imagen.getchannel('A') if 'A' in imagen.getbands() else None)
+            imagen = fondo
+        imagen.save(salida, 'JPEG', quality=CALIDAD_JPEG, optimize=True, progressive=True)
+    return salida.getvalue()
+
+
+def generar(nombre, storage=None, forzar=False):
+    """
+    Genera las variantes de la foto `nombre` y devuelve cuántos archivos
+    escribió. Sin `forzar` no hace nada si ya existen todas. Recibe solo el
+    nombre para poder usarse desde otro proceso.
+    """
+    storage = storage or default_storage
+    if not forzar and generadas(nombre, storage):
+        return 0
+
+    with storage.open(nombre, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        # En JPEG se decodifica directamente a una escala menor: mucho más rápido con fotos grandes
+        mayor = max(max(ancho, alto) for ancho, alto, _ in VARIANTES.values())
+        imagen.draft('RGB', (mayor, mayor))
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.load()
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info or imagen.mode in ('LA', 'PA') else 'RGB')
+
+    escritos = 0
+    for variante, (ancho, alto, recortar) in VARIANTES.items():
+        reducida = _reducir(imagen, ancho, alto, recortar)
+        for formato in formatos():
+            ruta = ruta_variante(nombre, variante, formato)
+            if storage.exists(ruta):
+                storage.delete(ruta)
+            storage.save(ruta, ContentFile(_codificar(reducida, formato)))
+            escritos += 1
+    return escritos
+
+
+def generar_seguro(nombre, forzar=False):
+    """generar() para un pool de procesos: devuelve (nombre, archivos escritos, error o None)"""
+    try:
+        return nombre, generar(nombre, forzar=forzar), None
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        return nombre, 0, str(e)
+
+
+def iniciar_proceso():
+    """Inicializador de los procesos del pool cuando no heredan Django configurado (spawn)"""
+    django.setup()
+
+
+def url(archivo, variante, formato='jpg'):
+    """
+    URL de la variante de un FieldFile; si todavía no se generó (foto
+    anterior al comando de relleno) se usa la del original.
+    """
+    if not archivo:
+        return ''
+    ruta = ruta_variante(archivo.name, variante, formato)
+    if archivo.storage.exists(ruta):
+        return archivo.storage.url(ruta)
+    return archivo.url
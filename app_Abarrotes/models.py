@@ -1,5 +1,14 @@
-from django.db import models
-from django.db.models import Sum, F
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import models, router
+from django.db.models import Sum, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Ventas cuyo total se recalculará al salir de diferir_totales()
+_ventas_diferidas = ContextVar('ventas_diferidas', default=None)
 
 class Empleado(models.Model):
     nombre = models.CharField(max_length=100)
@@ -9,6 +18,11 @@ class Empleado(models.Model):
     fecha_contratacion = models.DateField()
     foto = models.ImageField(upload_to='empleados/', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['apellido', 'nombre', 'id'], name='empleado_apellido_nombre'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
@@ -22,6 +36,11 @@ class Proveedor(models.Model):
     productos = models.TextField(help_text="Productos que provee")
     foto = models.ImageField(upload_to='proveedores/', null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['empresa', 'id'], name='proveedor_empresa'),
+        ]
+
     def __str__(self):
         return f"{self.empresa} - {self.contacto}"
 
@@ -33,9 +52,200 @@ class Producto(models.Model):
     descripcion = models.TextField(blank=True)
     existencias = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Clave natural con la que la importación de catálogo busca productos existentes
+            models.Index(fields=['proveedor', 'nombre'], name='producto_proveedor_nombre'),
+            # Listado y consulta de productos (orden por nombre), en general y por categoría
+            models.Index(fields=['nombre', 'id'], name='producto_nombre'),
+            models.Index(fields=['categoria', 'nombre', 'id'], name='producto_categoria_nombre'),
+            # Solo los productos vendibles: la consulta de los formularios de venta filtra existencias > 0
+            models.Index(fields=['nombre', 'id'], name='producto_con_stock', condition=models.Q(existencias__gt=0)),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar las existencias cargadas para registrar el ajuste si cambian al guardar
+        instance._existencias_original = instance.__dict__.get('existencias')
+        # Y el precio, para el historial de precios
+        instance._precio_original = instance.__dict__.get('precio')
+        # Y la categoría, para mover sus acumulados diarios si cambia
+        instance._categoria_original = instance.__dict__.get('categoria')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # existencias es la proyección del libro de inventario: si no se editó
+        # no se reescribe, porque una venta pudo cambiarla desde que se cargó
+        if (
+            not self._state.adding and kwargs.get('update_fields') is None
+            and getattr(self, '_existencias_original', None) == self.existencias
+        ):
+            diferidos = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name != 'existencias' and campo.attname not in diferidos
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.nombre} - ${self.precio}"
 
+class PrecioHistorico(models.Model):
+    """Cambio del precio de un producto; el precio vigente a una fecha se lee de aquí (ver precios.py)"""
+    EDICION = 'edicion'
+    IMPORTACION = 'importacion'
+    AJUSTE = 'ajuste'
+    ORIGENES = [
+        (EDICION, 'Edición'),
+        (IMPORTACION, 'Importación de catálogo'),
+        (AJUSTE, 'Ajuste masivo'),
+    ]
+
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='historial_precios')
+    precio_anterior = models.DecimalField(max_digits=10, decimal_places=2)
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha = models.DateTimeField(default=timezone.now)
+    origen = models.CharField(max_length=20, choices=ORIGENES)
+
+    class Meta:
+        indexes = [
+            # Último cambio de un producto antes de una fecha
+            models.Index(fields=['producto', 'fecha', 'id'], name='precio_producto_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}: ${self.precio_anterior} -> ${self.precio} ({self.fecha:%d/%m/%Y})"
+
+class MovimientoInventario(models.Model):
+    """
+    Entrada o salida de inventario. Solo se agregan filas: el historial no se
+    edita y las existencias de Producto son la suma de los movimientos.
+    """
+    VENTA = 'venta'
+    DEVOLUCION = 'devolucion'
+    AJUSTE = 'ajuste'
+    ENTRADA = 'entrada'
+    TIPOS = [
+        (VENTA, 'Venta'),
+        (DEVOLUCION, 'Devolución'),
+        (AJUSTE, 'Ajuste'),
+        (ENTRADA, 'Entrada de mercancía'),
+    ]
+
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='movimientos')
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    cantidad = models.IntegerField(help_text="Positiva si entra al inventario, negativa si sale")
+    fecha = models.DateTimeField(default=timezone.now)
+    # Sin restricción de llave foránea: el movimiento conserva el número de venta aunque se borre
+    venta = models.ForeignKey(
+        'Venta', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+',
+    )
+
+    class Meta:
+        indexes = [
+            # Movimientos de un producto posteriores al último corte
+            models.Index(fields=['producto', 'id'], name='movimiento_producto'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} de {self.producto_id}"
+
+class CorteInventario(models.Model):
+    """Existencias de un producto al hacer un corte: la suma de sus movimientos hasta `ultimo_movimiento`"""
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='cortes')
+    fecha = models.DateTimeField()
+    existencias = models.IntegerField()
+    ultimo_movimiento = models.BigIntegerField(default=0, help_text="Id del último movimiento incluido")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='corte_producto_fecha'),
+        ]
+
+    def __str__(self):
+        return f"Corte de {self.producto_id} al {self.fecha:%d/%m/%Y}: {self.existencias}"
+
+class OrdenCompra(models.Model):
+    """Lista de compra a un proveedor; las que sugiere reabasto.py nacen como borrador"""
+    BORRADOR = 'borrador'
+    ENVIADA = 'enviada'
+    ESTADOS = [
+        (BORRADOR, 'Borrador'),
+        (ENVIADA, 'Enviada'),
+    ]
+
+    proveedor = models.ForeignKey('Proveedor', on_delete=models.CASCADE, related_name='ordenes_compra')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=BORRADOR)
+    creada = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'proveedor'], name='orden_compra_estado'),
+        ]
+
+    def __str__(self):
+        return f"Orden {self.id} a {self.proveedor_id} ({self.get_estado_display()})"
+
+class LineaOrdenCompra(models.Model):
+    """Producto a pedir, con los datos del cálculo que lo sugirió"""
+    orden = models.ForeignKey(OrdenCompra, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='+')
+    cantidad = models.PositiveIntegerField()
+    existencias = models.IntegerField(help_text="Existencias al sugerir la compra")
+    velocidad = models.DecimalField(max_digits=12, decimal_places=3, help_text="Unidades vendidas por día")
+    punto_reorden = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.producto_id}"
+
+class Tarea(models.Model):
+    """
+    Trabajo pesado que se ejecuta fuera de la petición (ver tareas.py). La
+    tabla es la cola: el comando runworker toma las pendientes en orden.
+    """
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    TERMINADA = 'terminada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (TERMINADA, 'Terminada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100, help_text="Nombre con el que se registró la función")
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    max_intentos = models.PositiveIntegerField(default=3)
+    progreso = models.PositiveSmallIntegerField(default=0, help_text="Porcentaje completado")
+    mensaje = models.CharField(max_length=255, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    creada = models.DateTimeField(default=timezone.now)
+    # No se toma antes de esta fecha (espera entre reintentos)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    terminada = models.DateTimeField(null=True, blank=True)
+    trabajador = models.CharField(max_length=100, blank=True)
+    # El trabajador lo renueva mientras ejecuta; uno viejo indica que murió
+    latido = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Siguiente tarea pendiente y tareas en curso sin latido
+            models.Index(fields=['estado', 'disponible_desde', 'id'], name='tarea_estado'),
+        ]
+
+    def __str__(self):
+        return f"Tarea {self.id} - {self.nombre} ({self.get_estado_display()})"
+
+    @property
+    def activa(self):
+        return self.estado in (self.PENDIENTE, self.EN_CURSO)
+
 class Cliente(models.Model):
     nombre = models.CharField(max_length=100)
     telefono = models.CharField(max_length=15)
@@ -43,6 +253,11 @@ class Cliente(models.Model):
     fecha_compra = models.DateField(auto_now_add=True)
     direccion = models.TextField()
     id_empleado = models.ForeignKey('Empleado', on_delete=models.CASCADE, related_name='clientes_atendidos')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['nombre', 'id'], name='cliente_nombre'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.telefono}"
@@ -56,37 +271,128 @@ class Cliente(models.Model):
                 productos_comprados.append(detalle.producto)
         return productos_comprados
     
+    def obtener_resumen(self):
+        """Resumen materializado de compras; vacío si el cliente aún no tiene uno"""
+        try:
+            return self.resumen
+        except ResumenCliente.DoesNotExist:
+            return ResumenCliente(cliente=self)
+
     def ultimo_producto_comprado(self):
         """Obtiene el último producto comprado por el cliente"""
-        ultima_venta = self.compras_realizadas.order_by('-fecha').first()
-        if ultima_venta and ultima_venta.detalles.exists():
-            return ultima_venta.detalles.first().producto
-        return None
+        return self.obtener_resumen().ultimo_producto
     
     def productos_comprados_str(self):
         """Retorna string con los productos comprados para mostrar en admin"""
-        productos = self.productos_comprados()
-        if productos:
-            return ", ".join([p.nombre for p in productos[:3]]) + (f" y {len(productos)-3} más..." if len(productos) > 3 else "")
-        return "Sin compras"
+        return self.obtener_resumen().productos_str()
+
+class ResumenCliente(models.Model):
+    """Resumen desnormalizado de las compras de un cliente, mantenido al escribir ventas"""
+    cliente = models.OneToOneField('Cliente', on_delete=models.CASCADE, primary_key=True, related_name='resumen')
+    num_compras = models.IntegerField(default=0)
+    total_gastado = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ultima_compra = models.DateTimeField(null=True, blank=True)
+    ultimo_producto = models.ForeignKey('Producto', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    productos_frecuentes = models.CharField(max_length=255, blank=True, help_text="Los tres productos más comprados")
+    productos_distintos = models.IntegerField(default=0)
+    # Línea base de las compras archivadas (historico.py): se recalcula al
+    # archivar, así el resumen de cada cobro no recorre el archivo
+    archivadas_num = models.IntegerField(default=0)
+    archivadas_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    archivadas_ultima = models.DateTimeField(null=True, blank=True)
+    archivadas_ultimo_producto = models.ForeignKey(
+        'Producto', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+
+    def __str__(self):
+        return f"Resumen de {self.cliente_id} - {self.num_compras} compras"
+
+    def productos_str(self):
+        if not self.productos_frecuentes:
+            return "Sin compras"
+        restantes = self.productos_distintos - 3
+        return self.productos_frecuentes + (f" y {restantes} más..." if restantes > 0 else "")
+
+class CompraArchivada(models.Model):
+    """Cantidad de cada producto en las compras archivadas de un cliente: línea base de ResumenCliente"""
+    cliente = models.ForeignKey('Cliente', on_delete=models.CASCADE, related_name='+')
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='+')
+    cantidad = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'producto'], name='unica_compra_archivada'),
+        ]
+
+class VentaDiariaProducto(models.Model):
+    """Acumulado de ventas por día y producto, mantenido por deltas"""
+    fecha = models.DateField()
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='+')
+    cantidad = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='unica_venta_diaria_producto'),
+        ]
+
+class VentaDiariaEmpleado(models.Model):
+    """Acumulado de ventas por día y empleado, mantenido por deltas"""
+    fecha = models.DateField()
+    empleado = models.ForeignKey('Empleado', on_delete=models.CASCADE, related_name='+')
+    num_ventas = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'empleado'], name='unica_venta_diaria_empleado'),
+        ]
+
+class VentaDiariaCategoria(models.Model):
+    """Acumulado de ventas por día y categoría de producto, mantenido por deltas"""
+    fecha = models.DateField()
+    categoria = models.CharField(max_length=100)
+    cantidad = models.IntegerField(default=0)
+    importe = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='unica_venta_diaria_categoria'),
+        ]
 
 class Venta(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     id_empleado = models.ForeignKey('Empleado', on_delete=models.CASCADE, related_name='ventas_realizadas')
     id_cliente = models.ForeignKey('Cliente', on_delete=models.CASCADE, related_name='compras_realizadas')
+    # Cambia con la venta o cualquiera de sus detalles (también con escrituras
+    # masivas, vía aplicar_deltas/recalcular_totales): clave de la caché de filas
+    modificada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listado de ventas (más recientes primero), rangos de fechas y date_hierarchy del admin
+            models.Index(fields=['fecha', 'id'], name='venta_fecha'),
+            # Ventas de un cliente o de un empleado por fecha (filtros, resúmenes, acumulados)
+            models.Index(fields=['id_cliente', 'fecha'], name='venta_cliente_fecha'),
+            models.Index(fields=['id_empleado', 'fecha'], name='venta_empleado_fecha'),
+        ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar cliente y empleado cargados para refrescar resúmenes y acumulados si cambian
+        instance._cliente_original = instance.__dict__.get('id_cliente_id')
+        instance._empleado_original = instance.__dict__.get('id_empleado_id')
+        return instance
+
     def __str__(self):
         return f"Venta {self.id} - {self.fecha.strftime('%d/%m/%Y')} - ${self.total}"
     
-    def save(self, *args, **kwargs):
-        # Calcular el total automáticamente antes de guardar
-        if self.pk:  # Si la venta ya existe
-            total_detalles = self.detalles.aggregate(
-                total=Sum(F('cantidad') * F('precio_unitario'))
-            )['total'] or 0
-            self.total = total_detalles
-        super().save(*args, **kwargs)
+    def recalcular_total(self):
+        """Recalcula el total desde cero a partir de los detalles"""
+        recalcular_totales([self.pk])
+        self.refresh_from_db(fields=['total'])
 
 class DetalleVenta(models.Model):
     venta = models.ForeignKey('Venta', on_delete=models.CASCADE, related_name='detalles')
@@ -95,11 +401,164 @@ class DetalleVenta(models.Model):
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Recordar los valores cargados para calcular los deltas al guardar
+        campos = ('venta_id', 'producto_id', 'cantidad', 'subtotal')
+        if all(campo in instance.__dict__ for campo in campos):
+            instance._original = {campo: instance.__dict__[campo] for campo in campos}
+        return instance
+
+    def _valores_actuales(self):
+        return {
+            'venta_id': self.venta_id,
+            'producto_id': self.producto_id,
+            'cantidad': self.cantidad,
+            'subtotal': self.subtotal,
+        }
+
     def save(self, *args, **kwargs):
         self.subtotal = self.cantidad * self.precio_unitario
+        agregando = self._state.adding
+        original = getattr(self, '_original', None)
         super().save(*args, **kwargs)
-        # Actualizar el total de la venta
-        self.venta.save()
+
+        # Actualizar el total de la venta sumando solo la diferencia
+        if agregando:
+            deltas = {self.venta_id: self.subtotal}
+        elif original is None:
+            deltas = {self.venta_id: None}
+        else:
+            deltas = {original['venta_id']: -original['subtotal']}
+            deltas[self.venta_id] = deltas.get(self.venta_id, 0) + self.subtotal
+        aplicar_deltas(deltas)
+        self._original = self._valores_actuales()
+
+        # Mantener al día la venta cargada en memoria
+        venta = self._state.fields_cache.get('venta')
+        if venta is not None and deltas[self.venta_id] is not None:
+            venta.total += deltas[self.venta_id]
     
     def __str__(self):
-        return f"Detalle {self.id} - {self.producto.nombre} x{self.cantidad}"
\ No newline at end of file
+        return f"Detalle {self.id} - {self.producto.nombre} x{self.cantidad}"
+
+class ClaveVenta(models.Model):
+    """
+    Clave de idempotencia con la que una caja envió una venta en lote
+    (services.registrar_lote): reenviar la misma clave no duplica la venta.
+    """
+    clave = models.CharField(max_length=100, primary_key=True)
+    # Sin restricción de llave foránea: la clave sigue valiendo aunque la venta se archive o se borre
+    venta = models.ForeignKey('Venta', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    creada = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.clave} -> venta {self.venta_id}"
+
+
+class VentaArchivada(models.Model):
+    """
+    Venta cerrada movida fuera de las tablas de uso diario (ver historico.py).
+    Conserva el id de la venta original y no se edita; solo guarda lo que
+    leen los reportes, las exportaciones y el detalle de clientes.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    fecha = models.DateTimeField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    id_empleado = models.ForeignKey('Empleado', on_delete=models.CASCADE, related_name='ventas_archivadas')
+    id_cliente = models.ForeignKey('Cliente', on_delete=models.CASCADE, related_name='compras_archivadas')
+    archivada = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='venta_archivada_fecha'),
+            models.Index(fields=['id_cliente', 'fecha'], name='venta_archivada_cliente'),
+            models.Index(fields=['id_empleado', 'fecha'], name='venta_archivada_empleado'),
+        ]
+
+    def __str__(self):
+        return f"Venta {self.id} (archivada) - {self.fecha.strftime('%d/%m/%Y')} - ${self.total}"
+
+class DetalleVentaArchivado(models.Model):
+    """Línea de una VentaArchivada, con el id del detalle original"""
+    id = models.BigIntegerField(primary_key=True)
+    venta = models.ForeignKey('VentaArchivada', on_delete=models.CASCADE, related_name='detalles')
+    producto = models.ForeignKey('Producto', on_delete=models.CASCADE, related_name='detalles_archivados')
+    cantidad = models.IntegerField()
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"Detalle {self.id} (archivado) - {self.producto_id} x{self.cantidad}"
+
+
+def recalcular_totales(venta_ids):
+    """Recalcula en un solo UPDATE el total de las ventas indicadas"""
+    venta_ids = [pk for pk in venta_ids if pk is not None]
+    if not venta_ids:
+        return
+    suma = (
+        DetalleVenta.objects.filter(venta=OuterRef('pk'))
+        .values('venta')
+        .annotate(suma=Sum('subtotal'))
+        .values('suma')
+    )
+    Venta.objects.filter(pk__in=venta_ids).update(
+        total=Coalesce(Subquery(suma), Value(Decimal('0')), output_field=models.DecimalField()),
+        modificada=timezone.now(),
+    )
+
+
+def aplicar_deltas(deltas):
+    """
+    Suma a cada venta la diferencia indicada en {venta_id: delta}. Un delta
+    None significa que no se conoce el valor anterior y la venta se recalcula.
+    Dentro de diferir_totales() solo se anotan las ventas afectadas.
+    """
+    pendientes = _ventas_diferidas.get()
+    if pendientes is not None:
+        pendientes.update(pk for pk in deltas if pk is not None)
+        return
+
+    recalcular = []
+    for venta_id, delta in deltas.items():
+        if venta_id is None:
+            continue
+        if delta is None:
+            recalcular.append(venta_id)
+        else:
+            # Aun con delta 0 el detalle cambió (p. ej. de producto)
+            Venta.objects.filter(pk=venta_id).update(total=F('total') + delta, modificada=timezone.now())
+    recalcular_totales(recalcular)
+
+
+@contextmanager
+def diferir_totales():
+    """
+    Para escrituras masivas de detalles: dentro del bloque no se toca el total
+    de las ventas y al salir se recalcula una sola vez cada venta afectada.
+    """
+    if _ventas_diferidas.get() is not None:
+        # Ya estamos dentro de un bloque diferido; el externo recalcula
+        yield
+        return
+
+    pendientes = set()
+    token = _ventas_diferidas.set(pendientes)
+    try:
+        yield
+    finally:
+        _ventas_diferidas.reset(token)
+    recalcular_totales(pendientes)
+
+
+def borrar_sin_senales(queryset):
+    """
+    Borra las filas del queryset con un solo DELETE en la base de escritura,
+    sin cargarlas, sin señales pre/post_delete y sin cascadas. Es para
+    escrituras masivas que ya aplican por su cuenta lo que harían los
+    receptores (stock, acumulados, resúmenes y totales). Es el único lugar que
+    usa QuerySet._raw_delete(), que no es API pública. Devuelve las filas borradas.
+    """
+    return queryset._raw_delete(router.db_for_write(queryset.model))
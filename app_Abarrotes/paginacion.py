@@ -0,0 +1,154 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+TAMANO_POR_DEFECTO = 25
+TAMANO_MAXIMO = 100
+
+
+class PaginaKeyset:
+    """Una página de resultados con los enlaces (querystring) a la siguiente y la anterior"""
+
+    def __init__(self, objetos, tamano, url_siguiente=None, url_anterior=None):
+        self.objetos = objetos
+        self.tamano = tamano
+        self.url_siguiente = url_siguiente
+        self.url_anterior = url_anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras_paginas(self):
+        return bool(self.url_siguiente or self.url_anterior)
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder recorta a milisegundos; el cursor necesita el valor exacto
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _codificar_cursor(valores):
+    texto = json.dumps(valores, cls=_CursorEncoder)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor, modelo, campos):
+    """Devuelve los valores del cursor convertidos al tipo de cada campo, o None si es inválido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if not isinstance(valores, list) or len(valores) != len(campos):
+            return None
+        return [
+            modelo._meta.get_field(campo).to_python(valor)
+            for campo, valor in zip(campos, valores)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+def _filtro_despues_de(orden, valores):
+    """
+    Construye la condición "fila posterior al cursor" para un orden compuesto:
+    (a > x) OR (a = x AND b > y) OR ...  respetando la dirección de cada campo.
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+def _tamano_pagina(request, defecto, maximo):
+    try:
+        tamano = int(request.GET.get('tamano', defecto))
+    except ValueError:
+        return defecto
+    return max(1, min(tamano, maximo))
+
+
+def _url_con(request, **parametros):
+    query = request.GET.copy()
+    for clave in ('despues', 'antes'):
+        query.pop(clave, None)
+    query.update(parametros)
+    return f'?{query.urlencode()}'
+
+
+def _consulta(request, queryset, orden, defecto, maximo):
+    """Consulta de la página pedida (sin ejecutar) y el estado para armar los enlaces"""
+    tamano = _tamano_pagina(request, defecto, maximo)
+    campos = [campo.lstrip('-') for campo in orden]
+    modelo = queryset.model
+
+    hacia_atras = False
+    cursor = None
+    if request.GET.get('antes'):
+        cursor = _decodificar_cursor(request.GET['antes'], modelo, campos)
+        hacia_atras = cursor is not None
+    elif request.GET.get('despues'):
+        cursor = _decodificar_cursor(request.GET['despues'], modelo, campos)
+
+    orden_consulta = _invertir(orden) if hacia_atras else list(orden)
+    consulta = queryset.order_by(*orden_consulta)
+    if cursor is not None:
+        consulta = consulta.filter(_filtro_despues_de(orden_consulta, cursor))
+    return consulta[:tamano + 1], (tamano, campos, cursor, hacia_atras)
+
+
+def _pagina(request, objetos, estado):
+    tamano, campos, cursor, hacia_atras = estado
+    hay_mas = len(objetos) > tamano
+    objetos = objetos[:tamano]
+    if hacia_atras:
+        objetos.reverse()
+
+    def clave(objeto):
+        return _codificar_cursor([getattr(objeto, campo) for campo in campos])
+
+    url_siguiente = url_anterior = None
+    if objetos:
+        if hacia_atras:
+            url_anterior = _url_con(request, antes=clave(objetos[0])) if hay_mas else None
+            url_siguiente = _url_con(request, despues=clave(objetos[-1]))
+        else:
+            url_anterior = _url_con(request, antes=clave(objetos[0])) if cursor is not None else None
+            url_siguiente = _url_con(request, despues=clave(objetos[-1])) if hay_mas else None
+
+    return PaginaKeyset(objetos, tamano, url_siguiente, url_anterior)
+
+
+def paginar_keyset(request, queryset, orden, defecto=TAMANO_POR_DEFECTO, maximo=TAMANO_MAXIMO):
+    """
+    Pagina `queryset` por cursor (keyset) según `orden`, una lista de campos
+    únicos en conjunto (el último debe ser 'id' o '-id'). Solo se leen
+    `tamano + 1` filas por petición, sin OFFSET, así que el costo no crece
+    con el tamaño de la tabla. Usa los parámetros GET `despues`, `antes` y
+    `tamano`; los demás parámetros (filtros) se conservan en los enlaces.
+    """
+    consulta, estado = _consulta(request, queryset, orden, defecto, maximo)
+    return _pagina(request, list(consulta), estado)
+
+
+async def apaginar_keyset(request, queryset, orden, defecto=TAMANO_POR_DEFECTO, maximo=TAMANO_MAXIMO):
+    """paginar_keyset() para vistas asíncronas: lee la página con el ORM asíncrono"""
+    consulta, estado = _consulta(request, queryset, orden, defecto, maximo)
+    return _pagina(request, [objeto async for objeto in consulta], estado)
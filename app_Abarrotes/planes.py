@@ -0,0 +1,118 @@
+"""
+Verificación de planes de ejecución de las consultas más frecuentes.
+
+Cada consulta crítica se arma igual que en su vista o servicio y se pasa
+por EXPLAIN QUERY PLAN (SQLite). Se considera degradada si recorre una
+tabla completa ("SCAN tabla" sin índice) o si tiene que ordenar todo el
+resultado en un B-tree temporal en lugar de leerlo ya ordenado de un índice.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .forms import FiltroProductosForm, FiltroVentasForm
+from .models import (
+    Cliente, CompraArchivada, DetalleVenta, DetalleVentaArchivado, Empleado, Producto, Proveedor, Venta, VentaArchivada,
+    VentaDiariaCategoria,
+)
+from .paginacion import _filtro_despues_de
+
+_ESCANEO_COMPLETO = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)')
+_ORDEN_TEMPORAL = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+
+# Consultas que pueden ordenar en memoria porque solo ordenan las filas de
+# un cliente (el orden mezcla columnas de venta y detalle, ningún índice lo cubre)
+ORDEN_TEMPORAL_PERMITIDO = {'ultimo_producto_de_cliente', 'ultimo_producto_archivado_de_cliente'}
+
+
+def _ventas_filtradas(**filtros):
+    return FiltroVentasForm(filtros).filtrar(Venta.objects.all()).order_by('-fecha', '-id')
+
+
+def _consultas():
+    """nombre -> queryset de cada consulta crítica (con valores de ejemplo)"""
+    ahora = timezone.now()
+    hoy = timezone.localdate()
+    ventas_recientes = Venta.objects.filter(fecha__gte=ahora - timedelta(days=30), fecha__lt=ahora)
+    return {
+        # Listados con paginación keyset (primera página y página siguiente)
+        'ver_ventas': _ventas_filtradas()[:26],
+        'ver_ventas_siguiente': Venta.objects.filter(
+            _filtro_despues_de(['-fecha', '-id'], [ahora, 1000])
+        ).order_by('-fecha', '-id')[:26],
+        'ver_ventas_por_fechas': _ventas_filtradas(desde=hoy - timedelta(days=7), hasta=hoy)[:26],
+        'ver_ventas_por_cliente': _ventas_filtradas(cliente=1)[:26],
+        'ver_ventas_por_empleado': Venta.objects.filter(id_empleado=1).order_by('-fecha', '-id')[:26],
+        'ver_clientes': Cliente.objects.order_by('nombre', 'id')[:26],
+        'ver_empleados': Empleado.objects.order_by('apellido', 'nombre', 'id')[:26],
+        'ver_proveedores': Proveedor.objects.order_by('empresa', 'id')[:26],
+        'ver_productos': Producto.objects.order_by('nombre', 'id')[:26],
+        'ver_productos_por_categoria': FiltroProductosForm({'categoria': 'Lácteos'}).filtrar(
+            Producto.objects.all()
+        ).order_by('nombre', 'id')[:26],
+        # Consulta de productos vendibles de los formularios de venta
+        'productos_con_stock': Producto.objects.filter(existencias__gt=0).order_by('nombre', 'id')[:21],
+        # Detalle de una venta y de las compras de un cliente
+        'detalles_de_venta': DetalleVenta.objects.filter(venta_id=1),
+        'compras_de_cliente': Venta.objects.filter(id_cliente=1).order_by('-fecha'),
+        # Último producto comprado por cada cliente (resúmenes)
+        'ultimo_producto_de_cliente': Cliente.objects.filter(pk__in=[1, 2, 3]).annotate(
+            ultimo=Subquery(
+                DetalleVenta.objects.filter(venta__id_cliente=OuterRef('pk'))
+                .order_by('-venta__fecha', '-id').values('producto_id')[:1]
+            )
+        ),
+        # Historia archivada (ver historico.py)
+        'compras_archivadas_de_cliente': VentaArchivada.objects.filter(id_cliente=1).order_by('-fecha'),
+        'detalles_de_venta_archivada': DetalleVentaArchivado.objects.filter(venta_id=1),
+        'ultimo_producto_archivado_de_cliente': Cliente.objects.filter(pk__in=[1, 2, 3]).annotate(
+            ultimo=Subquery(
+                DetalleVentaArchivado.objects.filter(venta__id_cliente=OuterRef('pk'))
+                .order_by('-venta__fecha', '-id').values('producto_id')[:1]
+            )
+        ),
+        # Línea base del archivo que suma cada resumen de cliente
+        'compras_archivadas_por_producto': CompraArchivada.objects.filter(cliente__in=[1, 2, 3]),
+        'archivables': Venta.objects.filter(
+            fecha__lt=ahora - timedelta(days=365), modificada__lt=ahora - timedelta(days=365),
+        ).order_by('fecha', 'id')[:1000],
+        'detalles_archivados_en_rango': DetalleVentaArchivado.objects.filter(
+            venta__in=VentaArchivada.objects.filter(fecha__gte=ahora - timedelta(days=30), fecha__lt=ahora)
+        ),
+        # Reconstrucción de acumulados y reportes por rango de fechas
+        'detalles_en_rango': DetalleVenta.objects.filter(venta__in=ventas_recientes),
+        'ventas_de_empleado_en_rango': Venta.objects.filter(
+            id_empleado=1, fecha__gte=ahora - timedelta(days=30),
+        ),
+        'reporte_categorias': VentaDiariaCategoria.objects.filter(fecha__gte=hoy - timedelta(days=90)),
+    }
+
+
+def plan(queryset):
+    """Texto de EXPLAIN QUERY PLAN del queryset"""
+    return queryset.explain()
+
+
+def problemas_del_plan(texto, permitir_orden_temporal=False):
+    """Escaneos completos y ordenamientos temporales encontrados en un plan de SQLite"""
+    problemas = [f'recorre toda la tabla {tabla}' for tabla in _ESCANEO_COMPLETO.findall(texto)]
+    if not permitir_orden_temporal and _ORDEN_TEMPORAL.search(texto):
+        problemas.append('ordena en un B-tree temporal')
+    return problemas
+
+
+def verificar():
+    """
+    Devuelve {nombre: (plan, problemas)} de cada consulta crítica. Solo
+    SQLite tiene un formato de plan que se sabe interpretar aquí.
+    """
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError('La verificación de planes solo interpreta EXPLAIN QUERY PLAN de SQLite')
+    resultados = {}
+    for nombre, queryset in _consultas().items():
+        texto = plan(queryset)
+        resultados[nombre] = (texto, problemas_del_plan(texto, nombre in ORDEN_TEMPORAL_PERMITIDO))
+    return resultados
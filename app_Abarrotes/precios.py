@@ -0,0 +1,108 @@
+"""
+Precios de venta: ajustes masivos e historial.
+
+Un ajuste (por categoría, proveedor o lista de productos) es un solo UPDATE
+con el nuevo precio calculado en la base: porcentaje, monto fijo y una regla
+de redondeo. Cada cambio de precio, masivo o individual (formularios,
+list_editable del admin, importación de catálogo), queda en PrecioHistorico,
+así que el precio vigente en cualquier fecha se consulta ahí sin recorrer
+los detalles de venta.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Ceil, Coalesce, Round
+from django.utils import timezone
+
+from . import cache_vistas
+from .models import PrecioHistorico, Producto
+
+_PRECIO = DecimalField(max_digits=10, decimal_places=2)
+
+# nombre -> (descripción, función que redondea la expresión del precio)
+REDONDEOS = {
+    'centavo': ('Al centavo', lambda precio: precio),
+    'diez_centavos': ('A los 10 centavos', lambda precio: Round(precio * 10) / 10),
+    'cincuenta_centavos': ('A los 50 centavos', lambda precio: Round(precio * 2) / 2),
+    'peso': ('Al peso', lambda precio: Round(precio)),
+    # El siguiente precio terminado en .99 (2.50 -> 2.99, 2.99 se queda)
+    'terminacion_99': ('Terminación .99', lambda precio: Ceil(Round(precio + Decimal('0.01'), 2)) - Decimal('0.01')),
+}
+
+
+# ========== AJUSTES MASIVOS ==========
+def seleccionar(categoria=None, proveedor=None, productos=None):
+    """Productos a ajustar; los criterios indicados se combinan (todos deben cumplirse)"""
+    if not (categoria or proveedor or productos):
+        raise ValidationError('Indique una categoría, un proveedor o una lista de productos.')
+    seleccion = Producto.objects.all()
+    if categoria:
+        seleccion = seleccion.filter(categoria=categoria)
+    if proveedor:
+        seleccion = seleccion.filter(proveedor=proveedor)
+    if productos:
+        seleccion = seleccion.filter(pk__in=productos)
+    return seleccion
+
+
+def precio_ajustado(porcentaje=0, monto=0, redondeo='centavo'):
+    """Expresión del nuevo precio: precio × (1 + porcentaje/100) + monto, redondeado"""
+    if redondeo not in REDONDEOS:
+        raise ValidationError(f'Regla de redondeo desconocida: {redondeo}')
+    factor = 1 + Decimal(str(porcentaje)) / 100
+    precio = F('precio') * Value(factor) + Value(Decimal(str(monto)))
+    return ExpressionWrapper(Round(REDONDEOS[redondeo][1](precio), 2), output_field=_PRECIO)
+
+
+def reajustar(seleccion, porcentaje=0, monto=0, redondeo='centavo', origen=PrecioHistorico.AJUSTE):
+    """
+    Aplica el ajuste a los productos de `seleccion` (ver seleccionar()) con
+    un UPDATE y registra en el historial los que cambiaron. Si algún precio
+    quedaría negativo no se cambia ninguno. Devuelve cuántos cambiaron.
+    """
+    nuevo = precio_ajustado(porcentaje, monto, redondeo)
+    cambian = seleccion.alias(nuevo=nuevo).exclude(precio=F('nuevo'))
+    with transaction.atomic():
+        cambios = {
+            pk: (anterior, precio)
+            for pk, anterior, precio in cambian.annotate(precio_nuevo=nuevo).values_list('pk', 'precio', 'precio_nuevo')
+        }
+        negativos = sum(1 for _, precio in cambios.values() if precio < 0)
+        if negativos:
+            raise ValidationError(f'El ajuste dejaría {negativos} productos con precio negativo.')
+        if not cambios:
+            return 0
+        cambian.update(precio=nuevo)
+        registrar(cambios, origen)
+        # El UPDATE masivo no dispara señales
+        cache_vistas.invalidar(Producto)
+    return len(cambios)
+
+
+# ========== HISTORIAL ==========
+def registrar(cambios, origen, fecha=None):
+    """Agrega al historial {producto_id: (precio_anterior, precio)} de los que sí cambiaron"""
+    fecha = fecha or timezone.now()
+    PrecioHistorico.objects.bulk_create([
+        PrecioHistorico(producto_id=pk, precio_anterior=anterior, precio=precio, fecha=fecha, origen=origen)
+        for pk, (anterior, precio) in cambios.items() if anterior != precio
+    ], batch_size=1000)
+
+
+def precios_al(fecha, producto_ids=None):
+    """
+    {producto_id: precio} vigente al momento `fecha`: el del último cambio
+    anterior, o si solo hay cambios posteriores el precio que tenía antes
+    del primero; sin cambios, el precio actual.
+    """
+    productos = Producto.objects.all() if producto_ids is None else Producto.objects.filter(pk__in=producto_ids)
+    anterior = PrecioHistorico.objects.filter(producto=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha', '-id')
+    posterior = PrecioHistorico.objects.filter(producto=OuterRef('pk'), fecha__gt=fecha).order_by('fecha', 'id')
+    return dict(productos.annotate(
+        vigente=Coalesce(
+            Subquery(anterior.values('precio')[:1]), Subquery(posterior.values('precio_anterior')[:1]), F('precio'),
+            output_field=_PRECIO,
+        ),
+    ).values_list('pk', 'vigente'))
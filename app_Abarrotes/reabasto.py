@@ -0,0 +1,134 @@
+"""
+Puntos de reorden y compras sugeridas para todo el catálogo.
+
+La velocidad de venta de cada producto (unidades por día) es el promedio
+ponderado de lo vendido en varias ventanas (VENTANAS), leído de los
+acumulados diarios por producto, que ya incluyen las ventas archivadas.
+Con ella:
+
+- punto de reorden = velocidad × (DIAS_ENTREGA + DIAS_SEGURIDAD)
+- cantidad sugerida = velocidad × (DIAS_ENTREGA + DIAS_SEGURIDAD + DIAS_COBERTURA) - existencias
+
+Todo el cálculo es una sola consulta agregada: las cuentas por ventana y
+las fórmulas son columnas del GROUP BY, y el HAVING deja solo los productos
+en o bajo su punto de reorden, así que nada recorre el catálogo en Python.
+
+Se configura en settings.REABASTO (ver CONFIGURACION_POR_DEFECTO).
+"""
+from datetime import timedelta
+from functools import reduce
+from itertools import groupby
+from operator import add, itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast, Ceil, Coalesce, Round
+from django.utils import timezone
+
+from .models import LineaOrdenCompra, OrdenCompra, VentaDiariaProducto
+
+CONFIGURACION_POR_DEFECTO = {
+    # Días de cada ventana -> peso en la velocidad; la ventana corta sigue la
+    # tendencia reciente y la larga suaviza los días atípicos
+    'VENTANAS': {7: 0.5, 28: 0.3, 91: 0.2},
+    # Días que tarda un pedido en llegar
+    'DIAS_ENTREGA': 7,
+    # Días de venta extra por si la demanda o la entrega se salen de lo normal
+    'DIAS_SEGURIDAD': 3,
+    # Días de venta que debe cubrir el pedido además del punto de reorden
+    'DIAS_COBERTURA': 14,
+}
+
+# Líneas de orden por sentencia INSERT
+LINEAS_POR_SENTENCIA = 500
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'REABASTO', {})}
+
+
+# ========== CÁLCULO ==========
+def sugerencias(proveedor=None, hoy=None):
+    """
+    Productos en o bajo su punto de reorden, ordenados por proveedor y
+    nombre. Cada fila es un dict con producto, nombre, proveedor, empresa,
+    existencias, vendidas_<días> por ventana, velocidad, punto_reorden y
+    sugerida. Es un queryset: se puede paginar o recorrer con iterator().
+    """
+    config = configuracion()
+    hoy = hoy or timezone.localdate()
+    ventanas = config['VENTANAS']
+    dias_reorden = config['DIAS_ENTREGA'] + config['DIAS_SEGURIDAD']
+    dias_objetivo = dias_reorden + config['DIAS_COBERTURA']
+    total_pesos = sum(ventanas.values())
+
+    acumulados = VentaDiariaProducto.objects.filter(fecha__gt=hoy - timedelta(days=max(ventanas)), fecha__lte=hoy)
+    if proveedor is not None:
+        acumulados = acumulados.filter(producto__proveedor=proveedor)
+
+    vendidas = {
+        f'vendidas_{dias}': Coalesce(Sum('cantidad', filter=Q(fecha__gt=hoy - timedelta(days=dias))), 0)
+        for dias in sorted(ventanas)
+    }
+    velocidad = reduce(add, (
+        F(f'vendidas_{dias}') * Value(peso / total_pesos / dias, output_field=FloatField())
+        for dias, peso in ventanas.items()
+    ))
+    # Round: 0.1 × 10 no debe subir a 2 unidades por el error de punto flotante
+    return (
+        acumulados.values(
+            'producto', nombre=F('producto__nombre'), existencias=F('producto__existencias'),
+            proveedor=F('producto__proveedor'), empresa=F('producto__proveedor__empresa'),
+        )
+        .annotate(**vendidas)
+        .annotate(velocidad=ExpressionWrapper(velocidad, output_field=FloatField()))
+        .annotate(
+            punto_reorden=Cast(Ceil(Round(F('velocidad') * dias_reorden, 6)), IntegerField()),
+            sugerida=Cast(Ceil(Round(F('velocidad') * dias_objetivo - F('existencias'), 6)), IntegerField()),
+        )
+        .filter(velocidad__gt=0, existencias__lte=F('punto_reorden'), sugerida__gt=0)
+        .order_by('empresa', 'proveedor', 'nombre', 'producto')
+    )
+
+
+def por_proveedor(filas):
+    """Agrupa las filas de sugerencias() en listas de compra, una por proveedor"""
+    listas = []
+    for (proveedor, empresa), lineas in groupby(filas, key=itemgetter('proveedor', 'empresa')):
+        lineas = list(lineas)
+        listas.append({
+            'proveedor': proveedor,
+            'empresa': empresa,
+            'lineas': lineas,
+            'unidades': sum(linea['sugerida'] for linea in lineas),
+        })
+    return listas
+
+
+# ========== BORRADORES ==========
+def guardar_borradores(proveedor=None, hoy=None):
+    """
+    Reemplaza las órdenes de compra en borrador (de todos los proveedores o
+    solo de `proveedor`) por las sugeridas hoy. Las órdenes enviadas no se
+    tocan. Devuelve las órdenes creadas.
+    """
+    listas = por_proveedor(sugerencias(proveedor, hoy).iterator())
+    with transaction.atomic():
+        borradores = OrdenCompra.objects.filter(estado=OrdenCompra.BORRADOR)
+        if proveedor is not None:
+            borradores = borradores.filter(proveedor=proveedor)
+        # Sin señales en estas tablas: las líneas se van en cascada con un solo DELETE
+        borradores.delete()
+
+        ordenes = OrdenCompra.objects.bulk_create([OrdenCompra(proveedor_id=lista['proveedor']) for lista in listas])
+        LineaOrdenCompra.objects.bulk_create([
+            LineaOrdenCompra(
+                orden=orden, producto_id=linea['producto'], cantidad=linea['sugerida'],
+                existencias=linea['existencias'], velocidad=round(linea['velocidad'], 3),
+                punto_reorden=linea['punto_reorden'],
+            )
+            for orden, lista in zip(ordenes, listas)
+            for linea in lista['lineas']
+        ], batch_size=LINEAS_POR_SENTENCIA)
+    return ordenes
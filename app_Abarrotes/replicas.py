@@ -0,0 +1,212 @@
+"""
+Réplica de lectura: los listados, reportes, exportaciones y listados del
+admin leen de la base `replica` para no competir con los cobros, y todo lo
+demás (escrituras y lecturas que deben ver lo recién escrito) va a la
+primaria.
+
+- Las vistas marcadas con @solo_lectura leen de la réplica en GET/HEAD.
+- Una petición que escribe queda fijada a la primaria: sus lecturas
+  siguientes (dentro de la misma petición) ya no van a la réplica.
+- ReplicaMiddleware deja una cookie al cliente que escribió para que sus
+  siguientes peticiones (p. ej. la redirección al listado después de
+  agregar una venta) lean de la primaria durante FIJAR_SEGUNDOS.
+- Dentro de una transacción siempre se lee de la primaria.
+
+Con SQLite la réplica es una copia local que refrescar() actualiza con la
+API de respaldo en línea (comando refrescar_replica). Se configura en
+settings.REPLICA (ver CONFIGURACION_POR_DEFECTO).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.dispatch import Signal
+
+CONFIGURACION_POR_DEFECTO = {
+    # False: todo se lee de la primaria aunque exista el alias
+    'ACTIVA': False,
+    # Alias de settings.DATABASES de la réplica
+    'ALIAS': 'replica',
+    # Segundos que un cliente lee de la primaria después de escribir; debe
+    # cubrir el retraso de la réplica (el intervalo entre refrescos)
+    'FIJAR_SEGUNDOS': 10,
+    'COOKIE': 'abarrotes_primaria',
+}
+
+# Se envía después de cada refrescar(); las páginas en caché leídas de la
+# réplica dejan de servirse (ver signals.py)
+replica_refrescada = Signal()
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'REPLICA', {})}
+
+
+class _Estado:
+    """Decisión de enrutamiento de la petición en curso"""
+
+    def __init__(self, fijada=False):
+        # El cliente escribió hace poco (cookie de una petición anterior)
+        self.fijada = fijada
+        # Esta petición ya escribió en la primaria
+        self.escribio = False
+        self.lectura = False
+
+
+_estado = ContextVar('estado_replica', default=None)
+
+
+def leyendo_de_replica():
+    """Indica si las lecturas de este momento van a la réplica"""
+    estado = _estado.get()
+    return (
+        estado is not None and estado.lectura and not (estado.fijada or estado.escribio)
+        and configuracion()['ACTIVA'] and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+def alias_lectura():
+    """Alias para lecturas de reportes fuera de una petición (tareas, comandos)"""
+    config = configuracion()
+    return config['ALIAS'] if config['ACTIVA'] else DEFAULT_DB_ALIAS
+
+
+class RouterReplica:
+    """Router de settings.DATABASE_ROUTERS"""
+
+    def db_for_read(self, model, **hints):
+        return configuracion()['ALIAS'] if leyendo_de_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primaria tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe el esquema con los datos al refrescarse
+        if db == configuracion()['ALIAS']:
+            return False
+        return None
+
+
+# ========== PETICIONES ==========
+def _fijada_por_cookie(request):
+    return configuracion()['COOKIE'] in request.COOKIES
+
+
+@contextmanager
+def en_replica(request=None):
+    """
+    Dentro del bloque las lecturas van a la réplica, salvo que el cliente de
+    `request` esté fijado a la primaria o que se escriba en el bloque.
+    """
+    estado = _estado.get()
+    token = None
+    if estado is None:
+        estado = _Estado()
+        token = _estado.set(estado)
+    if request is not None and _fijada_por_cookie(request):
+        estado.fijada = True
+    anterior = estado.lectura
+    estado.lectura = True
+    try:
+        yield
+    finally:
+        estado.lectura = anterior
+        if token is not None:
+            _estado.reset(token)
+
+
+def _renderizar(response):
+    # Las TemplateResponse (admin) consultan al renderizar: se hace dentro del bloque
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    return response
+
+
+def solo_lectura(vista):
+    """Las peticiones GET/HEAD a la vista leen de la réplica (ver en_replica())"""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_async(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await vista(request, *args, **kwargs)
+            with en_replica(request):
+                return _renderizar(await vista(request, *args, **kwargs))
+
+        return envoltura_async
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return vista(request, *args, **kwargs)
+        with en_replica(request):
+            return _renderizar(vista(request, *args, **kwargs))
+
+    return envoltura
+
+
+class ReplicaMiddleware:
+    """Lleva el estado de enrutamiento de cada petición y fija a la primaria a quien escribe"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        estado = _Estado(fijada=_fijada_por_cookie(request))
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._terminar(estado, response)
+
+    async def __acall__(self, request):
+        estado = _Estado(fijada=_fijada_por_cookie(request))
+        token = _estado.set(estado)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _estado.reset(token)
+        return self._terminar(estado, response)
+
+    def _terminar(self, estado, response):
+        config = configuracion()
+        if estado.escribio and config['ACTIVA']:
+            response.set_cookie(config['COOKIE'], '1', max_age=config['FIJAR_SEGUNDOS'], httponly=True, samesite='Lax')
+        return response
+
+
+# ========== REFRESCO ==========
+def refrescar():
+    """
+    Copia la primaria sobre la réplica con la API de respaldo en línea de
+    SQLite. Es una instantánea consistente: con WAL la lectura de la
+    primaria no bloquea a quien escribe, y los lectores de la réplica no
+    bloquean la copia.
+    """
+    alias = configuracion()['ALIAS']
+    if alias not in connections:
+        raise ImproperlyConfigured(f'No existe la base "{alias}" en settings.DATABASES.')
+    origen, destino = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if origen.vendor != 'sqlite' or destino.vendor != 'sqlite':
+        raise ImproperlyConfigured('Solo una réplica SQLite se refresca desde aquí; otra la replica su servidor.')
+    origen.ensure_connection()
+    destino.ensure_connection()
+    origen.connection.backup(destino.connection)
+    replica_refrescada.send(sender=RouterReplica, alias=alias)
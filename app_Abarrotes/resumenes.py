@@ -0,0 +1,187 @@
+import threading
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+
+from .models import (
+    Cliente, CompraArchivada, DetalleVenta, DetalleVentaArchivado, ResumenCliente, Venta, VentaArchivada,
+)
+
+TAMANO_LOTE = 500
+
+_pendientes = threading.local()
+
+
+def programar_resumen(*cliente_ids, archivo=False):
+    """
+    Marca clientes cuyo resumen debe refrescarse. El recálculo se hace cuando
+    la transacción en curso confirma (o de inmediato en modo autocommit); el
+    primer callback vacía todos los pendientes, así que varias escrituras
+    sobre las mismas ventas se resuelven con un solo recálculo por cliente.
+    Con archivo=True (cambiaron sus compras archivadas) también se recalcula
+    su línea base del archivo.
+    """
+    cliente_ids = {pk for pk in cliente_ids if pk is not None}
+    if not cliente_ids:
+        return
+    _pendientes.__dict__.setdefault('ids', set()).update(cliente_ids)
+    if archivo:
+        _pendientes.__dict__.setdefault('archivo', set()).update(cliente_ids)
+    transaction.on_commit(_vaciar_pendientes)
+
+
+def _vaciar_pendientes():
+    ids = getattr(_pendientes, 'ids', None)
+    archivo = getattr(_pendientes, 'archivo', None)
+    _pendientes.ids, _pendientes.archivo = set(), set()
+    if archivo:
+        actualizar_archivados(archivo)
+    if ids:
+        actualizar_resumenes(ids)
+
+
+def actualizar_resumenes(cliente_ids, con_archivo=False):
+    """
+    Recalcula los resúmenes de los clientes indicados con consultas agregadas
+    por lote. Las compras archivadas se toman de la línea base guardada en
+    el resumen; con_archivo=True la recalcula antes desde el archivo.
+    """
+    cliente_ids = list(cliente_ids)
+    for inicio in range(0, len(cliente_ids), TAMANO_LOTE):
+        lote = cliente_ids[inicio:inicio + TAMANO_LOTE]
+        if con_archivo:
+            _actualizar_archivados_lote(lote)
+        _actualizar_lote(lote)
+
+
+def _actualizar_lote(cliente_ids):
+    # Clientes borrados mientras tanto no tienen resumen que guardar
+    activo = DetalleVenta.objects.filter(venta__id_cliente=OuterRef('pk')).order_by('-venta__fecha', '-id')
+    clientes = {}
+    for cliente_id, producto_activo, fecha_activa, *base in (
+        Cliente.objects.filter(pk__in=cliente_ids)
+        .annotate(
+            producto_activo=Subquery(activo.values('producto_id')[:1]),
+            fecha_activa=Subquery(activo.values('venta__fecha')[:1]),
+        )
+        .values_list(
+            'pk', 'producto_activo', 'fecha_activa', 'resumen__archivadas_num', 'resumen__archivadas_total',
+            'resumen__archivadas_ultima', 'resumen__archivadas_ultimo_producto',
+        )
+    ):
+        num, total, ultima, producto_archivado = base
+        archivado_mas_reciente = ultima is not None and (fecha_activa is None or ultima > fecha_activa)
+        clientes[cliente_id] = {
+            'num': num or 0,
+            'total': total or 0,
+            'ultima': ultima,
+            'ultimo_producto': producto_archivado if archivado_mas_reciente else producto_activo,
+        }
+    if not clientes:
+        return
+
+    for fila in (
+        Venta.objects.filter(id_cliente__in=clientes)
+        .values('id_cliente')
+        .annotate(num=Count('id'), total=Sum('total'), ultima=Max('fecha'))
+    ):
+        acumulado = clientes[fila['id_cliente']]
+        acumulado['num'] += fila['num']
+        acumulado['total'] += fila['total'] or 0
+        if acumulado['ultima'] is None or fila['ultima'] > acumulado['ultima']:
+            acumulado['ultima'] = fila['ultima']
+
+    # cliente -> {(nombre, producto_id): cantidad comprada}, activas más la línea base archivada
+    cantidades = defaultdict(Counter)
+    activas = (
+        DetalleVenta.objects.filter(venta__id_cliente__in=clientes)
+        .values('venta__id_cliente', 'producto_id', 'producto__nombre')
+        .annotate(cantidad=Sum('cantidad'))
+        .values_list('venta__id_cliente', 'producto_id', 'producto__nombre', 'cantidad')
+    )
+    archivadas = CompraArchivada.objects.filter(cliente__in=clientes).values_list(
+        'cliente_id', 'producto_id', 'producto__nombre', 'cantidad',
+    )
+    for cliente_id, producto_id, nombre, cantidad in activas.union(archivadas, all=True):
+        cantidades[cliente_id][(nombre, producto_id)] += cantidad
+    productos = {
+        cliente_id: [nombre for (nombre, _), _ in sorted(por_producto.items(), key=lambda par: (-par[1], par[0]))]
+        for cliente_id, por_producto in cantidades.items()
+    }
+
+    resumenes = []
+    for cliente_id, venta in clientes.items():
+        nombres = productos.get(cliente_id, [])
+        resumenes.append(ResumenCliente(
+            cliente_id=cliente_id,
+            num_compras=venta['num'],
+            total_gastado=venta['total'],
+            ultima_compra=venta['ultima'],
+            ultimo_producto_id=venta['ultimo_producto'],
+            productos_frecuentes=", ".join(nombres[:3])[:255],
+            productos_distintos=len(nombres),
+        ))
+
+    ResumenCliente.objects.bulk_create(
+        resumenes,
+        update_conflicts=True,
+        unique_fields=['cliente'],
+        update_fields=[
+            'num_compras', 'total_gastado', 'ultima_compra', 'ultimo_producto',
+            'productos_frecuentes', 'productos_distintos',
+        ],
+    )
+
+
+# ========== LÍNEA BASE DEL ARCHIVO ==========
+def actualizar_archivados(cliente_ids):
+    """
+    Recalcula desde VentaArchivada/DetalleVentaArchivado la línea base del
+    archivo de los clientes indicados. Solo corre cuando el archivo cambia
+    (al archivar ventas o al borrar algo archivado), nunca en el cobro.
+    """
+    cliente_ids = list(cliente_ids)
+    for inicio in range(0, len(cliente_ids), TAMANO_LOTE):
+        _actualizar_archivados_lote(cliente_ids[inicio:inicio + TAMANO_LOTE])
+
+
+def _actualizar_archivados_lote(cliente_ids):
+    ultimo = DetalleVentaArchivado.objects.filter(venta__id_cliente=OuterRef('pk')).order_by('-venta__fecha', '-id')
+    base = {
+        cliente_id: ResumenCliente(cliente_id=cliente_id, archivadas_ultimo_producto_id=producto_id)
+        for cliente_id, producto_id in (
+            Cliente.objects.filter(pk__in=cliente_ids)
+            .annotate(producto=Subquery(ultimo.values('producto_id')[:1]))
+            .values_list('pk', 'producto')
+        )
+    }
+    if not base:
+        return
+    for fila in (
+        VentaArchivada.objects.filter(id_cliente__in=base)
+        .values('id_cliente')
+        .annotate(num=Count('id'), total=Sum('total'), ultima=Max('fecha'))
+    ):
+        resumen = base[fila['id_cliente']]
+        resumen.archivadas_num = fila['num']
+        resumen.archivadas_total = fila['total'] or 0
+        resumen.archivadas_ultima = fila['ultima']
+
+    with transaction.atomic():
+        ResumenCliente.objects.bulk_create(
+            base.values(),
+            update_conflicts=True,
+            unique_fields=['cliente'],
+            update_fields=['archivadas_num', 'archivadas_total', 'archivadas_ultima', 'archivadas_ultimo_producto'],
+        )
+        CompraArchivada.objects.filter(cliente__in=base).delete()
+        CompraArchivada.objects.bulk_create([
+            CompraArchivada(cliente_id=cliente_id, producto_id=producto_id, cantidad=cantidad)
+            for cliente_id, producto_id, cantidad in (
+                DetalleVentaArchivado.objects.filter(venta__id_cliente__in=base)
+                .values('venta__id_cliente', 'producto_id')
+                .annotate(cantidad=Sum('cantidad'))
+                .values_list('venta__id_cliente', 'producto_id', 'cantidad')
+            )
+        ], batch_size=TAMANO_LOTE)
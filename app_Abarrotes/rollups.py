@@ -0,0 +1,202 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    DetalleVenta, DetalleVentaArchivado, Venta, VentaArchivada, VentaDiariaCategoria, VentaDiariaEmpleado,
+    VentaDiariaProducto,
+)
+
+# Filas por sentencia INSERT ... ON CONFLICT (4 parámetros por fila)
+FILAS_POR_SENTENCIA = 200
+
+_acumulador = ContextVar('acumulador_rollups', default=None)
+
+
+def fecha_de(venta):
+    """Día (en la zona horaria local) al que se acumula una venta"""
+    return timezone.localdate(venta.fecha)
+
+
+class Deltas:
+    """Cambios pendientes para las tablas de acumulados diarios"""
+
+    def __init__(self):
+        # clave -> [cantidad o número de ventas, importe]
+        self.productos = defaultdict(lambda: [0, Decimal('0')])
+        self.categorias = defaultdict(lambda: [0, Decimal('0')])
+        self.empleados = defaultdict(lambda: [0, Decimal('0')])
+
+    def linea(self, fecha, empleado_id, producto_id, categoria, cantidad, importe, signo=1, con_producto=True):
+        """Suma (o resta, con signo=-1) una línea de venta a los tres acumulados"""
+        if con_producto:
+            fila = self.productos[(fecha, producto_id)]
+            fila[0] += signo * cantidad
+            fila[1] += signo * importe
+        fila = self.categorias[(fecha, categoria)]
+        fila[0] += signo * cantidad
+        fila[1] += signo * importe
+        self.empleados[(fecha, empleado_id)][1] += signo * importe
+
+    def venta(self, fecha, empleado_id, signo=1, importe=0):
+        """Cuenta (o descuenta) una venta y opcionalmente su importe para el empleado"""
+        fila = self.empleados[(fecha, empleado_id)]
+        fila[0] += signo
+        fila[1] += signo * importe
+
+    def combinar(self, otros):
+        for destino, origen in (
+            (self.productos, otros.productos),
+            (self.categorias, otros.categorias),
+            (self.empleados, otros.empleados),
+        ):
+            for clave, (cantidad, importe) in origen.items():
+                destino[clave][0] += cantidad
+                destino[clave][1] += importe
+
+
+def aplicar(deltas):
+    """Aplica los deltas ahora, o los junta con los del bloque acumular() en curso"""
+    pendientes = _acumulador.get()
+    if pendientes is not None:
+        pendientes.combinar(deltas)
+        return
+    _escribir(deltas)
+
+
+@contextmanager
+def acumular():
+    """Agrupa los deltas de varias escrituras en un solo upsert por tabla al salir"""
+    if _acumulador.get() is not None:
+        yield
+        return
+    pendientes = Deltas()
+    token = _acumulador.set(pendientes)
+    try:
+        yield
+    finally:
+        _acumulador.reset(token)
+    _escribir(pendientes)
+
+
+def _escribir(deltas):
+    _upsert(VentaDiariaProducto, ['fecha', 'producto'], ['cantidad', 'importe'], deltas.productos)
+    _upsert(VentaDiariaCategoria, ['fecha', 'categoria'], ['cantidad', 'importe'], deltas.categorias)
+    _upsert(VentaDiariaEmpleado, ['fecha', 'empleado'], ['num_ventas', 'importe'], deltas.empleados)
+
+
+def _upsert(modelo, claves, valores, filas):
+    """INSERT ... ON CONFLICT DO UPDATE que suma los valores a la fila existente"""
+    filas = [(*clave, *delta) for clave, delta in filas.items() if any(delta)]
+    if not filas:
+        return
+
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    columnas_clave = [qn(modelo._meta.get_field(campo).column) for campo in claves]
+    columnas_valor = [qn(modelo._meta.get_field(campo).column) for campo in valores]
+    actualizacion = ', '.join(f'{col} = {tabla}.{col} + excluded.{col}' for col in columnas_valor)
+    marcadores = '(' + ', '.join(['%s'] * (len(claves) + len(valores))) + ')'
+
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), FILAS_POR_SENTENCIA):
+            lote = filas[inicio:inicio + FILAS_POR_SENTENCIA]
+            cursor.execute(
+                f'INSERT INTO {tabla} ({", ".join(columnas_clave + columnas_valor)}) '
+                f'VALUES {", ".join([marcadores] * len(lote))} '
+                f'ON CONFLICT ({", ".join(columnas_clave)}) DO UPDATE SET {actualizacion}',
+                [valor for fila in lote for valor in fila],
+            )
+
+
+def mover_categorias(cambios):
+    """
+    Pasa lo vendido de productos que cambiaron de categoría
+    ({producto_id: (anterior, nueva)}) de la categoría anterior a la nueva,
+    a partir de sus acumulados por producto: el reporte por categoría
+    agrupa por la categoría actual, igual que reconstruir().
+    """
+    cambios = {pk: categorias for pk, categorias in cambios.items() if categorias[0] != categorias[1]}
+    if not cambios:
+        return
+    deltas = Deltas()
+    for fila in VentaDiariaProducto.objects.filter(producto__in=cambios).values('fecha', 'producto', 'cantidad', 'importe'):
+        anterior, nueva = cambios[fila['producto']]
+        for categoria, signo in ((anterior, -1), (nueva, 1)):
+            acumulado = deltas.categorias[(fila['fecha'], categoria)]
+            acumulado[0] += signo * fila['cantidad']
+            acumulado[1] += signo * fila['importe']
+    aplicar(deltas)
+
+
+# ========== RECONSTRUCCIÓN ==========
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def reconstruir(desde, hasta):
+    """
+    Recalcula desde cero los acumulados de los días [desde, hasta] con
+    consultas agregadas, reemplazando lo que hubiera en ese rango. Incluye
+    las ventas archivadas (ver historico.py).
+    """
+    rango = (_inicio_del_dia(desde), _inicio_del_dia(hasta + timedelta(days=1)))
+    deltas = Deltas()
+    for modelo_venta, modelo_detalle in ((Venta, DetalleVenta), (VentaArchivada, DetalleVentaArchivado)):
+        ventas = modelo_venta.objects.filter(fecha__gte=rango[0], fecha__lt=rango[1])
+        # venta_id IN (...) usa el índice de detalles por venta; filtrar por la
+        # fecha a través del JOIN hace que SQLite recorra todos los detalles
+        detalles = modelo_detalle.objects.filter(venta__in=ventas).annotate(dia=TruncDate('venta__fecha'))
+        for fila in detalles.values('dia', 'producto').annotate(cantidad=Sum('cantidad'), importe=Sum('subtotal')):
+            acumulado = deltas.productos[(fila['dia'], fila['producto'])]
+            acumulado[0] += fila['cantidad']
+            acumulado[1] += fila['importe']
+        for fila in detalles.values('dia', 'producto__categoria').annotate(cantidad=Sum('cantidad'), importe=Sum('subtotal')):
+            acumulado = deltas.categorias[(fila['dia'], fila['producto__categoria'])]
+            acumulado[0] += fila['cantidad']
+            acumulado[1] += fila['importe']
+        for fila in (
+            ventas.annotate(dia=TruncDate('fecha')).values('dia', 'id_empleado')
+            .annotate(num=Count('id', distinct=True), importe=Sum('detalles__subtotal'))
+        ):
+            acumulado = deltas.empleados[(fila['dia'], fila['id_empleado'])]
+            acumulado[0] += fila['num']
+            acumulado[1] += fila['importe'] or 0
+
+    with transaction.atomic():
+        for modelo in (VentaDiariaProducto, VentaDiariaCategoria, VentaDiariaEmpleado):
+            modelo.objects.filter(fecha__gte=desde, fecha__lte=hasta).delete()
+
+        VentaDiariaProducto.objects.bulk_create([
+            VentaDiariaProducto(fecha=dia, producto_id=producto_id, cantidad=cantidad, importe=importe)
+            for (dia, producto_id), (cantidad, importe) in deltas.productos.items()
+        ], batch_size=FILAS_POR_SENTENCIA)
+        VentaDiariaCategoria.objects.bulk_create([
+            VentaDiariaCategoria(fecha=dia, categoria=categoria, cantidad=cantidad, importe=importe)
+            for (dia, categoria), (cantidad, importe) in deltas.categorias.items()
+        ], batch_size=FILAS_POR_SENTENCIA)
+        VentaDiariaEmpleado.objects.bulk_create([
+            VentaDiariaEmpleado(fecha=dia, empleado_id=empleado_id, num_ventas=num, importe=importe)
+            for (dia, empleado_id), (num, importe) in deltas.empleados.items()
+        ], batch_size=FILAS_POR_SENTENCIA)
+
+
+def reconstruir_por_lotes(desde, hasta, dias_por_lote=7):
+    """
+    Reconstruye [desde, hasta] en transacciones de `dias_por_lote` días para
+    no bloquear la base todo el rango; entrega (inicio, fin) de cada lote.
+    """
+    lote = timedelta(days=max(1, dias_por_lote))
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + lote - timedelta(days=1), hasta)
+        reconstruir(inicio, fin)
+        yield inicio, fin
+        inicio = fin + timedelta(days=1)
@@ -0,0 +1,176 @@
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .models import Cliente, CorteInventario, DetalleVenta, Empleado, Producto, Proveedor, Venta
+from .resumenes import actualizar_resumenes
+
+TAMANO_LOTE = 5000
+
+VOLUMEN_POR_DEFECTO = {
+    'empleados': 50,
+    'proveedores': 200,
+    'productos': 5000,
+    'clientes': 20000,
+    'ventas': 200000,
+}
+# Promedio de líneas por venta: 200 mil ventas -> ~1 millón de detalles
+LINEAS_POR_VENTA = 5
+
+NOMBRES = ['Ana', 'Luis', 'María', 'José', 'Carmen', 'Juan', 'Sofía', 'Pedro', 'Lucía', 'Miguel', 'Elena', 'Jorge']
+APELLIDOS = ['García', 'Hernández', 'López', 'Martínez', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Ramírez', 'Torres']
+PUESTOS = ['Cajero', 'Almacenista', 'Encargado', 'Repartidor', 'Gerente']
+CATEGORIAS = [
+    'Abarrotes', 'Lácteos', 'Bebidas', 'Limpieza', 'Botanas', 'Panadería',
+    'Frutas y Verduras', 'Carnes', 'Higiene Personal', 'Dulces',
+]
+PRODUCTOS = [
+    'Azúcar', 'Arroz', 'Frijol', 'Aceite', 'Leche', 'Queso', 'Yogurt', 'Refresco', 'Agua', 'Jabón',
+    'Detergente', 'Cloro', 'Papas', 'Galletas', 'Pan', 'Tortillas', 'Manzana', 'Plátano', 'Pollo', 'Café',
+]
+MARCAS = ['La Costeña', 'Del Valle', 'Doña María', 'El Mexicano', 'San Rafael', 'Santa Clara', 'La Moderna']
+
+
+@contextmanager
+def _fechas_explicitas(*campos):
+    """
+    Desactiva auto_now_add mientras dura el bloque para poder repartir las
+    fechas sintéticas en el tiempo (bulk_create las sobrescribiría con ahora).
+    Solo para este proceso de sembrado; no usar en código de peticiones.
+    """
+    originales = [campo.auto_now_add for campo in campos]
+    for campo in campos:
+        campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, original in zip(campos, originales):
+            campo.auto_now_add = original
+
+
+def _en_lotes(total, tamano):
+    for inicio in range(0, total, tamano):
+        yield inicio, min(inicio + tamano, total)
+
+
+def sembrar(volumen=None, lineas_por_venta=LINEAS_POR_VENTA, dias=365, semilla=42,
+            lote=TAMANO_LOTE, derivados=True, progreso=None):
+    """
+    Genera datos sintéticos con inserciones masivas. Con la misma semilla y
+    volumen produce siempre los mismos datos. Las ventas se reparten en los
+    últimos `dias` días en orden cronológico y llevan su total ya calculado.
+    Con `derivados` se reconstruyen al final los resúmenes de clientes y los
+    acumulados diarios (que las inserciones masivas no disparan).
+    Devuelve los conteos de filas creadas por modelo.
+    """
+    volumen = {**VOLUMEN_POR_DEFECTO, **(volumen or {})}
+    azar = random.Random(semilla)
+    progreso = progreso or (lambda mensaje: None)
+    creados = {}
+
+    empleados = Empleado.objects.bulk_create([
+        Empleado(
+            nombre=azar.choice(NOMBRES), apellido=azar.choice(APELLIDOS), puesto=azar.choice(PUESTOS),
+            salario=Decimal(azar.randrange(8000, 30000)),
+            fecha_contratacion=date(2015, 1, 1) + timedelta(days=azar.randrange(3000)),
+        )
+        for _ in range(volumen['empleados'])
+    ], batch_size=lote)
+    empleado_ids = [empleado.pk for empleado in empleados]
+    creados['empleados'] = len(empleado_ids)
+
+    proveedores = Proveedor.objects.bulk_create([
+        Proveedor(
+            empresa=f'{azar.choice(MARCAS)} {i:05d}', contacto=f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}',
+            telefono=f'55{azar.randrange(10**8):08d}', email=f'ventas{i}@proveedor.com',
+            direccion=f'Calle {azar.randrange(1, 500)}', categoria=azar.choice(CATEGORIAS),
+            productos=', '.join(azar.sample(PRODUCTOS, 3)),
+        )
+        for i in range(volumen['proveedores'])
+    ], batch_size=lote)
+    proveedor_ids = [proveedor.pk for proveedor in proveedores]
+    creados['proveedores'] = len(proveedor_ids)
+    progreso(f'{len(empleado_ids)} empleados y {len(proveedor_ids)} proveedores')
+
+    ahora = timezone.now()
+    primera = ahora - timedelta(days=dias)
+    productos = []  # (id, precio)
+    for inicio, fin in _en_lotes(volumen['productos'], lote):
+        nuevos = Producto.objects.bulk_create([
+            Producto(
+                nombre=f'{azar.choice(PRODUCTOS)} {azar.choice(MARCAS)} {i}', categoria=azar.choice(CATEGORIAS),
+                precio=Decimal(azar.randrange(500, 20000)) / 100, proveedor_id=azar.choice(proveedor_ids),
+                descripcion='Producto generado para pruebas de volumen', existencias=azar.randrange(1000, 100000),
+            )
+            for i in range(inicio, fin)
+        ])
+        productos.extend((producto.pk, producto.precio) for producto in nuevos)
+        # Corte de apertura del libro de inventario (las ventas sintéticas no mueven existencias)
+        CorteInventario.objects.bulk_create([
+            CorteInventario(producto_id=producto.pk, fecha=primera, existencias=producto.existencias)
+            for producto in nuevos
+        ])
+    creados['productos'] = len(productos)
+    progreso(f'{len(productos)} productos')
+
+    fecha_campo = Venta._meta.get_field('fecha')
+    with _fechas_explicitas(fecha_campo, Cliente._meta.get_field('fecha_compra')):
+        cliente_ids = []
+        for inicio, fin in _en_lotes(volumen['clientes'], lote):
+            nuevos = Cliente.objects.bulk_create([
+                Cliente(
+                    nombre=f'{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {i}', telefono=f'55{azar.randrange(10**8):08d}',
+                    correo=f'cliente{i}@correo.com', direccion=f'Avenida {azar.randrange(1, 900)}',
+                    fecha_compra=(ahora - timedelta(days=azar.randrange(dias))).date(),
+                    id_empleado_id=azar.choice(empleado_ids),
+                )
+                for i in range(inicio, fin)
+            ])
+            cliente_ids.extend(cliente.pk for cliente in nuevos)
+        creados['clientes'] = len(cliente_ids)
+        progreso(f'{len(cliente_ids)} clientes')
+
+        total_ventas = volumen['ventas']
+        paso = timedelta(days=dias) / max(total_ventas, 1)
+        creados['ventas'] = creados['detalles'] = 0
+        for inicio, fin in _en_lotes(total_ventas, lote):
+            ventas, lineas = [], []
+            for i in range(inicio, fin):
+                elegidos = azar.sample(productos, min(azar.randint(1, 2 * lineas_por_venta - 1), len(productos)))
+                renglones = [(producto_id, azar.randint(1, 5), precio) for producto_id, precio in elegidos]
+                ventas.append(Venta(
+                    fecha=primera + paso * i, id_cliente_id=azar.choice(cliente_ids),
+                    id_empleado_id=azar.choice(empleado_ids),
+                    total=sum(cantidad * precio for _, cantidad, precio in renglones),
+                ))
+                lineas.append(renglones)
+            with transaction.atomic():
+                Venta.objects.bulk_create(ventas)
+                detalles = DetalleVenta.objects.bulk_create([
+                    DetalleVenta(
+                        venta_id=venta.pk, producto_id=producto_id, cantidad=cantidad,
+                        precio_unitario=precio, subtotal=cantidad * precio,
+                    )
+                    for venta, renglones in zip(ventas, lineas)
+                    for producto_id, cantidad, precio in renglones
+                ], batch_size=lote)
+            creados['ventas'] += len(ventas)
+            creados['detalles'] += len(detalles)
+            progreso(f'{creados["ventas"]} ventas, {creados["detalles"]} detalles')
+
+    if derivados and total_ventas:
+        actualizar_resumenes(cliente_ids)
+        progreso('Resúmenes de clientes reconstruidos')
+        desde = timezone.localdate(primera)
+        hasta = timezone.localdate(ahora)
+        while desde <= hasta:
+            fin_periodo = min(desde + timedelta(days=29), hasta)
+            rollups.reconstruir(desde, fin_periodo)
+            desde = fin_periodo + timedelta(days=1)
+        progreso('Acumulados diarios reconstruidos')
+    return creados
@@ -0,0 +1,415 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import inventario, rollups
+from .models import (
+    Cliente, ClaveVenta, Empleado, Producto, DetalleVenta, MovimientoInventario, Venta, aplicar_deltas,
+    borrar_sin_senales, diferir_totales,
+)
+from .resumenes import programar_resumen
+
+# Líneas de venta aceptadas en una sola llamada a registrar_lote()
+MAX_LINEAS_POR_LOTE = 10000
+
+
+def leer_lineas(data):
+    """Convierte las listas producto/cantidad/precio del POST en líneas de venta"""
+    productos_ids = data.getlist('producto')
+    cantidades = data.getlist('cantidad')
+    precios = data.getlist('precio')
+
+    lineas = []
+    for i, (producto_id, cantidad, precio) in enumerate(zip(productos_ids, cantidades, precios)):
+        if not (producto_id and cantidad and precio):
+            continue
+        try:
+            lineas.append((int(producto_id), int(cantidad), Decimal(precio)))
+        except (ValueError, InvalidOperation) as e:
+            raise ValidationError(f'Error con el producto en posición {i+1}: {str(e)}')
+    return lineas
+
+
+def _cantidades_por_producto(lineas):
+    """Suma las cantidades pedidas de cada producto (puede repetirse en varias líneas)"""
+    cantidades = defaultdict(int)
+    for producto_id, cantidad, _ in lineas:
+        cantidades[producto_id] += cantidad
+    return cantidades
+
+
+def _cargar_y_validar(cantidades):
+    """
+    Carga en una sola consulta los productos involucrados y verifica que haya
+    stock para cada cantidad positiva a descontar. Es solo la validación para
+    el mensaje al usuario: quien garantiza el stock es el UPDATE condicional
+    de inventario.mover(), así que no se bloquean las filas.
+    """
+    productos = Producto.objects.in_bulk(list(cantidades))
+    for producto_id, cantidad in cantidades.items():
+        producto = productos.get(producto_id)
+        if producto is None:
+            raise ValidationError(f'El producto {producto_id} no existe.')
+        if cantidad > producto.existencias:
+            raise ValidationError(f'Stock insuficiente para {producto.nombre}. Stock disponible: {producto.existencias}')
+    return productos
+
+
+def registrar_venta(venta, lineas):
+    """
+    Registra una venta nueva con todas sus líneas usando un número fijo de
+    consultas sin importar el tamaño de la canasta: una lectura de productos,
+    un UPDATE de existencias, INSERT masivos de movimientos de inventario y de
+    detalles y la escritura del total.
+
+    `lineas` es una lista de tuplas (producto_id, cantidad, precio_unitario).
+    """
+    if not lineas:
+        raise ValidationError('Debe agregar al menos un producto válido a la venta.')
+
+    if any(cantidad < 1 for _, cantidad, _ in lineas):
+        raise ValidationError('La cantidad de cada producto debe ser al menos 1.')
+
+    cantidades = _cantidades_por_producto(lineas)
+
+    with transaction.atomic(), rollups.acumular():
+        productos = _cargar_y_validar(cantidades)
+
+        total_venta = sum(cantidad * precio for _, cantidad, precio in lineas)
+        venta.total = total_venta
+        venta.save()
+        inventario.mover({pk: -cantidad for pk, cantidad in cantidades.items()}, MovimientoInventario.VENTA, venta)
+
+        DetalleVenta.objects.bulk_create([
+            DetalleVenta(
+                venta=venta,
+                producto=productos[producto_id],
+                cantidad=cantidad,
+                precio_unitario=precio,
+                subtotal=cantidad * precio,
+            )
+            for producto_id, cantidad, precio in lineas
+        ])
+
+        # Los detalles se insertan en bloque (sin señales): acumular aquí
+        deltas = rollups.Deltas()
+        fecha = rollups.fecha_de(venta)
+        for producto_id, cantidad, precio in lineas:
+            deltas.linea(fecha, venta.id_empleado_id, producto_id, productos[producto_id].categoria, cantidad, cantidad * precio)
+        rollups.aplicar(deltas)
+
+    return venta
+
+
+def editar_venta(venta, lineas):
+    """
+    Actualiza una venta existente aplicando solo la diferencia contra los
+    detalles guardados: las líneas se emparejan por producto, los cambios de
+    cantidad o precio se actualizan en sitio, lo que sobra se borra, lo nuevo
+    se inserta y el stock se ajusta por la diferencia neta de cada producto.
+    Todo ocurre en una transacción con escrituras masivas.
+
+    `lineas` es una lista de tuplas (producto_id, cantidad, precio_unitario).
+    """
+    if any(cantidad < 1 for _, cantidad, _ in lineas):
+        raise ValidationError('La cantidad de cada producto debe ser al menos 1.')
+
+    with transaction.atomic(), diferir_totales(), rollups.acumular():
+        # El total no viene del formulario: se recalcula a partir de los detalles
+        venta.save(update_fields=['id_cliente', 'id_empleado', 'modificada'])
+        existentes = defaultdict(list)
+        for detalle in venta.detalles.select_related('producto'):
+            existentes[detalle.producto_id].append(detalle)
+
+        # Las escrituras en bloque no disparan señales
+        deltas = rollups.Deltas()
+        fecha = rollups.fecha_de(venta)
+
+        # Diferencia neta de stock: lo nuevo menos lo que ya estaba vendido
+        cantidades = _cantidades_por_producto(lineas)
+        for producto_id, detalles in existentes.items():
+            for detalle in detalles:
+                cantidades[producto_id] -= detalle.cantidad
+
+        nuevos, modificados = [], []
+        for producto_id, cantidad, precio in lineas:
+            if existentes.get(producto_id):
+                detalle = existentes[producto_id].pop(0)
+                if detalle.cantidad != cantidad or detalle.precio_unitario != precio:
+                    categoria = detalle.producto.categoria
+                    deltas.linea(fecha, venta.id_empleado_id, producto_id, categoria, detalle.cantidad, detalle.subtotal, signo=-1)
+                    deltas.linea(fecha, venta.id_empleado_id, producto_id, categoria, cantidad, cantidad * precio)
+                    detalle.cantidad = cantidad
+                    detalle.precio_unitario = precio
+                    detalle.subtotal = cantidad * precio
+                    modificados.append(detalle)
+            else:
+                nuevos.append(DetalleVenta(
+                    venta=venta,
+                    producto_id=producto_id,
+                    cantidad=cantidad,
+                    precio_unitario=precio,
+                    subtotal=cantidad * precio,
+                ))
+        borrados = [detalle for detalles in existentes.values() for detalle in detalles]
+        for detalle in borrados:
+            deltas.linea(
+                fecha, venta.id_empleado_id, detalle.producto_id, detalle.producto.categoria,
+                detalle.cantidad, detalle.subtotal, signo=-1,
+            )
+
+        cantidades = {pk: cantidad for pk, cantidad in cantidades.items() if cantidad}
+        if cantidades or nuevos:
+            productos = _cargar_y_validar({
+                **{detalle.producto_id: 0 for detalle in nuevos},
+                **cantidades,
+            })
+            inventario.mover(
+                {pk: -cantidad for pk, cantidad in cantidades.items() if cantidad > 0}, MovimientoInventario.VENTA, venta,
+            )
+            inventario.mover(
+                {pk: -cantidad for pk, cantidad in cantidades.items() if cantidad < 0}, MovimientoInventario.DEVOLUCION, venta,
+            )
+            for detalle in nuevos:
+                deltas.linea(
+                    fecha, venta.id_empleado_id, detalle.producto_id,
+                    productos[detalle.producto_id].categoria, detalle.cantidad, detalle.subtotal,
+                )
+
+        if borrados:
+            # Sin señales, como las otras escrituras: el stock va en la diferencia
+            # neta, los acumulados en `deltas` y el total se recalcula al salir
+            borrar_sin_senales(DetalleVenta.objects.filter(pk__in=[detalle.pk for detalle in borrados]))
+        if modificados:
+            DetalleVenta.objects.bulk_update(modificados, ['cantidad', 'precio_unitario', 'subtotal'])
+        if nuevos:
+            DetalleVenta.objects.bulk_create(nuevos)
+        rollups.aplicar(deltas)
+
+        if borrados or modificados or nuevos:
+            # Marca la venta para recalcular su total una vez al salir del bloque
+            aplicar_deltas({venta.pk: None})
+
+    venta.refresh_from_db(fields=['total'])
+    return venta
+
+
+def borrar_venta(venta):
+    """
+    Borra la venta y devuelve al inventario lo vendido: un movimiento de
+    devolución por producto y un solo UPDATE de existencias.
+    """
+    with transaction.atomic():
+        devueltos = dict(
+            venta.detalles.values('producto_id').annotate(cantidad=Sum('cantidad')).values_list('producto_id', 'cantidad')
+        )
+        inventario.mover(devueltos, MovimientoInventario.DEVOLUCION, venta)
+        venta.delete()
+
+
+# ========== VENTAS EN LOTE ==========
+def _entero(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValidationError(f'{campo} debe ser un número entero.')
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError(f'{campo} debe ser un número entero.')
+
+
+def _leer_venta_de_lote(datos):
+    """(clave, cliente_id, empleado_id, fecha, lineas) de una venta del lote; las líneas pueden no traer precio"""
+    if not isinstance(datos, dict):
+        raise ValidationError('Cada venta debe ser un objeto JSON.')
+    clave = datos.get('clave')
+    if not isinstance(clave, str) or not clave.strip() or len(clave) > ClaveVenta._meta.get_field('clave').max_length:
+        raise ValidationError('La clave de la venta es obligatoria (texto de hasta 100 caracteres).')
+    cliente_id = _entero(datos.get('cliente'), 'cliente')
+    empleado_id = _entero(datos.get('empleado'), 'empleado')
+
+    fecha = None
+    if datos.get('fecha') is not None:
+        fecha = parse_datetime(str(datos['fecha']))
+        if fecha is None:
+            raise ValidationError(f'Fecha inválida: {datos["fecha"]}')
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        if fecha > timezone.now():
+            raise ValidationError('La fecha de la venta no puede estar en el futuro.')
+
+    lineas = []
+    if not isinstance(datos.get('lineas'), list) or not datos['lineas']:
+        raise ValidationError('Debe agregar al menos un producto válido a la venta.')
+    for i, linea in enumerate(datos['lineas']):
+        if not isinstance(linea, dict):
+            raise ValidationError(f'La línea {i + 1} debe ser un objeto JSON.')
+        producto_id = _entero(linea.get('producto'), f'producto de la línea {i + 1}')
+        cantidad = _entero(linea.get('cantidad'), f'cantidad de la línea {i + 1}')
+        if cantidad < 1:
+            raise ValidationError('La cantidad de cada producto debe ser al menos 1.')
+        precio = None
+        if linea.get('precio') is not None:
+            try:
+                precio = Decimal(str(linea['precio']))
+            except InvalidOperation:
+                raise ValidationError(f'Precio inválido en la línea {i + 1}.')
+            if not precio.is_finite() or precio < 0 or precio.as_tuple().exponent < -2:
+                raise ValidationError(f'Precio inválido en la línea {i + 1}.')
+        lineas.append((producto_id, cantidad, precio))
+    return clave, cliente_id, empleado_id, fecha, lineas
+
+
+def _rechazada(clave, error):
+    return {'clave': clave, 'estado': 'rechazada', 'errores': error.messages}
+
+
+def _registrar_lote(ventas):
+    resultados = [None] * len(ventas)
+    leidas = []
+    for i, datos in enumerate(ventas):
+        try:
+            leidas.append((i, *_leer_venta_de_lote(datos)))
+        except ValidationError as e:
+            resultados[i] = _rechazada(datos.get('clave') if isinstance(datos, dict) else None, e)
+
+    with transaction.atomic(), rollups.acumular():
+        # Una consulta por tabla para todo el lote
+        registradas = ClaveVenta.objects.in_bulk([clave for _, clave, *_ in leidas])
+        clientes = Cliente.objects.only('pk').in_bulk({cliente_id for _, _, cliente_id, *_ in leidas})
+        empleados = Empleado.objects.only('pk').in_bulk({empleado_id for _, _, _, empleado_id, *_ in leidas})
+        productos = Producto.objects.only('nombre', 'categoria', 'precio', 'existencias').in_bulk(
+            {producto_id for *_, lineas in leidas for producto_id, _, _ in lineas}
+        )
+        # Stock que queda para las ventas siguientes del lote, en el orden recibido
+        disponibles = {pk: producto.existencias for pk, producto in productos.items()}
+
+        nuevas, repetidas, vistas = [], [], {}
+        for i, clave, cliente_id, empleado_id, fecha, lineas in leidas:
+            if clave in registradas:
+                resultados[i] = {'clave': clave, 'estado': 'duplicada', 'venta': registradas[clave].venta_id}
+                continue
+            if clave in vistas:
+                repetidas.append((i, vistas[clave]))
+                continue
+            vistas[clave] = i
+
+            errores = []
+            if cliente_id not in clientes:
+                errores.append(f'El cliente {cliente_id} no existe.')
+            if empleado_id not in empleados:
+                errores.append(f'El empleado {empleado_id} no existe.')
+            faltantes = sorted({producto_id for producto_id, _, _ in lineas if producto_id not in productos})
+            errores.extend(f'El producto {producto_id} no existe.' for producto_id in faltantes)
+            cantidades = _cantidades_por_producto(lineas)
+            if not faltantes:
+                errores.extend(
+                    f'Stock insuficiente para {productos[pk].nombre}. Stock disponible: {disponibles[pk]}'
+                    for pk, cantidad in cantidades.items() if cantidad > disponibles[pk]
+                )
+            if errores:
+                resultados[i] = _rechazada(clave, ValidationError(errores))
+                continue
+
+            for pk, cantidad in cantidades.items():
+                disponibles[pk] -= cantidad
+            lineas = [
+                (producto_id, cantidad, productos[producto_id].precio if precio is None else precio)
+                for producto_id, cantidad, precio in lineas
+            ]
+            venta = Venta(
+                id_cliente_id=cliente_id, id_empleado_id=empleado_id,
+                total=sum(cantidad * precio for _, cantidad, precio in lineas),
+            )
+            nuevas.append((i, clave, fecha, venta, lineas, cantidades))
+
+        if nuevas:
+            Venta.objects.bulk_create([venta for _, _, _, venta, _, _ in nuevas])
+            # fecha es auto_now_add: la de la caja se escribe después del INSERT
+            con_fecha = []
+            for _, _, fecha, venta, _, _ in nuevas:
+                if fecha is not None:
+                    venta.fecha = fecha
+                    con_fecha.append(venta)
+            if con_fecha:
+                Venta.objects.bulk_update(con_fecha, ['fecha'])
+            ClaveVenta.objects.bulk_create([ClaveVenta(clave=clave, venta=venta) for _, clave, _, venta, _, _ in nuevas])
+            inventario.mover_ventas(
+                {venta: {pk: -cantidad for pk, cantidad in cantidades.items()} for *_, venta, _, cantidades in nuevas},
+                MovimientoInventario.VENTA,
+            )
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(
+                    venta=venta, producto_id=producto_id, cantidad=cantidad,
+                    precio_unitario=precio, subtotal=cantidad * precio,
+                )
+                for _, _, _, venta, lineas, _ in nuevas
+                for producto_id, cantidad, precio in lineas
+            ])
+
+            # Los INSERT masivos no disparan señales: acumulados y resúmenes aquí
+            deltas = rollups.Deltas()
+            for i, clave, _, venta, lineas, _ in nuevas:
+                fecha = rollups.fecha_de(venta)
+                deltas.venta(fecha, venta.id_empleado_id)
+                for producto_id, cantidad, precio in lineas:
+                    deltas.linea(
+                        fecha, venta.id_empleado_id, producto_id, productos[producto_id].categoria,
+                        cantidad, cantidad * precio,
+                    )
+                resultados[i] = {'clave': clave, 'estado': 'creada', 'venta': venta.pk, 'total': str(venta.total)}
+            rollups.aplicar(deltas)
+            programar_resumen(*{venta.id_cliente_id for *_, venta, _, _ in nuevas})
+
+    for i, original in repetidas:
+        resultado = resultados[original]
+        if resultado['estado'] == 'rechazada':
+            resultados[i] = resultado
+        else:
+            resultados[i] = {'clave': resultado['clave'], 'estado': 'duplicada', 'venta': resultado['venta']}
+    return resultados
+
+
+def registrar_lote(ventas):
+    """
+    Registra de una vez las ventas que una caja acumuló sin red. Con un
+    número fijo de consultas, sin importar el tamaño del lote: se leen las
+    claves ya registradas, clientes, empleados y productos, se valida el
+    stock de todo el lote y todo se escribe con INSERT masivos y un UPDATE
+    de existencias en una sola transacción.
+
+    `ventas` es una lista de {clave, cliente, empleado, fecha (opcional, ISO
+    8601), lineas: [{producto, cantidad, precio (opcional)}]}. La clave es
+    de la caja y hace la operación idempotente: una venta con una clave ya
+    registrada no se vuelve a crear. Las ventas inválidas o sin stock (en el
+    orden recibido) se rechazan sin afectar a las demás.
+
+    Devuelve un resultado por venta, en el mismo orden: estado 'creada'
+    (con venta y total), 'duplicada' (con la venta original) o 'rechazada'
+    (con errores).
+    """
+    if not isinstance(ventas, list):
+        raise ValidationError('Se esperaba una lista de ventas.')
+    lineas = sum(
+        len(venta['lineas']) for venta in ventas
+        if isinstance(venta, dict) and isinstance(venta.get('lineas'), list)
+    )
+    if lineas > MAX_LINEAS_POR_LOTE:
+        raise ValidationError(
+            f'El lote tiene {lineas} líneas; el máximo es {MAX_LINEAS_POR_LOTE}.', code='lote_demasiado_grande',
+        )
+    try:
+        return _registrar_lote(ventas)
+    except (IntegrityError, ValidationError):
+        # Otra petición registró alguna de estas claves o consumió stock entre
+        # la lectura y la escritura: se valida de nuevo contra lo ya guardado
+        pass
+    try:
+        return _registrar_lote(ventas)
+    except (IntegrityError, ValidationError) as e:
+        raise ValidationError(f'No se pudo registrar el lote, intente de nuevo: {e}', code='conflicto')
+
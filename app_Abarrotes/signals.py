@@ -0,0 +1,220 @@
+from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache_vistas, inventario, miniaturas, precios, rollups, tareas
+from .replicas import replica_refrescada
+from .models import (
+    Cliente, DetalleVenta, DetalleVentaArchivado, Empleado, MovimientoInventario, PrecioHistorico, Producto,
+    Proveedor, Venta, VentaArchivada, aplicar_deltas,
+)
+from .resumenes import programar_resumen
+
+
+def _borrado_desde(origin, *modelos):
+    """Indica si el borrado viene en cascada desde instancias de alguno de los `modelos`"""
+    return isinstance(origin, modelos) or getattr(origin, 'model', None) in modelos
+
+
+@receiver(post_delete, sender=DetalleVenta)
+def descontar_detalle_borrado(sender, instance, origin=None, **kwargs):
+    # Si se está borrando la venta completa no hay total que mantener
+    if _borrado_desde(origin, Venta, Cliente, Empleado):
+        return
+    aplicar_deltas({instance.venta_id: -instance.subtotal})
+
+
+# ========== INVENTARIO ==========
+@receiver(pre_save, sender=Producto)
+def leer_existencias_guardadas(sender, instance, update_fields=None, **kwargs):
+    # El ajuste es contra lo que hay en la base, no contra lo que se cargó
+    # (pudo haber ventas entre la lectura y el guardado)
+    instance._existencias_en_base = None
+    if not instance._state.adding and (update_fields is None or 'existencias' in update_fields):
+        instance._existencias_en_base = Producto.objects.filter(pk=instance.pk).values_list('existencias', flat=True).first()
+
+
+@receiver(post_save, sender=Producto)
+def registrar_existencias_editadas(sender, instance, created, **kwargs):
+    # Alta con existencias o edición manual (formularios, admin): el libro
+    # registra la diferencia; las ventas pasan por inventario.mover()
+    if created:
+        anterior, tipo = 0, MovimientoInventario.ENTRADA
+    else:
+        anterior, tipo = instance._existencias_en_base, MovimientoInventario.AJUSTE
+    if anterior is not None and instance.existencias != anterior:
+        inventario.registrar({instance.pk: instance.existencias - anterior}, tipo)
+    instance._existencias_original = instance.existencias
+
+
+# ========== HISTORIAL DE PRECIOS ==========
+@receiver(post_save, sender=Producto)
+def registrar_precio_editado(sender, instance, created, **kwargs):
+    # Contra el precio con que se cargó (formularios, list_editable del
+    # admin); los ajustes masivos y la importación registran el suyo
+    anterior = getattr(instance, '_precio_original', None)
+    if not created and anterior is not None and instance.precio != anterior:
+        precios.registrar({instance.pk: (anterior, instance.precio)}, PrecioHistorico.EDICION)
+    instance._precio_original = instance.precio
+
+
+# ========== RESUMEN DE CLIENTES ==========
+@receiver(post_save, sender=Venta)
+def refrescar_resumen_venta(sender, instance, **kwargs):
+    programar_resumen(instance.id_cliente_id, getattr(instance, '_cliente_original', None))
+    instance._cliente_original = instance.id_cliente_id
+
+
+@receiver(post_delete, sender=Venta)
+@receiver(post_delete, sender=VentaArchivada)
+def refrescar_resumen_venta_borrada(sender, instance, origin=None, **kwargs):
+    # Al borrar el cliente su resumen se va con él
+    if _borrado_desde(origin, Cliente):
+        return
+    programar_resumen(instance.id_cliente_id, archivo=sender is VentaArchivada)
+
+
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def refrescar_resumen_detalle(sender, instance, origin=None, **kwargs):
+    # En cascada desde la venta, el receptor de la venta ya lo programa
+    if _borrado_desde(origin, Venta, Cliente, Empleado):
+        return
+    venta = instance._state.fields_cache.get('venta')
+    if venta is not None:
+        cliente_id = venta.id_cliente_id
+    else:
+        cliente_id = Venta.objects.filter(pk=instance.venta_id).values_list('id_cliente', flat=True).first()
+    programar_resumen(cliente_id)
+
+
+# ========== ACUMULADOS DIARIOS ==========
+@receiver(post_save, sender=Venta)
+def acumular_venta(sender, instance, created, **kwargs):
+    empleado_anterior = getattr(instance, '_empleado_original', None)
+    instance._empleado_original = instance.id_empleado_id
+    fecha = rollups.fecha_de(instance)
+    deltas = rollups.Deltas()
+    if created:
+        deltas.venta(fecha, instance.id_empleado_id)
+    elif empleado_anterior is not None and empleado_anterior != instance.id_empleado_id:
+        # Cambió el empleado: la venta y su importe actual pasan al nuevo
+        importe = instance.detalles.aggregate(importe=Sum('subtotal'))['importe'] or 0
+        deltas.venta(fecha, empleado_anterior, signo=-1, importe=importe)
+        deltas.venta(fecha, instance.id_empleado_id, importe=importe)
+    rollups.aplicar(deltas)
+
+
+@receiver(pre_delete, sender=Venta)
+@receiver(pre_delete, sender=VentaArchivada)
+def desacumular_venta(sender, instance, **kwargs):
+    # Antes de borrar, mientras los detalles aún existen
+    fecha = rollups.fecha_de(instance)
+    deltas = rollups.Deltas()
+    deltas.venta(fecha, instance.id_empleado_id, signo=-1)
+    for fila in instance.detalles.values('producto_id', 'producto__categoria').annotate(
+        cantidad=Sum('cantidad'), importe=Sum('subtotal')
+    ):
+        deltas.linea(
+            fecha, instance.id_empleado_id, fila['producto_id'], fila['producto__categoria'],
+            fila['cantidad'], fila['importe'], signo=-1,
+        )
+    rollups.aplicar(deltas)
+
+
+@receiver(post_save, sender=Producto)
+def mover_acumulados_de_categoria(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_categoria_original', None)
+    if not created and anterior is not None:
+        rollups.mover_categorias({instance.pk: (anterior, instance.categoria)})
+    instance._categoria_original = instance.categoria
+
+
+def _acumular_linea(deltas, venta, producto_id, cantidad, importe, signo=1, con_producto=True):
+    categoria = Producto.objects.filter(pk=producto_id).values_list('categoria', flat=True).first()
+    deltas.linea(
+        rollups.fecha_de(venta), venta.id_empleado_id, producto_id, categoria,
+        cantidad, importe, signo=signo, con_producto=con_producto,
+    )
+
+
+@receiver(post_save, sender=DetalleVenta)
+def acumular_detalle(sender, instance, created, **kwargs):
+    original = getattr(instance, '_original', None)
+    if not created and original is None:
+        return
+    deltas = rollups.Deltas()
+    venta = instance.venta
+    if not created:
+        if original == instance._valores_actuales():
+            return
+        # La venta en caché puede ser anterior a un cambio de empleado: se lee de la base
+        venta_anterior = Venta.objects.only('fecha', 'id_empleado').get(pk=original['venta_id'])
+        _acumular_linea(
+            deltas, venta_anterior, original['producto_id'], original['cantidad'], original['subtotal'], signo=-1,
+        )
+        if venta_anterior.pk == instance.venta_id:
+            venta = venta_anterior
+        else:
+            venta = Venta.objects.only('fecha', 'id_empleado').get(pk=instance.venta_id)
+    _acumular_linea(deltas, venta, instance.producto_id, instance.cantidad, instance.subtotal)
+    rollups.aplicar(deltas)
+
+
+@receiver(post_delete, sender=DetalleVenta)
+def desacumular_detalle(sender, instance, origin=None, **kwargs):
+    # En cascada desde la venta, desacumular_venta ya lo descontó
+    if _borrado_desde(origin, Venta, Cliente, Empleado):
+        return
+    deltas = rollups.Deltas()
+    venta = Venta.objects.only('fecha', 'id_empleado').get(pk=instance.venta_id)
+    # Si se borra el producto, sus filas de acumulado se van en cascada
+    _acumular_linea(
+        deltas, venta, instance.producto_id, instance.cantidad, instance.subtotal,
+        signo=-1, con_producto=not _borrado_desde(origin, Producto),
+    )
+    rollups.aplicar(deltas)
+
+
+# ========== VENTAS ARCHIVADAS ==========
+@receiver(post_delete, sender=DetalleVentaArchivado)
+def descontar_detalle_archivado(sender, instance, origin=None, **kwargs):
+    # El archivo no se edita; sus líneas solo se borran en cascada, y desde
+    # la venta, el cliente o el empleado ya lo resuelven los receptores de la venta
+    if _borrado_desde(origin, VentaArchivada, Cliente, Empleado):
+        return
+    VentaArchivada.objects.filter(pk=instance.venta_id).update(total=F('total') - instance.subtotal)
+    venta = VentaArchivada.objects.only('fecha', 'id_empleado', 'id_cliente').get(pk=instance.venta_id)
+    deltas = rollups.Deltas()
+    _acumular_linea(
+        deltas, venta, instance.producto_id, instance.cantidad, instance.subtotal,
+        signo=-1, con_producto=not _borrado_desde(origin, Producto),
+    )
+    rollups.aplicar(deltas)
+    programar_resumen(venta.id_cliente_id, archivo=True)
+
+
+# ========== MINIATURAS ==========
+@receiver(post_save, sender=Empleado)
+@receiver(post_save, sender=Proveedor)
+def generar_miniaturas(sender, instance, **kwargs):
+    # Una foto nueva tiene otro nombre, así que sus variantes aún no existen;
+    # guardar sin cambiar la foto no encola nada
+    if instance.foto and not miniaturas.generadas(instance.foto.name):
+        tareas.encolar('generar_miniaturas', nombre=instance.foto.name)
+
+
+# ========== CACHÉ DE PÁGINAS ==========
+@receiver(post_save, sender=Empleado)
+@receiver(post_delete, sender=Empleado)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_delete, sender=Proveedor)
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_paginas(sender, **kwargs):
+    cache_vistas.invalidar(sender)
+
+
+@receiver(replica_refrescada)
+def invalidar_paginas_de_replica(sender, **kwargs):
+    cache_vistas.invalidar_replica()
@@ -0,0 +1,310 @@
+"""
+Cola de trabajos en la propia base de datos, para lo que no debe ocupar a un
+worker web durante la petición (importaciones, exportaciones, miniaturas,
+reconstrucciones). No necesita un broker externo: la tabla Tarea es la cola
+y el comando runworker la procesa con un pool de hilos o de procesos.
+
+    @tarea('mi_trabajo')
+    def mi_trabajo(progreso, desde, hasta):
+        ...
+        progreso(hechos, total, 'Procesando...')
+        return {'filas': hechos}          # se guarda como JSON
+
+    encolar('mi_trabajo', desde='2024-01-01', hasta='2024-01-31')
+
+Los argumentos y el resultado deben ser serializables a JSON. Una tarea que
+lanza una excepción se reintenta con espera exponencial hasta agotar sus
+intentos; ValidationError se considera definitiva (los mismos datos
+volverían a fallar). Si un trabajador muere, sus tareas dejan de recibir
+latido y otro trabajador las devuelve a la cola.
+
+Se configura en settings.TAREAS (ver CONFIGURACION_POR_DEFECTO).
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger('app_Abarrotes.tareas')
+
+CONFIGURACION_POR_DEFECTO = {
+    # Ejecuta cada tarea en el mismo proceso al confirmar la transacción que
+    # la encoló, sin trabajador (desarrollo y pruebas)
+    'INMEDIATO': False,
+    # Tareas simultáneas por trabajador
+    'HILOS': 4,
+    # Segundos entre consultas cuando la cola está vacía
+    'ESPERA': 1.0,
+    'MAX_INTENTOS': 3,
+    # Segundos antes del primer reintento; se duplica en cada intento
+    'RETRASO_REINTENTO': 30,
+    # Cada cuántos segundos el trabajador renueva el latido de sus tareas
+    'LATIDO': 10,
+    # Una tarea en curso sin latido por este tiempo se da por abandonada
+    'TIEMPO_ABANDONO': 120,
+    # Días que se conservan las tareas terminadas o fallidas
+    'CONSERVAR_DIAS': 7,
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_POR_DEFECTO, **getattr(settings, 'TAREAS', {})}
+
+
+# ========== REGISTRO ==========
+_registro = {}
+
+
+def tarea(nombre=None, max_intentos=None):
+    """Registra la función como tarea; recibe `progreso` y los argumentos con que se encoló"""
+    def decorador(funcion):
+        _registro[nombre or funcion.__name__] = (funcion, max_intentos)
+        return funcion
+    return decorador
+
+
+def registradas():
+    return sorted(_registro)
+
+
+def encolar(nombre, /, **argumentos):
+    """
+    Agrega una tarea pendiente y la devuelve. Si se encola dentro de una
+    transacción, el trabajador no la ve hasta que se confirme.
+    """
+    if nombre not in _registro:
+        raise ValueError(f'Tarea no registrada: {nombre}')
+    config = configuracion()
+    nueva = Tarea.objects.create(
+        nombre=nombre, argumentos=argumentos, max_intentos=_registro[nombre][1] or config['MAX_INTENTOS'],
+    )
+    if config['INMEDIATO']:
+        transaction.on_commit(lambda: ejecutar_ahora(nueva.pk))
+    return nueva
+
+
+def ejecutar_ahora(tarea_id):
+    """Toma y ejecuta en este proceso una tarea pendiente concreta"""
+    if tomar('inmediato', tarea_id) is not None:
+        ejecutar(tarea_id)
+
+
+# ========== EJECUCIÓN ==========
+class Progreso:
+    """
+    Se pasa como primer argumento a cada tarea para informar su avance. Las
+    llamadas frecuentes se descartan: se escribe como mucho cada INTERVALO
+    segundos, salvo al llegar al 100 %.
+    """
+    INTERVALO = 0.5
+
+    def __init__(self, tarea_id):
+        self.tarea_id = tarea_id
+        self._ultima = None
+
+    def __call__(self, hecho, total=None, mensaje=''):
+        porcentaje = min(100, int(hecho * 100 / total)) if total else None
+        ahora = time.monotonic()
+        if self._ultima is not None and ahora - self._ultima < self.INTERVALO and porcentaje != 100:
+            return
+        self._ultima = ahora
+        campos = {'mensaje': mensaje[:255], 'latido': timezone.now()}
+        if porcentaje is not None:
+            campos['progreso'] = porcentaje
+        Tarea.objects.filter(pk=self.tarea_id, estado=Tarea.EN_CURSO).update(**campos)
+
+
+def tomar(trabajador, tarea_id=None):
+    """
+    Marca como en curso la siguiente tarea disponible (o la indicada) y
+    devuelve su id; None si no hay. El UPDATE condicional garantiza que dos
+    trabajadores no tomen la misma tarea sin bloquear filas.
+    """
+    while True:
+        ahora = timezone.now()
+        disponibles = Tarea.objects.filter(estado=Tarea.PENDIENTE, disponible_desde__lte=ahora)
+        if tarea_id is not None:
+            disponibles = disponibles.filter(pk=tarea_id)
+        siguiente = disponibles.order_by('disponible_desde', 'id').values_list('pk', flat=True).first()
+        if siguiente is None:
+            return None
+        tomada = Tarea.objects.filter(pk=siguiente, estado=Tarea.PENDIENTE).update(
+            estado=Tarea.EN_CURSO, intentos=F('intentos') + 1, iniciada=ahora, latido=ahora,
+            trabajador=trabajador[:100], progreso=0, mensaje='',
+        )
+        if tomada:
+            return siguiente
+
+
+def ejecutar(tarea_id):
+    """
+    Ejecuta una tarea ya tomada y guarda su resultado o su error. No lanza
+    excepciones, así que se puede enviar tal cual a un pool.
+    """
+    try:
+        tarea = Tarea.objects.get(pk=tarea_id)
+        if tarea.nombre not in _registro:
+            _fallar(tarea_id, ValidationError(f'Tarea no registrada: {tarea.nombre}'), '')
+            return
+        funcion, _ = _registro[tarea.nombre]
+        resultado = funcion(Progreso(tarea_id), **tarea.argumentos)
+    except Exception as e:
+        _fallar(tarea_id, e, traceback.format_exc())
+    else:
+        Tarea.objects.filter(pk=tarea_id).update(
+            estado=Tarea.TERMINADA, progreso=100, resultado=resultado, error='', terminada=timezone.now(),
+        )
+
+
+def _ejecutar_en_pool(tarea_id):
+    # Como en una petición: cada hilo o proceso del pool reutiliza su conexión
+    # mientras siga sana y dentro de CONN_MAX_AGE
+    close_old_connections()
+    try:
+        ejecutar(tarea_id)
+    finally:
+        close_old_connections()
+
+
+def _fallar(tarea_id, error, detalle):
+    """Devuelve la tarea a la cola con espera exponencial o la marca fallida si no le quedan intentos"""
+    tarea = Tarea.objects.filter(pk=tarea_id).values('nombre', 'intentos', 'max_intentos').first()
+    if tarea is None:
+        return
+    mensaje = ' '.join(error.messages) if isinstance(error, ValidationError) else str(error) or repr(error)
+    ahora = timezone.now()
+    if not isinstance(error, ValidationError) and tarea['intentos'] < tarea['max_intentos']:
+        espera = configuracion()['RETRASO_REINTENTO'] * 2 ** (tarea['intentos'] - 1)
+        Tarea.objects.filter(pk=tarea_id).update(
+            estado=Tarea.PENDIENTE, disponible_desde=ahora + timedelta(seconds=espera),
+            mensaje=f'Intento {tarea["intentos"]} de {tarea["max_intentos"]} falló: {mensaje}'[:255],
+            error=detalle or mensaje,
+        )
+        logger.warning('Tarea %s (%s) falló, se reintentará en %s s: %s', tarea_id, tarea['nombre'], espera, mensaje)
+    else:
+        Tarea.objects.filter(pk=tarea_id).update(
+            estado=Tarea.FALLIDA, mensaje=mensaje[:255], error=detalle or mensaje, terminada=ahora,
+        )
+        logger.error('Tarea %s (%s) falló: %s', tarea_id, tarea['nombre'], mensaje)
+
+
+# ========== MANTENIMIENTO ==========
+def recuperar_abandonadas():
+    """
+    Tareas en curso cuyo trabajador dejó de dar latido: vuelven a la cola si
+    les quedan intentos y si no se marcan fallidas. Devuelve cuántas.
+    """
+    ahora = timezone.now()
+    abandonadas = Tarea.objects.filter(
+        estado=Tarea.EN_CURSO, latido__lt=ahora - timedelta(seconds=configuracion()['TIEMPO_ABANDONO']),
+    )
+    reanudadas = abandonadas.filter(intentos__lt=F('max_intentos')).update(
+        estado=Tarea.PENDIENTE, disponible_desde=ahora, mensaje='El trabajador dejó de responder; se reintentará',
+    )
+    fallidas = abandonadas.update(
+        estado=Tarea.FALLIDA, mensaje='El trabajador dejó de responder', terminada=ahora,
+    )
+    return reanudadas + fallidas
+
+
+def purgar(dias=None):
+    """Borra las tareas terminadas o fallidas hace más de `dias` días; devuelve cuántas"""
+    dias = configuracion()['CONSERVAR_DIAS'] if dias is None else dias
+    return Tarea.objects.filter(
+        estado__in=[Tarea.TERMINADA, Tarea.FALLIDA], terminada__lt=timezone.now() - timedelta(days=dias),
+    ).delete()[0]
+
+
+# ========== TRABAJADOR ==========
+def iniciar_proceso():
+    """Inicializador de los procesos del pool cuando no heredan Django configurado (spawn)"""
+    django.setup()
+
+
+class Trabajador:
+    """
+    Bucle del comando runworker: toma tareas mientras haya lugar en el pool,
+    renueva el latido de las que ejecuta y devuelve a la cola las de
+    trabajadores caídos. `detener` termina el bucle después de esperar a las
+    tareas en curso.
+    """
+
+    def __init__(self, hilos=None, procesos=False, espera=None, nombre=None):
+        config = configuracion()
+        self.hilos = max(1, hilos or config['HILOS'])
+        self.procesos = procesos
+        self.espera = config['ESPERA'] if espera is None else espera
+        self.latido = config['LATIDO']
+        self.nombre = nombre or f'{socket.gethostname()}:{os.getpid()}'
+        self.detener = threading.Event()
+        self._en_curso = {}
+
+    def _pool(self):
+        if self.procesos:
+            # Los procesos hijos no deben heredar las conexiones abiertas del padre
+            connections.close_all()
+            return ProcessPoolExecutor(self.hilos, initializer=iniciar_proceso)
+        return ThreadPoolExecutor(self.hilos, thread_name_prefix='tarea')
+
+    def _latir(self):
+        if self._en_curso:
+            Tarea.objects.filter(pk__in=self._en_curso.values(), estado=Tarea.EN_CURSO).update(latido=timezone.now())
+        recuperar_abandonadas()
+
+    def trabajar(self, una_vez=False):
+        """
+        Procesa tareas hasta que se llame a detener (o, con `una_vez`, hasta
+        que no quede ninguna disponible). Devuelve cuántas ejecutó.
+        """
+        ejecutadas = 0
+        ultimo_latido = None
+        pool = self._pool()
+        try:
+            while True:
+                if ultimo_latido is None or time.monotonic() - ultimo_latido >= self.latido:
+                    self._latir()
+                    ultimo_latido = time.monotonic()
+
+                while not self.detener.is_set() and len(self._en_curso) < self.hilos:
+                    tarea_id = tomar(self.nombre)
+                    if tarea_id is None:
+                        break
+                    self._en_curso[pool.submit(_ejecutar_en_pool, tarea_id)] = tarea_id
+
+                if not self._en_curso:
+                    if una_vez or self.detener.is_set():
+                        return ejecutadas
+                    self.detener.wait(self.espera)
+                    continue
+
+                listos, _ = wait(self._en_curso, timeout=self.espera, return_when=FIRST_COMPLETED)
+                roto = False
+                for futuro in listos:
+                    tarea_id = self._en_curso.pop(futuro)
+                    ejecutadas += 1
+                    error = futuro.exception()
+                    if error is not None:
+                        # ejecutar() atrapa todo: solo llega aquí si murió el proceso hijo
+                        _fallar(tarea_id, error, repr(error))
+                        roto = roto or isinstance(error, BrokenExecutor)
+                if roto:
+                    # Un pool roto termina a la vez todas sus tareas pendientes
+                    for futuro in [futuro for futuro in self._en_curso if futuro.done()]:
+                        _fallar(self._en_curso.pop(futuro), futuro.exception(), repr(futuro.exception()))
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._pool()
+        finally:
+            pool.shutdown(wait=True)
@@ -0,0 +1,24 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from app_Abarrotes import miniaturas
+
+register = template.Library()
+
+
+@register.simple_tag
+def foto(archivo, variante='lista', **atributos):
+    """
+    <picture> con la variante reducida de la foto: WebP si existe y JPEG
+    como respaldo. Los argumentos con nombre pasan como atributos del <img>:
+    {% foto empleado.foto 'lista' alt=empleado.nombre width=50 height=50 class="rounded-circle" %}
+    """
+    if not archivo:
+        return ''
+    jpeg = miniaturas.url(archivo, variante)
+    webp = miniaturas.url(archivo, variante, 'webp') if miniaturas.WEBP else None
+    imagen = format_html('<img src="{}" loading="lazy"{}>', jpeg, flatatt(atributos))
+    if not webp or webp == archivo.url:
+        return imagen
+    return format_html('<picture><source srcset="{}" type="image/webp">{}</picture>', webp, imagen)
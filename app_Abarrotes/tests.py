@@ -1,3 +1,1863 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import gzip
+import importlib
+import json
+import math
+import shutil
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    busqueda, cache_vistas, exportar, historico, importar, inventario, miniaturas, precios, reabasto, replicas,
+    resumenes, rollups, services, tareas, urls, views_async,
+)
+from .instrumentacion import Medicion, PresupuestoExcedido, huella
+from .models import (
+    ClaveVenta, Cliente, CorteInventario, DetalleVenta, DetalleVentaArchivado, Empleado, LineaOrdenCompra,
+    MovimientoInventario, OrdenCompra, PrecioHistorico, Producto, Proveedor, ResumenCliente, Tarea, Venta,
+    VentaArchivada, VentaDiariaCategoria, VentaDiariaEmpleado, VentaDiariaProducto, aplicar_deltas, diferir_totales,
+)
+from .planes import problemas_del_plan, verificar as verificar_planes
+from .resumenes import actualizar_resumenes
+from .sembrado import sembrar
+from .services import borrar_venta, editar_venta, registrar_venta
+
+ESTRICTO = {'PRESUPUESTO_POR_DEFECTO': 20, 'PRESUPUESTOS': {}, 'MAX_REPETICIONES': 5, 'ESTRICTO': True}
+
+
+def sembrar_datos(n_ventas=6, sufijo=''):
+    """Crea un catálogo pequeño y ventas de 1 a 3 líneas con productos de varios proveedores"""
+    empleados = [
+        Empleado.objects.create(
+            nombre=f'Empleado{sufijo}{i}', apellido='Prueba', puesto='Cajero', salario=1000,
+            fecha_contratacion=datetime.date(2024, 1, 1),
+        )
+        for i in range(3)
+    ]
+    clientes = [
+        Cliente.objects.create(
+            nombre=f'Cliente{sufijo}{i}', telefono='5550000', correo=f'c{sufijo}{i}@correo.com',
+            direccion='Calle 1', id_empleado=empleados[i % 3],
+        )
+        for i in range(5)
+    ]
+    proveedores = [
+        Proveedor.objects.create(
+            empresa=f'Proveedor{sufijo}{i}', contacto='Contacto', telefono='5551111',
+            email=f'p{sufijo}{i}@empresa.com', direccion='Calle 2', categoria='Abarrotes', productos='Varios',
+        )
+        for i in range(3)
+    ]
+    productos = [
+        Producto.objects.create(
+            nombre=f'Producto{sufijo}{i}', categoria=f'Categoria{i % 2}', precio=Decimal('2.50'),
+            proveedor=proveedores[i % 3], existencias=500,
+        )
+        for i in range(6)
+    ]
+    for i in range(n_ventas):
+        registrar_venta(
+            Venta(id_cliente=clientes[i % 5], id_empleado=empleados[i % 3]),
+            [(productos[(i + j) % 6].pk, 1 + j, Decimal('2.50')) for j in range(i % 3 + 1)],
+        )
+    return empleados, clientes, proveedores, productos
+
+
+@tareas.tarea('prueba_sumar')
+def sumar_para_prueba(progreso, numeros):
+    for i in range(len(numeros)):
+        progreso(i + 1, len(numeros), f'{i + 1} sumados')
+    return {'suma': sum(numeros)}
+
+
+@tareas.tarea('prueba_fallar', max_intentos=2)
+def fallar_para_prueba(progreso, definitiva=False):
+    if definitiva:
+        raise ValidationError('Datos inválidos')
+    raise OSError('Disco lleno')
+
+
+def acumulados_diarios():
+    """Contenido de las tablas de acumulados; las filas en cero equivalen a no tener fila"""
+    return {
+        modelo.__name__: sorted(fila for fila in modelo.objects.values_list(*campos) if fila[-2:] != (0, 0))
+        for modelo, campos in (
+            (VentaDiariaProducto, ['fecha', 'producto', 'cantidad', 'importe']),
+            (VentaDiariaCategoria, ['fecha', 'categoria', 'cantidad', 'importe']),
+            (VentaDiariaEmpleado, ['fecha', 'empleado', 'num_ventas', 'importe']),
+        )
+    }
+
+
+def limpiar_cache():
+    caches[cache_vistas.configuracion()['ALIAS']].clear()
+    cache_vistas.estadisticas.reiniciar()
+
+
+# Sin caché de páginas: se cuentan las consultas de la vista, no las de un acierto
+@override_settings(INSTRUMENTACION_CONSULTAS=ESTRICTO, CACHE_RESPUESTAS={'ACTIVO': False})
+class ConsultasPorRutaTests(TestCase):
+    """
+    Fija el número de consultas de cada ruta de la app con datos sembrados.
+    Si un cambio agrega consultas (p. ej. un N+1 en una plantilla) la prueba
+    falla; si las reduce, actualizar el número aquí.
+    """
+
+    # nombre de ruta -> consultas de un GET con los datos de sembrar_datos()
+    CONSULTAS = {
+        'inicio': 0,
+        'ver_empleados': 1,
+        'agregar_empleado': 0,
+        'actualizar_empleado': 1,
+        'borrar_empleado': 1,
+        'ver_clientes': 2,
+        'agregar_cliente': 1,
+        'actualizar_cliente': 2,
+        'borrar_cliente': 2,
+        'detalle_cliente': 5,
+        'ver_ventas': 4,
+        'agregar_venta': 2,
+        'agregar_lote_ventas': 0,
+        'actualizar_venta': 4,
+        'borrar_venta': 4,
+        'detalle_venta': 2,
+        'exportar_ventas': 2,
+        'exportar_ventas_segundo_plano': 1,
+        'ver_proveedores': 1,
+        'agregar_proveedor': 0,
+        'actualizar_proveedor': 1,
+        'borrar_proveedor': 1,
+        'ver_productos': 2,
+        'agregar_producto': 1,
+        'actualizar_producto': 2,
+        'borrar_producto': 2,
+        'importar_catalogo': 0,
+        'reajustar_precios': 1,
+        'buscar_productos': 2,
+        'buscar_proveedores': 1,
+        'consultar_productos': 1,
+        'reporte_categorias': 1,
+        'compras_sugeridas': 1,
+        'guardar_compras_sugeridas': 0,
+        'estadisticas_cache': 0,
+        'ver_tareas': 1,
+        'detalle_tarea': 1,
+    }
+
+    # Consultas de cada listado del admin (incluye sesión y usuario)
+    CONSULTAS_ADMIN = {
+        'empleado': 6,
+        'cliente': 6,
+        'venta': 7,
+        'proveedor': 6,
+        'producto': 7,
+        'detalleventa': 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, cls.proveedores, cls.productos = sembrar_datos()
+        cls.venta = Venta.objects.filter(detalles__isnull=False).order_by('-pk').first()
+        cls.tarea = tareas.encolar('prueba_sumar', numeros=[1, 2])
+
+    def url(self, nombre):
+        argumentos = {
+            'tarea': self.tarea.pk,
+            'empleado': self.empleados[0].pk,
+            'cliente': self.clientes[0].pk,
+            'venta': self.venta.pk,
+            'proveedor': self.proveedores[0].pk,
+            'producto': self.productos[0].pk,
+        }
+        entidad = nombre.rsplit('_', 1)[-1]
+        if nombre.split('_')[0] in ('actualizar', 'borrar', 'detalle'):
+            return reverse(nombre, args=[argumentos[entidad]])
+        if nombre.startswith(('buscar', 'consultar')):
+            return reverse(nombre) + '?q=producto'
+        return reverse(nombre)
+
+    def consultas_de_get(self, url):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        return len(capturadas.captured_queries)
+
+    def test_todas_las_rutas_tienen_conteo(self):
+        nombres = {patron.name for patron in urls.urlpatterns}
+        self.assertEqual(nombres, set(self.CONSULTAS))
+
+    def test_consultas_por_ruta(self):
+        for nombre, esperadas in self.CONSULTAS.items():
+            with self.subTest(ruta=nombre):
+                self.assertEqual(self.consultas_de_get(self.url(nombre)), esperadas)
+
+    def test_consultas_no_crecen_con_los_datos(self):
+        antes = {nombre: self.consultas_de_get(self.url(nombre)) for nombre in self.CONSULTAS}
+        sembrar_datos(n_ventas=30, sufijo='extra')
+        for nombre, consultas in antes.items():
+            with self.subTest(ruta=nombre):
+                self.assertEqual(self.consultas_de_get(self.url(nombre)), consultas)
+
+    def test_listados_del_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@correo.com', 'clave'))
+        for modelo, esperadas in self.CONSULTAS_ADMIN.items():
+            with self.subTest(modelo=modelo):
+                self.assertEqual(self.consultas_de_get(f'/admin/app_Abarrotes/{modelo}/'), esperadas)
+
+    def test_registrar_venta_no_depende_del_tamano_de_la_canasta(self):
+        def consultas_de_venta(n_productos):
+            datos = {
+                'id_cliente': self.clientes[0].pk,
+                'id_empleado': self.empleados[0].pk,
+                'total': '0',
+                'producto': [producto.pk for producto in self.productos[:n_productos]],
+                'cantidad': ['1'] * n_productos,
+                'precio': ['2.50'] * n_productos,
+            }
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.client.post(reverse('agregar_venta'), datos)
+            self.assertEqual(response.status_code, 302)
+            return len(capturadas.captured_queries)
+
+        self.assertEqual(consultas_de_venta(1), consultas_de_venta(6))
+
+
+# URLconf de VistasAsyncTests: la del proyecto con las vistas de solo lectura asíncronas
+urlpatterns = [path('admin/', admin.site.urls), *urls.patrones(views_async)]
+
+
+@override_settings(ROOT_URLCONF='app_Abarrotes.tests')
+class VistasAsyncTests(ConsultasPorRutaTests):
+    """Las vistas asíncronas hacen las mismas consultas y devuelven lo mismo que las síncronas"""
+
+    LECTURA = [patron.name for patron in urlpatterns[1:] if iscoroutinefunction(patron.callback)]
+
+    def test_mismo_contenido_que_las_sincronas(self):
+        self.assertIn('detalle_venta', self.LECTURA)
+        for nombre in self.LECTURA:
+            with self.subTest(ruta=nombre):
+                url = self.url(nombre)
+                asincrona = self.client.get(url)
+                with override_settings(ROOT_URLCONF='backend_Abarrotes.urls'):
+                    sincrona = self.client.get(url)
+                self.assertEqual(asincrona.status_code, 200)
+                self.assertEqual(asincrona.content, sincrona.content)
+
+    def test_filtros_con_opciones_de_modelos(self):
+        empleado = self.empleados[0]
+        response = self.client.get(reverse('ver_ventas'), {'empleado': empleado.pk})
+        self.assertContains(response, f'<option value="{empleado.pk}" selected>{empleado}</option>', html=True)
+        self.assertTrue(all(venta.id_empleado_id == empleado.pk for venta in response.context['ventas']))
+
+    def test_detalle_inexistente(self):
+        self.assertEqual(self.client.get(reverse('detalle_venta', args=[0])).status_code, 404)
+
+    async def test_middleware_asincrono(self):
+        response = await self.async_client.get(reverse('ver_ventas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="4 consultas"', response['Server-Timing'])
+
+    @override_settings(CACHE_RESPUESTAS={'ACTIVO': True})
+    def test_cache_de_paginas(self):
+        limpiar_cache()
+        self.assertEqual(self.client.get(reverse('ver_productos'))['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('ver_productos'))['X-Cache'], 'HIT')
+
+
+class RegistrarVentaTests(TestCase):
+    """El cobro registra la venta completa con un número fijo de consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=0)
+
+    def registrar(self, *lineas):
+        return registrar_venta(
+            Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]),
+            [(producto.pk, cantidad, Decimal('2.50')) for producto, cantidad in lineas],
+        )
+
+    def existencias(self):
+        return dict(Producto.objects.values_list('pk', 'existencias'))
+
+    def test_registra_lineas_total_y_stock(self):
+        p = self.productos
+        # El mismo producto en dos líneas descuenta la suma
+        venta = self.registrar((p[0], 2), (p[1], 1), (p[0], 3))
+        self.assertEqual(Venta.objects.get(pk=venta.pk).total, Decimal('15.00'))
+        self.assertEqual(
+            sorted(venta.detalles.values_list('producto', 'cantidad', 'subtotal')),
+            sorted([(p[0].pk, 2, Decimal('5.00')), (p[1].pk, 1, Decimal('2.50')), (p[0].pk, 3, Decimal('7.50'))]),
+        )
+        existencias = self.existencias()
+        self.assertEqual((existencias[p[0].pk], existencias[p[1].pk], existencias[p[2].pk]), (495, 499, 500))
+
+    def test_consultas_no_dependen_de_la_canasta(self):
+        def consultas(n_productos):
+            with CaptureQueriesContext(connection) as capturadas:
+                self.registrar(*[(producto, 1) for producto in self.productos[:n_productos]])
+            return len(capturadas.captured_queries)
+
+        self.assertEqual(consultas(1), consultas(6))
+
+    def test_stock_insuficiente_no_cambia_nada(self):
+        antes = self.existencias()
+        with self.assertRaisesMessage(ValidationError, 'Stock insuficiente para Producto1'):
+            self.registrar((self.productos[0], 2), (self.productos[1], 501))
+        with self.assertRaises(ValidationError):
+            self.registrar((self.productos[0], 0))
+        self.assertEqual(self.existencias(), antes)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetalleVenta.objects.exists())
+
+    def test_vista_agregar_venta(self):
+        p = self.productos
+        response = self.client.post(reverse('agregar_venta'), {
+            'id_cliente': self.clientes[1].pk,
+            'id_empleado': self.empleados[1].pk,
+            'total': '0',
+            'producto': [p[2].pk, p[3].pk, ''],
+            'cantidad': ['2', '1', ''],
+            'precio': ['2.50', '3.00', ''],
+        })
+        self.assertRedirects(response, reverse('ver_ventas'), fetch_redirect_response=False)
+        venta = Venta.objects.get(id_cliente=self.clientes[1])
+        self.assertEqual((venta.total, venta.detalles.count()), (Decimal('8.00'), 2))
+
+        response = self.client.post(reverse('agregar_venta'), {
+            'id_cliente': self.clientes[1].pk, 'id_empleado': self.empleados[1].pk, 'total': '0',
+            'producto': [p[2].pk], 'cantidad': ['999'], 'precio': ['2.50'],
+        })
+        self.assertRedirects(response, reverse('agregar_venta'), fetch_redirect_response=False)
+        self.assertEqual(Venta.objects.count(), 1)
+
+
+class TotalesVentaTests(TestCase):
+    """Venta.total se mantiene con la diferencia de cada detalle, sin volver a sumar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=0)
+
+    def venta(self):
+        return Venta.objects.create(id_cliente=self.clientes[0], id_empleado=self.empleados[0], total=0)
+
+    def detalle(self, venta, cantidad=1, producto=0):
+        return DetalleVenta.objects.create(
+            venta=venta, producto=self.productos[producto], cantidad=cantidad, precio_unitario=Decimal('2.50'),
+        )
+
+    def total(self, venta):
+        return Venta.objects.get(pk=venta.pk).total
+
+    def test_altas_cambios_y_bajas_por_diferencia(self):
+        venta, otra = self.venta(), self.venta()
+        with CaptureQueriesContext(connection) as capturadas:
+            detalle = self.detalle(venta, 2)
+        self.assertFalse([q['sql'] for q in capturadas.captured_queries if 'SUM(' in q['sql']])
+        self.assertEqual((venta.total, self.total(venta)), (Decimal('5.00'), Decimal('5.00')))
+
+        self.detalle(venta, 1, producto=1)
+        detalle.cantidad = 4
+        detalle.save()
+        self.assertEqual(self.total(venta), Decimal('12.50'))
+
+        # Pasar la línea a otra venta la resta de una y la suma a la otra
+        detalle.venta = otra
+        detalle.save()
+        self.assertEqual((self.total(venta), self.total(otra)), (Decimal('2.50'), Decimal('10.00')))
+
+        detalle.delete()
+        self.assertEqual(self.total(otra), 0)
+        # Borrar la venta se lleva sus líneas sin tocar un total que ya no existe
+        venta.delete()
+        self.assertFalse(Venta.objects.filter(pk=venta.pk).exists())
+
+    def test_diferir_totales_recalcula_una_vez_al_salir(self):
+        ventas = [self.venta(), self.venta()]
+        with CaptureQueriesContext(connection) as capturadas:
+            with diferir_totales():
+                with diferir_totales():
+                    for venta in ventas:
+                        for producto in range(3):
+                            self.detalle(venta, 2, producto)
+                # El bloque interno no recalcula; el externo aún no termina
+                self.assertEqual([self.total(venta) for venta in ventas], [0, 0])
+        actualizaciones = [q['sql'] for q in capturadas.captured_queries if q['sql'].startswith('UPDATE "app_Abarrotes_venta"')]
+        self.assertEqual(len(actualizaciones), 1)
+        self.assertEqual([self.total(venta) for venta in ventas], [Decimal('15.00'), Decimal('15.00')])
+
+    def test_delta_desconocido_recalcula(self):
+        venta = self.venta()
+        self.detalle(venta, 2)
+        Venta.objects.filter(pk=venta.pk).update(total=99)
+        aplicar_deltas({venta.pk: None, None: Decimal('1')})
+        self.assertEqual(self.total(venta), Decimal('5.00'))
+
+
+class EditarVentaTests(TestCase):
+    """Editar una venta aplica solo la diferencia contra sus detalles guardados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=0)
+
+    def nueva_venta(self, *lineas):
+        return registrar_venta(
+            Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]),
+            [(producto.pk, cantidad, Decimal('2.50')) for producto, cantidad in lineas],
+        )
+
+    def existencias(self):
+        return dict(Producto.objects.values_list('pk', 'existencias'))
+
+    def test_inserta_actualiza_y_borra(self):
+        p = self.productos
+        venta = self.nueva_venta((p[0], 2), (p[1], 1), (p[2], 3))
+        ids = dict(venta.detalles.values_list('producto', 'pk'))
+        antes = self.existencias()
+        ultimo = MovimientoInventario.objects.order_by('pk').last().pk
+
+        with self.captureOnCommitCallbacks(execute=True):
+            editar_venta(venta, [(p[0].pk, 5, Decimal('2.50')), (p[1].pk, 1, Decimal('3.00')), (p[3].pk, 2, Decimal('2.50'))])
+
+        detalles = {d.producto_id: d for d in venta.detalles.all()}
+        self.assertEqual(set(detalles), {p[0].pk, p[1].pk, p[3].pk})
+        # Las líneas que siguen se actualizan en sitio
+        self.assertEqual((detalles[p[0].pk].pk, detalles[p[1].pk].pk), (ids[p[0].pk], ids[p[1].pk]))
+        self.assertEqual((detalles[p[0].pk].cantidad, detalles[p[1].pk].subtotal), (5, Decimal('3.00')))
+        self.assertEqual(venta.total, Decimal('20.50'))
+        self.assertEqual(Venta.objects.get(pk=venta.pk).total, Decimal('20.50'))
+
+        # Stock por la diferencia neta de cada producto
+        despues = self.existencias()
+        self.assertEqual(
+            {pk: despues[pk] - antes[pk] for pk in antes if despues[pk] != antes[pk]},
+            {p[0].pk: -3, p[2].pk: 3, p[3].pk: -2},
+        )
+        self.assertEqual(inventario.diferencias(), {})
+        self.assertEqual(
+            sorted(MovimientoInventario.objects.filter(venta=venta, pk__gt=ultimo).values_list('producto', 'tipo', 'cantidad')),
+            sorted([(p[0].pk, 'venta', -3), (p[2].pk, 'devolucion', 3), (p[3].pk, 'venta', -2)]),
+        )
+
+        self.assertEqual(ResumenCliente.objects.get(cliente=self.clientes[0]).total_gastado, Decimal('20.50'))
+        incrementales = acumulados_diarios()
+        rollups.reconstruir(timezone.localdate(), timezone.localdate())
+        self.assertEqual(acumulados_diarios(), incrementales)
+
+    def test_sin_cambios_no_escribe_detalles(self):
+        venta = self.nueva_venta((self.productos[0], 2))
+        with CaptureQueriesContext(connection) as capturadas:
+            editar_venta(venta, [(self.productos[0].pk, 2, Decimal('2.50'))])
+        tabla = f'"{DetalleVenta._meta.db_table}"'
+        self.assertFalse([q['sql'] for q in capturadas.captured_queries if tabla in q['sql'] and not q['sql'].startswith('SELECT')])
+        self.assertEqual(MovimientoInventario.objects.filter(venta=venta).count(), 1)
+
+    def test_stock_insuficiente_no_cambia_nada(self):
+        venta = self.nueva_venta((self.productos[0], 2))
+        with self.assertRaises(ValidationError):
+            editar_venta(venta, [(self.productos[0].pk, 600, Decimal('2.50'))])
+        self.assertEqual(list(venta.detalles.values_list('cantidad', flat=True)), [2])
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).existencias, 498)
+
+    def test_borrar_lineas_no_depende_de_cuantas(self):
+        def consultas(n_borradas):
+            venta = self.nueva_venta(*[(producto, 1) for producto in self.productos[:n_borradas + 1]])
+            with CaptureQueriesContext(connection) as capturadas:
+                editar_venta(venta, [(self.productos[0].pk, 1, Decimal('2.50'))])
+            self.assertEqual(venta.total, Decimal('2.50'))
+            return len(capturadas.captured_queries)
+
+        self.assertEqual(consultas(1), consultas(5))
+        self.assertEqual(inventario.diferencias(), {})
+        incrementales = acumulados_diarios()
+        rollups.reconstruir(timezone.localdate(), timezone.localdate())
+        self.assertEqual(acumulados_diarios(), incrementales)
+
+
+class PaginacionTests(TestCase):
+    """Paginación por cursor de los listados: enlaces, orden estable y filtros"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, cls.proveedores, cls.productos = sembrar_datos()
+        # Con la misma fecha el orden lo decide el id
+        Venta.objects.update(fecha=timezone.now())
+        cls.ventas = list(Venta.objects.order_by('-id').values_list('pk', flat=True))
+
+    def pagina(self, nombre, enlace='', **parametros):
+        response = self.client.get(reverse(nombre) + enlace, parametros)
+        self.assertEqual(response.status_code, 200)
+        return response.context['pagina']
+
+    def ids(self, pagina):
+        return [objeto.pk for objeto in pagina]
+
+    def test_siguiente_y_anterior(self):
+        primera = self.pagina('ver_ventas', tamano=4)
+        self.assertEqual(self.ids(primera), self.ventas[:4])
+        self.assertIsNone(primera.url_anterior)
+
+        segunda = self.pagina('ver_ventas', primera.url_siguiente)
+        self.assertEqual(self.ids(segunda), self.ventas[4:])
+        self.assertIsNone(segunda.url_siguiente)
+
+        # Hacia atrás se vuelve a la misma primera página
+        de_vuelta = self.pagina('ver_ventas', segunda.url_anterior)
+        self.assertEqual(self.ids(de_vuelta), self.ventas[:4])
+        self.assertIsNone(de_vuelta.url_anterior)
+        self.assertEqual(de_vuelta.url_siguiente, primera.url_siguiente)
+
+        self.assertFalse(self.pagina('ver_ventas').tiene_otras_paginas)
+
+    def test_filtros_en_todas_las_paginas(self):
+        primera = self.pagina('ver_productos', categoria='Categoria0', tamano=2)
+        self.assertEqual([producto.nombre for producto in primera], ['Producto0', 'Producto2'])
+        self.assertIn('categoria=Categoria0', primera.url_siguiente)
+        segunda = self.pagina('ver_productos', primera.url_siguiente)
+        self.assertEqual([producto.nombre for producto in segunda], ['Producto4'])
+        self.assertIsNone(segunda.url_siguiente)
+
+        empleado = self.empleados[0]
+        vistas, pagina = [], self.pagina('ver_ventas', empleado=empleado.pk, tamano=1)
+        while True:
+            vistas += self.ids(pagina)
+            if not pagina.url_siguiente:
+                break
+            pagina = self.pagina('ver_ventas', pagina.url_siguiente)
+        self.assertEqual(vistas, [pk for pk in self.ventas if Venta.objects.get(pk=pk).id_empleado_id == empleado.pk])
+
+    def test_cursor_ilegible(self):
+        for parametro in ('despues', 'antes'):
+            for cursor in ('zzz', '!!!', 'W10'):
+                with self.subTest(parametro=parametro, cursor=cursor):
+                    pagina = self.pagina('ver_ventas', tamano=4, **{parametro: cursor})
+                    self.assertEqual(self.ids(pagina), self.ventas[:4])
+
+    def test_cursor_con_valores_invalidos(self):
+        def cursor(*valores):
+            return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip('=')
+
+        # JSON válido con valores que el campo no acepta: también se ignora
+        for nombre, valores in [
+            ('ver_ventas', ['nope', 1]),
+            ('ver_ventas', ['2024-13-45T99:00:00', 1]),
+            ('ver_ventas', [None, 'x']),
+            ('ver_productos', ['Producto0', 'x']),
+            ('ver_clientes', ['Cliente0', [1]]),
+        ]:
+            for parametro in ('despues', 'antes'):
+                with self.subTest(vista=nombre, valores=valores, parametro=parametro):
+                    pagina = self.pagina(nombre, **{parametro: cursor(*valores)})
+                    self.assertIsNone(pagina.url_anterior)
+
+        response = self.client.get(reverse('consultar_productos'), {'despues': cursor('Producto0', 'x')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resultados'][0]['nombre'], 'Producto0')
+
+
+class ResumenClienteTests(TestCase):
+    """El resumen de cada cliente se refresca al confirmar cada escritura de sus ventas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=0)
+
+    def resumen(self, cliente):
+        return ResumenCliente.objects.get(cliente=cliente)
+
+    def vender(self, cliente, *lineas):
+        with self.captureOnCommitCallbacks(execute=True):
+            return registrar_venta(
+                Venta(id_cliente=cliente, id_empleado=self.empleados[0]),
+                [(self.productos[i].pk, cantidad, Decimal('2.50')) for i, cantidad in lineas],
+            )
+
+    def test_alta(self):
+        cliente = self.clientes[0]
+        self.vender(cliente, (0, 1), (1, 3))
+        ultima = self.vender(cliente, (2, 2), (0, 1), (3, 1), (4, 1))
+
+        resumen = self.resumen(cliente)
+        self.assertEqual((resumen.num_compras, resumen.total_gastado), (2, Decimal('22.50')))
+        self.assertEqual(resumen.ultima_compra, ultima.fecha)
+        self.assertEqual(resumen.ultimo_producto_id, self.productos[4].pk)
+        # Por cantidad comprada y, a igual cantidad, por nombre
+        self.assertEqual(resumen.productos_frecuentes, 'Producto1, Producto0, Producto2')
+        self.assertEqual(resumen.productos_distintos, 5)
+        self.assertEqual(resumen.productos_str(), 'Producto1, Producto0, Producto2 y 2 más...')
+
+    def test_edicion_y_cambio_de_cliente(self):
+        venta = self.vender(self.clientes[0], (0, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            editar_venta(venta, [(self.productos[1].pk, 2, Decimal('3.00'))])
+        resumen = self.resumen(self.clientes[0])
+        self.assertEqual((resumen.total_gastado, resumen.productos_frecuentes), (Decimal('6.00'), 'Producto1'))
+
+        venta.id_cliente = self.clientes[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            editar_venta(venta, [(self.productos[1].pk, 2, Decimal('3.00'))])
+        self.assertEqual(self.resumen(self.clientes[0]).num_compras, 0)
+        self.assertEqual(self.resumen(self.clientes[1]).total_gastado, Decimal('6.00'))
+
+        # También por los detalles guardados uno a uno (admin)
+        detalle = venta.detalles.get()
+        detalle.cantidad = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            detalle.save()
+        self.assertEqual(self.resumen(self.clientes[1]).total_gastado, Decimal('15.00'))
+
+    def test_baja(self):
+        cliente = self.clientes[0]
+        self.vender(cliente, (0, 1))
+        venta = self.vender(cliente, (1, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            borrar_venta(venta)
+        resumen = self.resumen(cliente)
+        self.assertEqual((resumen.num_compras, resumen.total_gastado, resumen.ultimo_producto_id), (1, Decimal('2.50'), self.productos[0].pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            borrar_venta(Venta.objects.get(id_cliente=cliente))
+        resumen = self.resumen(cliente)
+        self.assertEqual((resumen.num_compras, resumen.total_gastado, resumen.ultima_compra), (0, 0, None))
+        self.assertEqual(resumen.productos_str(), 'Sin compras')
+
+    def test_migracion_rellena_los_resumenes(self):
+        self.vender(self.clientes[0], (0, 1), (1, 3))
+        self.vender(self.clientes[0], (2, 2), (0, 1), (3, 1), (4, 1))
+        self.vender(self.clientes[1], (5, 2))
+        campos = [
+            'cliente', 'num_compras', 'total_gastado', 'ultima_compra', 'ultimo_producto',
+            'productos_frecuentes', 'productos_distintos',
+        ]
+        esperados = list(ResumenCliente.objects.order_by('cliente').values_list(*campos))
+        self.assertEqual(len(esperados), 2)
+
+        # Clientes que ya existían al migrar: también los que no tienen compras
+        ResumenCliente.objects.all().delete()
+        migracion = importlib.import_module(f'{__package__}.migrations.0006_resumencliente')
+        migracion.calcular_resumenes(apps, None)
+        resumenes = list(ResumenCliente.objects.order_by('cliente').values_list(*campos))
+        self.assertEqual(resumenes[:2], esperados)
+        self.assertEqual(len(resumenes), len(self.clientes))
+        self.assertEqual(self.resumen(self.clientes[4]).productos_str(), 'Sin compras')
+
+
+class BusquedaTests(TestCase):
+    """Búsqueda de texto completo: prefijos, sin acentos y por relevancia"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(
+            empresa='La Molienda', contacto='Rosa Núñez', telefono='5551111', email='rosa@molienda.com',
+            direccion='Calle 2', categoria='Granos', productos='Arroz y azúcar',
+        )
+        crear = lambda nombre, categoria='Abarrotes', descripcion='': Producto(
+            nombre=nombre, categoria=categoria, descripcion=descripcion, precio=Decimal('10.00'), proveedor=cls.proveedor,
+        )
+        # Más coincidencias que cualquier límite de candidatos; el exacto se crea al final (rowid mayor)
+        Producto.objects.bulk_create([crear(f'Arroz extra {i}') for i in range(1500)])
+        cls.arroz = Producto.objects.create(nombre='Arroz', categoria='Granos', precio=Decimal('12.00'), proveedor=cls.proveedor)
+        cls.azucar = Producto.objects.create(nombre='Azúcar blanca', categoria='Endulzantes', precio=Decimal('20.00'), proveedor=cls.proveedor)
+        cls.cafe = Producto.objects.create(
+            nombre='Café de olla', categoria='Bebidas', descripcion='Con azúcar', precio=Decimal('30.00'), proveedor=cls.proveedor,
+        )
+
+    def nombres(self, texto, limite=5):
+        return [producto.nombre for producto in busqueda.buscar(Producto, texto, limite)]
+
+    def test_prefijos_de_cada_palabra(self):
+        self.assertEqual(self.nombres('azu blan'), ['Azúcar blanca'])
+        self.assertEqual(self.nombres('caf ol'), ['Café de olla'])
+        self.assertEqual(busqueda.expresion_fts('azu, "blan'), '"azu"* "blan"*')
+        self.assertEqual(self.nombres('¿?'), [])
+
+    def test_sin_acentos(self):
+        self.assertEqual(self.nombres('azucar blanca'), ['Azúcar blanca'])
+        self.assertEqual(self.nombres('CAFÉ'), self.nombres('cafe'))
+        self.assertEqual([proveedor.pk for proveedor in busqueda.buscar(Proveedor, 'nunez')], [self.proveedor.pk])
+        self.assertEqual(busqueda.filtrar(Producto.objects.all(), 'endulzantes azucar').get(), self.azucar)
+
+    def test_relevancia_sobre_todas_las_coincidencias(self):
+        self.assertEqual(self.nombres('arroz', 1), ['Arroz'])
+        self.assertEqual(len(self.nombres('arroz', busqueda.LIMITE_MAXIMO + 50)), busqueda.LIMITE_MAXIMO)
+        # El nombre pesa más que la descripción
+        self.assertEqual(self.nombres('azucar'), ['Azúcar blanca', 'Café de olla'])
+
+
+class ConsultaProductosTests(TestCase):
+    """Consulta de productos de los formularios de venta: paginada y con ETag"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, _, cls.productos = sembrar_datos(n_ventas=0)
+        Producto.objects.filter(pk=cls.productos[1].pk).update(existencias=0)
+
+    def consultar(self, **parametros):
+        return self.client.get(reverse('consultar_productos'), parametros)
+
+    def test_etag_y_304(self):
+        response = self.consultar()
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('max-age=30', response['Cache-Control'])
+
+        response = self.client.get(reverse('consultar_productos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        # Otro precio es otra respuesta
+        producto = self.productos[0]
+        producto.precio = Decimal('9.99')
+        producto.save()
+        response = self.client.get(reverse('consultar_productos'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn({'id': producto.pk, 'nombre': producto.nombre, 'precio': '9.99', 'existencias': 500}, response.json()['resultados'])
+
+    def test_filtros_y_paginas(self):
+        nombres = [r['nombre'] for r in self.consultar(q='producto', con_stock='1').json()['resultados']]
+        self.assertEqual(nombres, ['Producto0', 'Producto2', 'Producto3', 'Producto4', 'Producto5'])
+
+        primera = self.consultar(tamano=4).json()
+        self.assertEqual(len(primera['resultados']), 4)
+        segunda = self.client.get(reverse('consultar_productos') + primera['siguiente']).json()
+        self.assertEqual([r['nombre'] for r in segunda['resultados']], ['Producto4', 'Producto5'])
+        self.assertIsNone(segunda['siguiente'])
+
+
+class AcumuladosTests(TestCase):
+    """Los acumulados que mantienen las escrituras coinciden con reconstruirlos desde cero"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, cls.proveedores, cls.productos = sembrar_datos()
+
+    def assertIgualAReconstruir(self):
+        incrementales = acumulados_diarios()
+        rollups.reconstruir(timezone.localdate(), timezone.localdate())
+        self.assertEqual(incrementales, acumulados_diarios())
+
+    def test_ventas_editadas_y_borradas(self):
+        venta = Venta.objects.filter(detalles__isnull=False).order_by('pk').last()
+        editar_venta(venta, [(self.productos[0].pk, 4, Decimal('3.00')), (self.productos[5].pk, 1, Decimal('2.50'))])
+        detalle = DetalleVenta.objects.filter(venta__isnull=False).order_by('pk').first()
+        detalle.cantidad += 2
+        detalle.subtotal = detalle.cantidad * detalle.precio_unitario
+        detalle.save()
+        DetalleVenta.objects.order_by('pk').last().delete()
+        otra = Venta.objects.order_by('pk').first()
+        otra.id_empleado = self.empleados[2]
+        otra.save()
+        borrar_venta(Venta.objects.order_by('pk')[1])
+        self.assertIgualAReconstruir()
+
+    def test_cambio_de_categoria(self):
+        producto = Producto.objects.get(pk=self.productos[0].pk)
+        producto.categoria = 'Nueva'
+        producto.save()
+        csv = (
+            'nombre,categoria,precio,proveedor\n'
+            f'{self.productos[1].nombre},Otra,2.50,{self.proveedores[1].empresa}\n'
+        )
+        importar.importar_catalogo('productos', StringIO(csv))
+        self.assertIgualAReconstruir()
+
+        # Las ventas anteriores al cambio se descuentan de la categoría nueva sin dejarla negativa
+        for venta in Venta.objects.filter(detalles__producto__in=self.productos[:2]).distinct():
+            borrar_venta(venta)
+        self.assertIgualAReconstruir()
+        self.assertFalse(VentaDiariaCategoria.objects.filter(cantidad__lt=0).exists())
+
+
+class ExportacionTests(TestCase):
+    """Exportación en streaming de ventas con sus líneas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=3)
+        # Una venta sin líneas también se exporta
+        cls.vacia = Venta.objects.create(id_cliente=cls.clientes[4], id_empleado=cls.empleados[1], total=0)
+        cls.ventas = list(Venta.objects.order_by('fecha', 'id'))
+
+    def descargar(self, **parametros):
+        response = self.client.get(reverse('exportar_ventas'), parametros)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, contenido = self.descargar()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        filas = list(csv.reader(StringIO(contenido.decode())))
+        self.assertEqual(filas[0], exportar.COLUMNAS)
+        lineas = DetalleVenta.objects.count()
+        self.assertEqual(len(filas) - 1, lineas + 1)
+        self.assertEqual(
+            list(dict.fromkeys(int(fila[0]) for fila in filas[1:])), [venta.pk for venta in self.ventas],
+        )
+        detalle = DetalleVenta.objects.select_related('venta', 'producto').order_by('pk').first()
+        self.assertIn([
+            str(detalle.venta_id), detalle.venta.fecha.isoformat(), str(detalle.venta.id_cliente_id),
+            detalle.venta.id_cliente.nombre, str(detalle.venta.id_empleado_id),
+            f'{detalle.venta.id_empleado.nombre} {detalle.venta.id_empleado.apellido}', str(detalle.venta.total),
+            str(detalle.producto_id), detalle.producto.nombre, detalle.producto.categoria,
+            str(detalle.cantidad), str(detalle.precio_unitario), str(detalle.subtotal),
+        ], filas)
+        self.assertEqual(filas[-1][0], str(self.vacia.pk))
+        self.assertEqual(filas[-1][7:], [''] * 6)
+
+    def test_json(self):
+        response, contenido = self.descargar(formato='json')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        ventas = json.loads(contenido)
+        self.assertEqual([venta['venta_id'] for venta in ventas], [venta.pk for venta in self.ventas])
+        for venta in ventas:
+            self.assertEqual(len(venta['lineas']), DetalleVenta.objects.filter(venta=venta['venta_id']).count())
+            self.assertEqual(sum(Decimal(linea['subtotal']) for linea in venta['lineas']), Decimal(venta['total_venta']))
+        self.assertEqual(ventas[-1]['lineas'], [])
+
+    def test_gzip_y_trozos(self):
+        _, plano = self.descargar(formato='json')
+        response, comprimido = self.descargar(formato='json', gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.json.gz"'))
+        self.assertEqual(gzip.decompress(comprimido), plano)
+
+        # Con trozos pequeños sale lo mismo en varias partes
+        with mock.patch.object(exportar, 'TAMANO_TROZO', 100), mock.patch.object(exportar, 'FILAS_POR_LECTURA', 2):
+            trozos = list(exportar.exportar_ventas(formato='json'))
+            self.assertEqual(gzip.decompress(b''.join(exportar.exportar_ventas(formato='json', comprimir=True))), plano)
+        self.assertGreater(len(trozos), 1)
+        self.assertEqual(b''.join(trozos), plano)
+
+    def test_filtros_y_comando(self):
+        Venta.objects.filter(pk=self.ventas[0].pk).update(fecha=timezone.now() - datetime.timedelta(days=10))
+        _, contenido = self.descargar(formato='json', desde=timezone.localdate().isoformat())
+        self.assertNotIn(self.ventas[0].pk, [venta['venta_id'] for venta in json.loads(contenido)])
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio, ignore_errors=True)
+        ruta = f'{directorio}/ventas.csv.gz'
+        call_command('exportar_ventas', '--gzip', '--salida', ruta, stderr=StringIO())
+        with gzip.open(ruta, 'rt') as archivo:
+            self.assertEqual(len(list(csv.reader(archivo))), DetalleVenta.objects.count() + 2)
+
+    def test_segundo_plano_solo_por_post(self):
+        desde = timezone.localdate().isoformat()
+        # Un GET nunca encola: la descarga directa ignora el parámetro y la otra ruta solo muestra el formulario
+        self.descargar(segundo_plano='1')
+        response = self.client.get(reverse('exportar_ventas_segundo_plano'), {'desde': desde, 'formato': 'json'})
+        self.assertContains(response, f'value="{desde}"')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertFalse(Tarea.objects.exists())
+
+        datos = {'desde': desde, 'empleado': self.empleados[0].pk, 'formato': 'json', 'gzip': 'on'}
+        sin_token = Client(enforce_csrf_checks=True).post(reverse('exportar_ventas_segundo_plano'), datos)
+        self.assertEqual(sin_token.status_code, 403)
+        self.assertFalse(Tarea.objects.exists())
+
+        response = self.client.post(reverse('exportar_ventas_segundo_plano'), datos)
+        tarea = Tarea.objects.get()
+        self.assertRedirects(response, reverse('detalle_tarea', args=[tarea.pk]), fetch_redirect_response=False)
+        self.assertEqual((tarea.nombre, tarea.argumentos), ('exportar_ventas', {
+            'filtros': {'desde': desde, 'empleado': str(self.empleados[0].pk)}, 'formato': 'json', 'comprimir': True,
+        }))
+
+
+class ImportacionTests(TestCase):
+    """Importación de catálogo por lotes: errores por fila, upsert y filas repetidas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, cls.proveedores, cls.productos = sembrar_datos(n_ventas=0)
+
+    def importar(self, tipo, *filas, lote=importar.TAMANO_LOTE):
+        return importar.importar_catalogo(tipo, StringIO('\n'.join(filas) + '\n'), lote=lote)
+
+    def test_errores_por_fila(self):
+        resultado = self.importar(
+            'productos',
+            'nombre,categoria,precio,proveedor,existencias',
+            f'Nuevo,Granos,10.00,{self.proveedores[0].empresa},5',
+            f'Caro,Granos,-1,{self.proveedores[0].empresa},',
+            'Huérfano,Granos,3.00,No Existe,',
+            f',Granos,abc,{self.proveedores[0].empresa},',
+        )
+        self.assertEqual((resultado.filas, resultado.creados, resultado.total_errores), (4, 1, 3))
+        errores = dict(resultado.errores)
+        self.assertEqual(sorted(errores), [3, 4, 5])
+        self.assertIn('precio', errores[3])
+        self.assertIn('No Existe', errores[4])
+        self.assertIn('nombre', errores[5])
+        self.assertIn('precio', errores[5])
+        self.assertEqual(Producto.objects.get(nombre='Nuevo').existencias, 5)
+        self.assertEqual(inventario.diferencias(), {})
+
+        with self.assertRaises(ValidationError):
+            self.importar('productos', 'nombre,precio', 'Nuevo,1.00')
+
+    def test_upsert(self):
+        producto = self.productos[0]
+        resultado = self.importar(
+            'productos',
+            'nombre,categoria,precio,proveedor',
+            f'{producto.nombre},Categoria0,3.75,{producto.proveedor.empresa}',
+            f'{self.productos[1].nombre},{self.productos[1].categoria},2.50,{self.productos[1].proveedor.empresa}',
+            # El mismo nombre con otro proveedor es otro producto
+            f'{producto.nombre},Categoria0,1.00,{self.proveedores[2].empresa}',
+        )
+        self.assertEqual((resultado.actualizados, resultado.sin_cambios, resultado.creados), (1, 1, 1))
+        producto.refresh_from_db()
+        # Sin la columna existencias no se tocan
+        self.assertEqual((producto.precio, producto.existencias), (Decimal('3.75'), 500))
+        self.assertEqual(Producto.objects.filter(nombre=producto.nombre).count(), 2)
+
+        resultado = self.importar(
+            'proveedores',
+            'empresa,contacto,telefono,email,direccion,categoria,productos',
+            f'{self.proveedores[0].empresa},Ana,5550000,ana@p.com,Calle 9,Abarrotes,Varios',
+        )
+        self.assertEqual(resultado.actualizados, 1)
+        self.assertEqual(Proveedor.objects.get(pk=self.proveedores[0].pk).contacto, 'Ana')
+        self.assertEqual(Proveedor.objects.count(), 3)
+
+    def test_filas_repetidas(self):
+        empresa = self.proveedores[0].empresa
+        filas = [
+            'nombre,categoria,precio,proveedor,existencias',
+            f'Repetido,Granos,1.00,{empresa},10',
+            f'Repetido,Granos,2.00,{empresa},20',
+        ]
+        # En el mismo lote gana la última fila
+        resultado = self.importar('productos', *filas)
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 0))
+        repetido = Producto.objects.get(nombre='Repetido')
+        self.assertEqual((repetido.precio, repetido.existencias), (Decimal('2.00'), 20))
+
+        # En lotes distintos la segunda actualiza lo que creó la primera
+        resultado = self.importar('productos', filas[0], f'Otro,Granos,1.00,{empresa},10', f'Otro,Granos,2.00,{empresa},20', lote=1)
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 1))
+        self.assertEqual(Producto.objects.filter(nombre='Otro').get().existencias, 20)
+        self.assertEqual(inventario.diferencias(), {})
+
+    def test_existencias_relativas_a_lo_leido(self):
+        producto = self.productos[2]
+        guardar = importar._guardar
+
+        def con_venta(*args, **kwargs):
+            # Una venta que llega entre la lectura del lote y su escritura
+            registrar_venta(
+                Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]), [(producto.pk, 5, Decimal('2.50'))],
+            )
+            return guardar(*args, **kwargs)
+
+        with mock.patch.object(importar, '_guardar', con_venta):
+            resultado = self.importar(
+                'productos',
+                'nombre,categoria,precio,proveedor,existencias',
+                f'{producto.nombre},{producto.categoria},2.50,{producto.proveedor.empresa},40',
+            )
+        self.assertEqual(resultado.actualizados, 1)
+        # El conteo del archivo se aplica como ajuste sobre lo leído y la venta se conserva
+        self.assertEqual(Producto.objects.get(pk=producto.pk).existencias, 35)
+        movimientos = MovimientoInventario.objects.filter(producto=producto).order_by('pk')
+        self.assertEqual(list(movimientos.values_list('tipo', 'cantidad')), [
+            (MovimientoInventario.ENTRADA, 500), (MovimientoInventario.VENTA, -5), (MovimientoInventario.AJUSTE, -460),
+        ])
+        self.assertEqual(inventario.diferencias(), {})
+
+
+class InstrumentacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_datos()
+
+    def setUp(self):
+        # Los datos de setUpTestData se comparten: sin esto las filas de ver_ventas salen de la caché
+        limpiar_cache()
+
+    def test_medicion_por_vista(self):
+        response = self.client.get(reverse('ver_ventas'))
+        medicion = response.wsgi_request.medicion
+        self.assertEqual(medicion.vista, 'ver_ventas')
+        self.assertEqual(medicion.consultas, 4)
+        self.assertGreater(medicion.tiempo_render, 0)
+        self.assertIn('sql;dur=', response['Server-Timing'])
+
+    def test_huella_agrupa_valores(self):
+        self.assertEqual(
+            huella('SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 21'),
+            huella('SELECT * FROM t WHERE id IN (%s, %s) LIMIT 5'),
+        )
+
+    def test_consultas_repetidas(self):
+        medicion = Medicion('vista')
+        for _ in range(3):
+            medicion(lambda *args: None, 'SELECT 1 FROM t WHERE id = %s', [1], False, {})
+        self.assertEqual(medicion.repetidas(), [('SELECT ? FROM t WHERE id = %s', 3)])
+
+    @override_settings(INSTRUMENTACION_CONSULTAS={**ESTRICTO, 'PRESUPUESTOS': {'ver_ventas': 2}})
+    def test_presupuesto_excedido_falla_en_modo_estricto(self):
+        with self.assertRaises(PresupuestoExcedido):
+            self.client.get(reverse('ver_ventas'))
+
+    @override_settings(INSTRUMENTACION_CONSULTAS={**ESTRICTO, 'ESTRICTO': False, 'PRESUPUESTOS': {'ver_ventas': 2}})
+    def test_presupuesto_excedido_se_registra(self):
+        with self.assertLogs('app_Abarrotes.consultas', 'WARNING') as registro:
+            response = self.client.get(reverse('ver_ventas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ver_ventas excedió su presupuesto', registro.output[0])
+
+
+class SembradoTests(TestCase):
+    VOLUMEN = {'empleados': 3, 'proveedores': 4, 'productos': 30, 'clientes': 10, 'ventas': 50}
+
+    def test_datos_consistentes(self):
+        creados = sembrar(self.VOLUMEN, lineas_por_venta=3, dias=10, lote=7)
+        self.assertEqual(creados['ventas'], 50)
+        self.assertEqual(creados['detalles'], DetalleVenta.objects.count())
+        # Los totales y los acumulados coinciden con los detalles insertados
+        for venta in Venta.objects.annotate(suma=Sum('detalles__subtotal')):
+            self.assertEqual(venta.total, venta.suma)
+        self.assertEqual(
+            VentaDiariaEmpleado.objects.aggregate(n=Sum('num_ventas'))['n'], 50,
+        )
+
+    def test_misma_semilla_mismos_datos(self):
+        def huella_de_datos():
+            return list(DetalleVenta.objects.order_by('pk').values_list('producto__nombre', 'cantidad', 'subtotal'))
+
+        sembrar(self.VOLUMEN, semilla=7, derivados=False)
+        primera = huella_de_datos()
+        DetalleVenta.objects.all().delete()
+        sembrar(self.VOLUMEN, semilla=7, derivados=False)
+        self.assertEqual(huella_de_datos(), primera)
+
+
+class CacheDePaginasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, cls.proveedores, cls.productos = sembrar_datos()
+
+    def setUp(self):
+        limpiar_cache()
+
+    def get(self, nombre):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(reverse(nombre))
+        return response, len(capturadas.captured_queries)
+
+    def test_sirve_de_cache_hasta_una_escritura(self):
+        self.assertEqual(self.get('ver_productos')[0]['X-Cache'], 'MISS')
+        response, consultas = self.get('ver_productos')
+        self.assertEqual((response['X-Cache'], consultas), ('HIT', 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Proveedor.objects.filter(pk=self.proveedores[0].pk).first().save()
+        self.assertEqual(self.get('ver_productos')[0]['X-Cache'], 'MISS')
+        self.assertEqual(self.get('ver_empleados')[0]['X-Cache'], 'MISS')
+        self.assertEqual(self.get('ver_empleados')[0]['X-Cache'], 'HIT')
+
+    def test_venta_invalida_productos_sin_senales(self):
+        self.get('ver_productos')
+        self.get('ver_empleados')
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venta(
+                Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]),
+                [(self.productos[0].pk, 4, Decimal('2.50'))],
+            )
+        response = self.get('ver_productos')[0]
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, '496')
+        self.assertEqual(self.get('ver_empleados')[0]['X-Cache'], 'HIT')
+
+    def test_filas_de_ventas_desde_cache(self):
+        _, frias = self.get('ver_ventas')
+        _, calientes = self.get('ver_ventas')
+        # Sin filas que renderizar no se cargan detalles ni productos
+        self.assertEqual(calientes, frias - 2)
+
+        detalle = DetalleVenta.objects.select_related('venta').order_by('-venta__fecha').first()
+        detalle.cantidad = 9
+        detalle.save()
+        response, consultas = self.get('ver_ventas')
+        self.assertEqual(consultas, frias)
+        self.assertContains(response, '9 x $2.50')
+        filas = cache_vistas.estadisticas.resumen()['vistas']['fragmento:venta/fila_productos.html']
+        self.assertEqual((filas['aciertos'], filas['fallos']), (6 + 5, 6 + 1))
+
+    def test_estadisticas(self):
+        self.get('ver_proveedores')
+        self.get('ver_proveedores')
+        resumen = self.client.get(reverse('estadisticas_cache')).json()
+        self.assertEqual(
+            resumen['vistas']['ver_proveedores'], {'aciertos': 1, 'fallos': 1, 'proporcion_aciertos': 0.5},
+        )
+
+
+@override_settings(TAREAS={'INMEDIATO': True})
+class MiniaturasTests(TestCase):
+
+    def setUp(self):
+        limpiar_cache()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def imagen(self, nombre='foto.png', tamano=(800, 600), modo='RGBA'):
+        salida = BytesIO()
+        Image.new(modo, tamano, (200, 30, 30, 128) if modo == 'RGBA' else (200, 30, 30)).save(salida, 'PNG')
+        return SimpleUploadedFile(nombre, salida.getvalue(), content_type='image/png')
+
+    def crear_empleado(self, foto):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Empleado.objects.create(
+                nombre='Ana', apellido='Foto', puesto='Cajera', salario=1000,
+                fecha_contratacion=datetime.date(2024, 1, 1), foto=foto,
+            )
+
+    def test_variantes_al_subir_foto(self):
+        empleado = self.crear_empleado(self.imagen())
+        with default_storage.open(miniaturas.ruta_variante(empleado.foto.name, 'lista')) as archivo:
+            self.assertEqual(Image.open(archivo).size, (100, 100))
+        with default_storage.open(miniaturas.ruta_variante(empleado.foto.name, 'detalle')) as archivo:
+            self.assertEqual(Image.open(archivo).size, (400, 300))
+        for ruta in miniaturas.variantes_de(empleado.foto.name):
+            self.assertTrue(default_storage.exists(ruta), ruta)
+
+        response = self.client.get(reverse('ver_empleados'))
+        self.assertContains(response, miniaturas.ruta_variante(empleado.foto.name, 'lista', miniaturas.formatos()[-1]))
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_comando_rellena_fotos_existentes(self):
+        # Foto guardada sin pasar por la señal, como las anteriores a las miniaturas
+        nombre = default_storage.save('proveedores/logo.png', self.imagen(modo='RGB'))
+        Proveedor.objects.bulk_create([Proveedor(
+            empresa='Logo', contacto='Contacto', telefono='5551111', email='logo@empresa.com',
+            direccion='Calle 2', categoria='Abarrotes', productos='Varios', foto=nombre,
+        )])
+        self.assertContains(self.client.get(reverse('ver_proveedores')), f'src="/media/{nombre}"')
+
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generar_miniaturas', procesos=1, stdout=salida)
+        self.assertIn('1 fotos procesadas', salida.getvalue())
+        for ruta in miniaturas.variantes_de(nombre):
+            self.assertTrue(default_storage.exists(ruta), ruta)
+        self.assertContains(self.client.get(reverse('ver_proveedores')), miniaturas.ruta_variante(nombre, 'lista'))
+
+    def test_foto_ilegible_no_impide_guardar(self):
+        foto = SimpleUploadedFile('rota.png', b'no es una imagen', content_type='image/png')
+        with self.assertLogs('app_Abarrotes.tareas', 'ERROR'):
+            empleado = self.crear_empleado(foto)
+        self.assertTrue(Empleado.objects.filter(pk=empleado.pk).exists())
+        self.assertEqual(Tarea.objects.get(nombre='generar_miniaturas').estado, Tarea.FALLIDA)
+
+
+@override_settings(TAREAS={'RETRASO_REINTENTO': 0, 'TIEMPO_ABANDONO': 60})
+class TareasTests(TestCase):
+
+    def ejecutar_siguiente(self):
+        tarea_id = tareas.tomar('prueba')
+        tareas.ejecutar(tarea_id)
+        return Tarea.objects.get(pk=tarea_id)
+
+    def test_resultado_y_progreso(self):
+        tareas.encolar('prueba_sumar', numeros=[1, 2, 3])
+        tarea = self.ejecutar_siguiente()
+        self.assertEqual((tarea.estado, tarea.progreso, tarea.intentos), (Tarea.TERMINADA, 100, 1))
+        self.assertEqual(tarea.resultado, {'suma': 6})
+        self.assertEqual(tarea.mensaje, '3 sumados')
+        self.assertIsNone(tareas.tomar('prueba'))
+
+    def test_reintentos_hasta_agotar_intentos(self):
+        tareas.encolar('prueba_fallar')
+        with self.assertLogs('app_Abarrotes.tareas', 'WARNING'):
+            tarea = self.ejecutar_siguiente()
+        self.assertEqual((tarea.estado, tarea.intentos), (Tarea.PENDIENTE, 1))
+        self.assertIn('Disco lleno', tarea.error)
+        with self.assertLogs('app_Abarrotes.tareas', 'ERROR'):
+            tarea = self.ejecutar_siguiente()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.mensaje), (Tarea.FALLIDA, 2, 'Disco lleno'))
+
+    @override_settings(TAREAS={'RETRASO_REINTENTO': 30})
+    def test_espera_exponencial_entre_reintentos(self):
+        tareas.encolar('prueba_fallar')
+        with self.assertLogs('app_Abarrotes.tareas', 'WARNING'):
+            tarea = self.ejecutar_siguiente()
+        self.assertGreater(tarea.disponible_desde, timezone.now() + datetime.timedelta(seconds=25))
+        self.assertIsNone(tareas.tomar('prueba'))
+
+    def test_validation_error_no_se_reintenta(self):
+        tareas.encolar('prueba_fallar', definitiva=True)
+        with self.assertLogs('app_Abarrotes.tareas', 'ERROR'):
+            tarea = self.ejecutar_siguiente()
+        self.assertEqual((tarea.estado, tarea.intentos, tarea.mensaje), (Tarea.FALLIDA, 1, 'Datos inválidos'))
+
+    def test_tareas_de_trabajadores_caidos_vuelven_a_la_cola(self):
+        reanudada = tareas.encolar('prueba_sumar', numeros=[1])
+        agotada = tareas.encolar('prueba_fallar')
+        viva = tareas.encolar('prueba_sumar', numeros=[2])
+        for tarea in (reanudada, agotada, viva):
+            tareas.tomar('caido', tarea.pk)
+        hace_rato = timezone.now() - datetime.timedelta(minutes=5)
+        Tarea.objects.filter(pk__in=[reanudada.pk, agotada.pk]).update(latido=hace_rato)
+        Tarea.objects.filter(pk=agotada.pk).update(intentos=2)
+
+        self.assertEqual(tareas.recuperar_abandonadas(), 2)
+        estados = dict(Tarea.objects.values_list('pk', 'estado'))
+        self.assertEqual(estados, {reanudada.pk: Tarea.PENDIENTE, agotada.pk: Tarea.FALLIDA, viva.pk: Tarea.EN_CURSO})
+
+    @override_settings(TAREAS={'INMEDIATO': True})
+    def test_importacion_en_la_cola(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        csv = (
+            'empresa,contacto,telefono,email,direccion,categoria,productos\n'
+            'Nueva,Ana,5550000,ana@nueva.com,Calle 3,Abarrotes,Varios\n'
+            'Mala,Ana,5550000,no-es-correo,Calle 3,Abarrotes,Varios\n'
+        )
+        with override_settings(MEDIA_ROOT=media), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('importar_catalogo'), {
+                'tipo': 'proveedores', 'archivo': SimpleUploadedFile('proveedores.csv', csv.encode()),
+            })
+        tarea = Tarea.objects.get(nombre='importar_catalogo')
+        self.assertRedirects(response, reverse('detalle_tarea', args=[tarea.pk]))
+        self.assertEqual(tarea.estado, Tarea.TERMINADA)
+        self.assertEqual((tarea.resultado['creados'], tarea.resultado['total_errores']), (1, 1))
+        self.assertTrue(Proveedor.objects.filter(empresa='Nueva').exists())
+        # El archivo subido se borra al terminar
+        self.assertFalse(default_storage.exists(tarea.argumentos['archivo']))
+
+        response = self.client.get(reverse('detalle_tarea', args=[tarea.pk]))
+        self.assertContains(response, '1 creados')
+        self.assertEqual(self.client.get(reverse('detalle_tarea', args=[tarea.pk]), {'formato': 'json'}).json()['estado'], Tarea.TERMINADA)
+
+
+@unittest.skipUnless(
+    connection.vendor == 'sqlite' and not connection.is_in_memory_db(),
+    'Requiere SQLite en archivo (los hilos y procesos usan sus propias conexiones)',
+)
+@override_settings(TAREAS={'RETRASO_REINTENTO': 0, 'ESPERA': 0.05})
+class TrabajadorTests(TransactionTestCase):
+    """El bucle de runworker con sus pools, cada hilo o proceso con su propia conexión"""
+
+    def encolar_varias(self):
+        for i in range(6):
+            tareas.encolar('prueba_sumar', numeros=list(range(i + 1)))
+        tareas.encolar('prueba_fallar')
+
+    def comprobar(self, ejecutadas):
+        # 6 tareas correctas y una que falla en sus 2 intentos
+        self.assertEqual(ejecutadas, 8)
+        estados = dict(Tarea.objects.values_list('nombre', 'estado').order_by('estado'))
+        self.assertEqual(estados, {'prueba_sumar': Tarea.TERMINADA, 'prueba_fallar': Tarea.FALLIDA})
+        self.assertEqual(
+            sorted(tarea.resultado['suma'] for tarea in Tarea.objects.filter(nombre='prueba_sumar')),
+            [0, 1, 3, 6, 10, 15],
+        )
+
+    def test_hilos(self):
+        self.encolar_varias()
+        with self.assertLogs('app_Abarrotes.tareas', 'WARNING'):
+            self.comprobar(tareas.Trabajador(hilos=3).trabajar(una_vez=True))
+
+    def test_procesos(self):
+        self.encolar_varias()
+        # Los fallos se registran en los procesos hijos, que heredan este manejador
+        with self.assertNoLogs('app_Abarrotes.tareas'):
+            self.comprobar(tareas.Trabajador(hilos=2, procesos=True).trabajar(una_vez=True))
+
+
+class InventarioTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos()
+
+    def test_escrituras_de_ventas_quedan_en_el_libro(self):
+        venta = Venta.objects.order_by('pk').first()
+        editar_venta(venta, [(self.productos[0].pk, 7, Decimal('2.50')), (self.productos[5].pk, 1, Decimal('2.50'))])
+        borrar_venta(Venta.objects.order_by('-pk').first())
+        producto = self.productos[1]
+        producto.existencias = 800
+        producto.save()
+
+        self.assertEqual(inventario.diferencias(), {})
+        tipos = set(MovimientoInventario.objects.values_list('tipo', flat=True))
+        self.assertEqual(tipos, {'entrada', 'venta', 'devolucion', 'ajuste'})
+
+    def test_existencias_a_una_fecha_y_cortes(self):
+        producto = self.productos[0]
+        producto.refresh_from_db()
+        antes = producto.existencias
+        momento = timezone.now()
+        registrar_venta(
+            Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]),
+            [(producto.pk, 3, Decimal('2.50'))],
+        )
+
+        self.assertEqual(inventario.existencias_al(momento, [producto.pk]), {producto.pk: antes})
+        self.assertEqual(inventario.compactar(), len(self.productos))
+        self.assertEqual(inventario.compactar(), 0)
+        # Después del corte se suman solo los movimientos nuevos
+        registrar_venta(
+            Venta(id_cliente=self.clientes[0], id_empleado=self.empleados[0]),
+            [(producto.pk, 2, Decimal('2.50'))],
+        )
+        self.assertEqual(inventario.existencias_segun_libro([producto.pk]), {producto.pk: antes - 5})
+        self.assertEqual(inventario.existencias_al(momento, [producto.pk]), {producto.pk: antes})
+        self.assertEqual(CorteInventario.objects.filter(producto=producto).count(), 1)
+        self.assertEqual(inventario.diferencias(), {})
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'Los planes se interpretan en formato de SQLite')
+class PlanesDeConsultaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_datos()
+
+    def test_consultas_criticas_usan_indices(self):
+        for nombre, (texto, problemas) in verificar_planes().items():
+            with self.subTest(consulta=nombre):
+                self.assertEqual(problemas, [], texto)
+
+    def test_detecta_escaneo_completo_y_orden_temporal(self):
+        texto = 'SCAN app_Abarrotes_venta\nUSE TEMP B-TREE FOR ORDER BY'
+        self.assertEqual(
+            problemas_del_plan(texto),
+            ['recorre toda la tabla app_Abarrotes_venta', 'ordena en un B-tree temporal'],
+        )
+        self.assertEqual(problemas_del_plan('SCAN app_Abarrotes_venta USING INDEX venta_fecha'), [])
+
+
+@unittest.skipUnless(
+    connection.vendor == 'sqlite' and not connection.is_in_memory_db(),
+    'Requiere SQLite en archivo (WAL y varias conexiones)',
+)
+class ConcurrenciaSQLiteTests(TransactionTestCase):
+    """Cobros simultáneos desde varios hilos, cada uno con su propia conexión"""
+
+    HILOS = 8
+
+    def test_pragmas_de_conexion(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_cobros_simultaneos_sin_bloqueos(self):
+        empleados, clientes, _, productos = sembrar_datos(n_ventas=0)
+        datos = {
+            'id_cliente': clientes[0].pk,
+            'id_empleado': empleados[0].pk,
+            'total': '0',
+            'producto': [productos[0].pk, productos[1].pk],
+            'cantidad': ['2', '1'],
+            'precio': ['2.50', '2.50'],
+        }
+        barrera = threading.Barrier(self.HILOS)
+        estados, errores = [], []
+
+        def cobrar():
+            try:
+                barrera.wait()
+                estados.append(Client().post(reverse('agregar_venta'), datos).status_code)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=cobrar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(estados, [302] * self.HILOS)
+        self.assertEqual(Venta.objects.count(), self.HILOS)
+        productos[0].refresh_from_db()
+        productos[1].refresh_from_db()
+        self.assertEqual(productos[0].existencias, 500 - 2 * self.HILOS)
+        self.assertEqual(productos[1].existencias, 500 - self.HILOS)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'La réplica de pruebas se copia con la API de respaldo de SQLite')
+@override_settings(REPLICA={'ACTIVA': True, 'ALIAS': 'replica', 'FIJAR_SEGUNDOS': 10}, CACHE_RESPUESTAS={'ACTIVO': False})
+class ReplicaTests(TransactionTestCase):
+    """La réplica es una copia que solo cambia con refrescar(): lo que no se copió aún solo está en la primaria"""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.empleados, self.clientes, _, self.productos = sembrar_datos()
+        replicas.refrescar()
+        # Solo en la primaria hasta el siguiente refresco
+        self.nuevo = Empleado.objects.create(
+            nombre='Recien', apellido='Llegado', puesto='Cajero', salario=1000,
+            fecha_contratacion=datetime.date(2024, 1, 1),
+        )
+
+    def test_listados_y_reportes_leen_de_la_replica(self):
+        with CaptureQueriesContext(connections['replica']) as en_replica:
+            response = self.client.get(reverse('ver_empleados'))
+            self.client.get(reverse('reporte_categorias'))
+            self.client.get(reverse('buscar_productos'), {'q': 'producto'})
+        self.assertNotContains(response, 'Recien')
+        self.assertEqual(len(en_replica.captured_queries), 4)
+        self.assertNotIn('abarrotes_primaria', response.cookies)
+
+        replicas.refrescar()
+        self.assertContains(self.client.get(reverse('ver_empleados')), 'Recien')
+
+    def test_quien_escribe_lee_de_la_primaria(self):
+        datos = {
+            'id_cliente': self.clientes[0].pk,
+            'id_empleado': self.nuevo.pk,
+            'total': '0',
+            'producto': [self.productos[0].pk],
+            'cantidad': ['1'],
+            'precio': ['2.50'],
+        }
+        response = self.client.post(reverse('agregar_venta'), datos)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('abarrotes_primaria', response.cookies)
+        # Con la cookie, sus lecturas siguientes ven lo que aún no está en la réplica
+        self.assertContains(self.client.get(reverse('ver_empleados')), 'Recien')
+        venta = Venta.objects.latest('pk')
+        self.assertEqual(self.client.get(reverse('detalle_venta', args=[venta.pk])).status_code, 200)
+
+        # Otro cliente sigue leyendo de la réplica
+        self.assertEqual(Client().get(reverse('detalle_venta', args=[venta.pk])).status_code, 404)
+
+    def test_escribir_fija_la_peticion_a_la_primaria(self):
+        router = replicas.RouterReplica()
+        with replicas.en_replica():
+            self.assertEqual(router.db_for_read(Empleado), 'replica')
+            self.assertFalse(Empleado.objects.filter(pk=self.nuevo.pk).exists())
+            Empleado.objects.filter(pk=self.nuevo.pk).update(puesto='Gerente')
+            self.assertEqual(router.db_for_read(Empleado), 'default')
+            self.assertTrue(Empleado.objects.filter(pk=self.nuevo.pk).exists())
+        with replicas.en_replica():
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Empleado), 'default')
+
+    def test_listado_del_admin_y_exportacion(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@correo.com', 'clave'))
+        replicas.refrescar()
+        Empleado.objects.filter(pk=self.nuevo.pk).update(nombre='Renombrado')
+        response = self.client.get('/admin/app_Abarrotes/empleado/')
+        self.assertContains(response, 'Recien')
+        self.assertNotContains(response, 'Renombrado')
+
+        venta = Venta.objects.order_by('pk').first()
+        Venta.objects.filter(pk=venta.pk).delete()
+        response = Client().get(reverse('exportar_ventas'))
+        self.assertIn(f'\n{venta.pk},'.encode(), b''.join(response.streaming_content))
+
+    @override_settings(CACHE_RESPUESTAS={'ACTIVO': True})
+    def test_refresco_invalida_paginas_de_la_replica(self):
+        limpiar_cache()
+        # La versión de Empleado ya cambió, pero la réplica todavía no tiene al nuevo
+        self.assertNotContains(self.client.get(reverse('ver_empleados')), 'Recien')
+        self.assertEqual(self.client.get(reverse('ver_empleados'))['X-Cache'], 'HIT')
+        replicas.refrescar()
+        response = self.client.get(reverse('ver_empleados'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Recien')
+
+
+class ArchivoVentasTests(TestCase):
+    """Las ventas archivadas salen de las tablas activas pero siguen en la historia"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=10)
+        # Las primeras seis ventas tienen dos años
+        hace_dos_anos = timezone.now() - datetime.timedelta(days=730)
+        cls.viejas = list(Venta.objects.order_by('pk').values_list('pk', flat=True)[:6])
+        Venta.objects.filter(pk__in=cls.viejas).update(fecha=hace_dos_anos, modificada=hace_dos_anos)
+        rollups.reconstruir(timezone.localdate(hace_dos_anos), timezone.localdate())
+        actualizar_resumenes([cliente.pk for cliente in cls.clientes])
+
+    def setUp(self):
+        # Los on_commit de otras pruebas nunca corren: sus clientes pendientes no cuentan aquí
+        resumenes._pendientes.__dict__.clear()
+
+    def resumenes(self):
+        return list(ResumenCliente.objects.order_by('pk').values(
+            'cliente', 'num_compras', 'total_gastado', 'ultima_compra', 'ultimo_producto',
+            'productos_frecuentes', 'productos_distintos',
+        ))
+
+    def instantanea(self):
+        return (
+            self.resumenes(),
+            list(VentaDiariaProducto.objects.order_by('fecha', 'producto').values_list('fecha', 'producto', 'cantidad', 'importe')),
+        )
+
+    def test_archivar_mueve_las_ventas_cerradas_sin_cambiar_resumenes_ni_acumulados(self):
+        antes = self.instantanea()
+        detalles = DetalleVenta.objects.filter(venta__in=self.viejas).count()
+        salida = StringIO()
+        call_command('archivar_ventas', lote=4, stdout=salida)
+
+        self.assertIn('Archivado terminado: 6 ventas.', salida.getvalue())
+        self.assertFalse(Venta.objects.filter(pk__in=self.viejas).exists())
+        self.assertEqual(Venta.objects.count(), 4)
+        self.assertEqual(sorted(VentaArchivada.objects.values_list('pk', flat=True)), self.viejas)
+        self.assertEqual(DetalleVentaArchivado.objects.count(), detalles)
+        self.assertEqual(historico.archivar(), 0)
+        self.assertEqual(self.instantanea(), antes)
+
+        # Recalcular desde cero da lo mismo con la mitad de la historia en el archivo
+        actualizar_resumenes([cliente.pk for cliente in self.clientes])
+        rollups.reconstruir(timezone.localdate() - datetime.timedelta(days=800), timezone.localdate())
+        self.assertEqual(self.instantanea(), antes)
+
+    def test_el_cobro_no_recorre_el_archivo(self):
+        historico.archivar()
+        cliente = VentaArchivada.objects.order_by('pk').first().id_cliente
+        antes = ResumenCliente.objects.get(cliente=cliente)
+        with CaptureQueriesContext(connection) as capturadas, self.captureOnCommitCallbacks(execute=True):
+            registrar_venta(Venta(id_cliente=cliente, id_empleado=self.empleados[0]), [(self.productos[5].pk, 1, Decimal('2.50'))])
+        archivo = [VentaArchivada._meta.db_table, DetalleVentaArchivado._meta.db_table]
+        self.assertFalse([q['sql'] for q in capturadas.captured_queries if any(f'"{tabla}"' in q['sql'] for tabla in archivo)])
+
+        resumen = ResumenCliente.objects.get(cliente=cliente)
+        self.assertEqual((resumen.num_compras, resumen.total_gastado), (antes.num_compras + 1, antes.total_gastado + Decimal('2.50')))
+        self.assertEqual(resumen.ultimo_producto_id, self.productos[5].pk)
+        # Igual que recalcular la línea base desde el archivo
+        incrementales = self.resumenes()
+        actualizar_resumenes([cliente.pk], con_archivo=True)
+        self.assertEqual(self.resumenes(), incrementales)
+
+    def test_borrados_en_el_archivo_recalculan_la_linea_base(self):
+        historico.archivar()
+        with self.captureOnCommitCallbacks(execute=True):
+            VentaArchivada.objects.order_by('pk').first().delete()
+            Producto.objects.filter(pk=self.productos[1].pk).delete()
+        incrementales = self.resumenes()
+        call_command('reconstruir_resumenes', stdout=StringIO())
+        self.assertEqual(self.resumenes(), incrementales)
+
+    def test_las_vistas_leen_ambas_tablas(self):
+        historico.archivar()
+        venta = VentaArchivada.objects.select_related('id_cliente').order_by('pk').first()
+        response = self.client.get(reverse('detalle_venta', args=[venta.pk]))
+        self.assertContains(response, 'Archivada el')
+        self.assertNotContains(response, reverse('borrar_venta', args=[venta.pk]))
+
+        response = self.client.get(reverse('detalle_cliente', args=[venta.id_cliente.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(venta.pk, [compra.pk for compra in response.context['ventas']])
+
+        exportado = b''.join(self.client.get(reverse('exportar_ventas')).streaming_content).decode()
+        # Una fila por línea de venta
+        ids = list(dict.fromkeys(int(linea.split(',')[0]) for linea in exportado.splitlines()[1:]))
+        self.assertEqual(sorted(ids), sorted(self.viejas + list(Venta.objects.values_list('pk', flat=True))))
+        # La exportación sigue ordenada por fecha aunque mezcle las dos tablas
+        self.assertEqual(ids[:6], self.viejas)
+
+    def test_borrar_un_producto_descuenta_las_lineas_archivadas(self):
+        historico.archivar()
+        producto = self.productos[0]
+        lineas = DetalleVentaArchivado.objects.filter(producto=producto)
+        ventas = set(lineas.values_list('venta_id', flat=True))
+        self.assertTrue(ventas)
+        Producto.objects.filter(pk=producto.pk).delete()
+        for venta in VentaArchivada.objects.filter(pk__in=ventas):
+            self.assertEqual(venta.total, venta.detalles.aggregate(total=Sum('subtotal'))['total'] or 0)
+
+
+@override_settings(REABASTO={'VENTANAS': {7: 1}, 'DIAS_ENTREGA': 7, 'DIAS_SEGURIDAD': 3, 'DIAS_COBERTURA': 14})
+class ReabastoTests(TestCase):
+    """Con una sola ventana de 7 días y 10 unidades diarias: reorden en 100, pedido hasta 240"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, cls.proveedores, cls.productos = sembrar_datos(n_ventas=0)
+        hoy = timezone.localdate()
+        # Productos 0, 1 y 2 venden 10 diarias; el 3 solo vendió hace 8 días
+        VentaDiariaProducto.objects.bulk_create([
+            VentaDiariaProducto(fecha=hoy - datetime.timedelta(days=dia), producto=producto, cantidad=10, importe=25)
+            for producto in cls.productos[:3] for dia in range(7)
+        ] + [
+            VentaDiariaProducto(fecha=hoy - datetime.timedelta(days=8), producto=cls.productos[3], cantidad=50, importe=125),
+        ])
+        for producto, existencias in zip(cls.productos[:4], [80, 100, 101, 0]):
+            Producto.objects.filter(pk=producto.pk).update(existencias=existencias)
+
+    def test_sugerencias_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            filas = list(reabasto.sugerencias())
+        self.assertEqual(
+            [(fila['producto'], fila['punto_reorden'], fila['sugerida']) for fila in filas],
+            [(self.productos[0].pk, 100, 160), (self.productos[1].pk, 100, 140)],
+        )
+        self.assertEqual(filas[0]['velocidad'], 10)
+        self.assertEqual([fila['producto'] for fila in reabasto.sugerencias(self.proveedores[1])], [self.productos[1].pk])
+
+    @override_settings(REABASTO={})
+    def test_velocidad_ponderada_por_ventanas(self):
+        # Las 50 unidades de hace 8 días cuentan en las ventanas de 28 y 91 días, no en la de 7
+        fila = reabasto.sugerencias().get(producto=self.productos[3].pk)
+        velocidad = 0.3 * 50 / 28 + 0.2 * 50 / 91
+        self.assertAlmostEqual(fila['velocidad'], velocidad)
+        self.assertEqual((fila['vendidas_7'], fila['vendidas_28'], fila['vendidas_91']), (0, 50, 50))
+        self.assertEqual(fila['punto_reorden'], math.ceil(velocidad * 10))
+        self.assertEqual(fila['sugerida'], math.ceil(velocidad * 24))
+
+    def test_borradores_por_proveedor(self):
+        enviada = OrdenCompra.objects.create(proveedor=self.proveedores[0], estado=OrdenCompra.ENVIADA)
+        reabasto.guardar_borradores()
+        ordenes = reabasto.guardar_borradores()
+
+        self.assertEqual(len(ordenes), 2)
+        self.assertEqual(OrdenCompra.objects.filter(estado=OrdenCompra.BORRADOR).count(), 2)
+        self.assertTrue(OrdenCompra.objects.filter(pk=enviada.pk).exists())
+        self.assertEqual(
+            sorted(LineaOrdenCompra.objects.values_list('producto', 'cantidad', 'punto_reorden')),
+            [(self.productos[0].pk, 160, 100), (self.productos[1].pk, 140, 100)],
+        )
+
+        salida = StringIO()
+        call_command('sugerir_compras', stdout=salida)
+        self.assertIn('pedir 160', salida.getvalue())
+
+    def test_vista(self):
+        response = self.client.get(reverse('compras_sugeridas'), {'proveedor': self.proveedores[1].pk})
+        self.assertContains(response, self.productos[1].nombre)
+        self.assertEqual(response.context['total_productos'], 2)
+        # El reporte es de solo lectura: guardar va a su propia vista, que primero pide confirmación
+        self.client.post(reverse('compras_sugeridas'), {'proveedor': self.proveedores[1].pk})
+        response = self.client.get(reverse('guardar_compras_sugeridas'), {'proveedor': self.proveedores[1].pk})
+        self.assertContains(response, self.proveedores[1].empresa)
+        self.assertFalse(OrdenCompra.objects.exists())
+
+        # Guardar (y reemplazar) los borradores cabe en el presupuesto de la vista
+        with self.assertNoLogs('app_Abarrotes.consultas', 'WARNING'):
+            self.client.post(reverse('guardar_compras_sugeridas'))
+            response = self.client.post(reverse('guardar_compras_sugeridas'), {'proveedor': self.proveedores[1].pk})
+        destino = f"{reverse('compras_sugeridas')}?proveedor={self.proveedores[1].pk}"
+        self.assertRedirects(response, destino, fetch_redirect_response=False)
+        self.assertEqual(
+            sorted(OrdenCompra.objects.values_list('proveedor', flat=True)), [self.proveedores[0].pk, self.proveedores[1].pk],
+        )
+        self.assertEqual(LineaOrdenCompra.objects.count(), 2)
+
+
+class LoteVentasTests(TestCase):
+    """Ventas en lote de cajas sin red: idempotentes, con stock validado para todo el lote"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empleados, cls.clientes, _, cls.productos = sembrar_datos(n_ventas=0)
+
+    def venta(self, clave, *lineas, cliente=None, **extra):
+        return {
+            'clave': clave,
+            'cliente': cliente or self.clientes[0].pk,
+            'empleado': self.empleados[0].pk,
+            'lineas': [
+                {'producto': producto.pk, 'cantidad': cantidad, 'precio': precio[0] if precio else None}
+                for producto, cantidad, *precio in lineas
+            ],
+            **extra,
+        }
+
+    def enviar(self, ventas):
+        return self.client.post(reverse('agregar_lote_ventas'), json.dumps({'ventas': ventas}), content_type='application/json')
+
+    def test_registra_valida_y_no_duplica(self):
+        ayer = (timezone.now() - datetime.timedelta(days=1)).replace(microsecond=0)
+        ventas = [
+            self.venta('caja1-1', (self.productos[0], 2, '3.00'), (self.productos[1], 1), fecha=ayer.isoformat()),
+            self.venta('caja1-2', (self.productos[0], 300)),
+            # Con las 302 anteriores ya no alcanza el stock de 500
+            self.venta('caja1-3', (self.productos[0], 300)),
+            self.venta('caja1-4', (self.productos[2], 1), cliente=999999),
+            self.venta('caja1-2', (self.productos[0], 300)),
+            {'cliente': 1, 'lineas': []},
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.enviar(ventas).json()
+
+        estados = [resultado['estado'] for resultado in respuesta['resultados']]
+        self.assertEqual(estados, ['creada', 'creada', 'rechazada', 'rechazada', 'duplicada', 'rechazada'])
+        self.assertEqual((respuesta['creadas'], respuesta['duplicadas'], respuesta['rechazadas']), (2, 1, 3))
+        self.assertIn('Stock insuficiente', respuesta['resultados'][2]['errores'][0])
+        self.assertEqual(respuesta['resultados'][4]['venta'], respuesta['resultados'][1]['venta'])
+
+        primera = Venta.objects.get(pk=respuesta['resultados'][0]['venta'])
+        self.assertEqual(primera.total, Decimal('8.50'))
+        self.assertEqual(primera.fecha, ayer)
+        self.assertEqual(primera.detalles.count(), 2)
+        self.assertEqual(Producto.objects.get(pk=self.productos[0].pk).existencias, 198)
+        self.assertEqual(inventario.diferencias(), {})
+        self.assertEqual(MovimientoInventario.objects.filter(tipo='venta').count(), 3)
+        self.assertEqual(VentaDiariaEmpleado.objects.aggregate(num=Sum('num_ventas'))['num'], 2)
+        self.assertEqual(ResumenCliente.objects.get(cliente=self.clientes[0]).num_compras, 2)
+
+        # Reenviar el lote completo no crea nada nuevo
+        respuesta = self.enviar(ventas).json()
+        self.assertEqual((respuesta['creadas'], respuesta['duplicadas']), (0, 3))
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(ClaveVenta.objects.count(), 2)
+
+    def test_consultas_no_dependen_del_tamano_del_lote(self):
+        def consultas(n, prefijo):
+            ventas = [
+                self.venta(f'{prefijo}-{i}', *[(producto, 1) for producto in self.productos[:3]])
+                for i in range(n)
+            ]
+            with CaptureQueriesContext(connection) as capturadas:
+                self.assertEqual(self.enviar(ventas).json()['creadas'], n)
+            return len(capturadas.captured_queries)
+
+        self.assertEqual(consultas(2, 'a'), consultas(40, 'b'))
+
+    def test_rechaza_peticiones_mal_formadas(self):
+        url = reverse('agregar_lote_ventas')
+        self.assertEqual(self.client.post(url, {'ventas': '[]'}).status_code, 415)
+        self.assertEqual(self.client.post(url, '{', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post(url, '[]', content_type='application/json').status_code, 400)
+        with mock.patch.object(services, 'MAX_LINEAS_POR_LOTE', 1):
+            respuesta = self.enviar([self.venta('x', (self.productos[0], 1), (self.productos[1], 1))])
+        self.assertEqual(respuesta.status_code, 413)
+        self.assertFalse(Venta.objects.exists())
+
+
+class PreciosTests(TestCase):
+    """Ajustes masivos en un UPDATE e historial de cada cambio de precio"""
+
+    @classmethod
+    def setUpTestData(cls):
+        _, _, cls.proveedores, cls.productos = sembrar_datos(n_ventas=0)
+
+    def precios(self):
+        return list(Producto.objects.order_by('pk').values_list('precio', flat=True))
+
+    def test_ajuste_por_categoria_con_redondeo(self):
+        # Categoria0: productos 0, 2 y 4; 2.50 × 1.10 = 2.75 -> 2.99
+        cambiados = precios.reajustar(precios.seleccionar(categoria='Categoria0'), porcentaje=10, redondeo='terminacion_99')
+        self.assertEqual(cambiados, 3)
+        self.assertEqual(self.precios(), [Decimal(p) for p in ['2.99', '2.50', '2.99', '2.50', '2.99', '2.50']])
+        self.assertEqual(
+            sorted(PrecioHistorico.objects.values_list('producto', 'precio_anterior', 'precio', 'origen')),
+            [(producto.pk, Decimal('2.50'), Decimal('2.99'), PrecioHistorico.AJUSTE) for producto in self.productos[0::2]],
+        )
+        # Un precio ya terminado en .99 no cambia ni se vuelve a registrar
+        self.assertEqual(precios.reajustar(precios.seleccionar(categoria='Categoria0'), redondeo='terminacion_99'), 0)
+        self.assertEqual(PrecioHistorico.objects.count(), 3)
+
+    def test_criterios_combinados_y_reglas(self):
+        seleccion = precios.seleccionar(categoria='Categoria1', proveedor=self.proveedores[0])
+        self.assertEqual(list(seleccion.values_list('pk', flat=True)), [self.productos[3].pk])
+        precios.reajustar(precios.seleccionar(productos=[self.productos[0].pk]), monto='-0.26', redondeo='diez_centavos')
+        precios.reajustar(precios.seleccionar(productos=[self.productos[1].pk]), porcentaje='3', redondeo='cincuenta_centavos')
+        precios.reajustar(precios.seleccionar(productos=[self.productos[2].pk]), porcentaje='-21', redondeo='peso')
+        self.assertEqual(self.precios()[:3], [Decimal('2.20'), Decimal('2.50'), Decimal('2.00')])
+        with self.assertRaises(ValidationError):
+            precios.seleccionar()
+
+    def test_precio_negativo_no_cambia_nada(self):
+        with self.assertRaises(ValidationError):
+            precios.reajustar(precios.seleccionar(proveedor=self.proveedores[0]), monto=-3)
+        self.assertEqual(set(self.precios()), {Decimal('2.50')})
+        self.assertFalse(PrecioHistorico.objects.exists())
+
+    def test_consultas_no_dependen_del_numero_de_productos(self):
+        def consultas(seleccion):
+            with CaptureQueriesContext(connection) as capturadas:
+                precios.reajustar(seleccion, monto=1)
+            return len(capturadas.captured_queries)
+
+        uno = consultas(precios.seleccionar(productos=[self.productos[0].pk]))
+        self.assertEqual(consultas(precios.seleccionar(productos=[producto.pk for producto in self.productos])), uno)
+
+    def test_ediciones_e_importaciones_quedan_en_el_historial(self):
+        producto = Producto.objects.get(pk=self.productos[0].pk)
+        producto.precio = Decimal('3.00')
+        producto.save()
+        producto.existencias = 10
+        producto.save()
+
+        csv = (
+            'nombre,categoria,precio,proveedor\n'
+            f'{self.productos[1].nombre},Categoria1,4.00,{self.proveedores[1].empresa}\n'
+            f'{self.productos[2].nombre},Categoria0,2.50,{self.proveedores[2].empresa}\n'
+        )
+        importar.importar_catalogo('productos', StringIO(csv))
+        self.assertEqual(
+            list(PrecioHistorico.objects.order_by('pk').values_list('producto', 'precio_anterior', 'precio', 'origen')),
+            [
+                (self.productos[0].pk, Decimal('2.50'), Decimal('3.00'), PrecioHistorico.EDICION),
+                (self.productos[1].pk, Decimal('2.50'), Decimal('4.00'), PrecioHistorico.IMPORTACION),
+            ],
+        )
+
+    def test_precios_al(self):
+        producto = self.productos[0].pk
+        hace = lambda dias: timezone.now() - datetime.timedelta(days=dias)
+        PrecioHistorico.objects.bulk_create([
+            PrecioHistorico(producto_id=producto, precio_anterior=Decimal('2.00'), precio=Decimal('2.20'), fecha=hace(10)),
+            PrecioHistorico(producto_id=producto, precio_anterior=Decimal('2.20'), precio=Decimal('2.50'), fecha=hace(5)),
+        ])
+        self.assertEqual(precios.precios_al(hace(20), [producto]), {producto: Decimal('2.00')})
+        self.assertEqual(precios.precios_al(hace(7), [producto]), {producto: Decimal('2.20')})
+        self.assertEqual(precios.precios_al(hace(1), [producto]), {producto: Decimal('2.50')})
+        # Sin cambios registrados vale el precio actual
+        self.assertEqual(precios.precios_al(hace(7))[self.productos[1].pk], Decimal('2.50'))
+
+    def test_vista_y_comando(self):
+        response = self.client.post(reverse('reajustar_precios'), {
+            'proveedor': self.proveedores[0].pk, 'productos': '', 'categoria': '',
+            'porcentaje': '20', 'monto': '0', 'redondeo': 'centavo',
+        })
+        self.assertRedirects(response, reverse('ver_productos'))
+        self.assertEqual(Producto.objects.get(pk=self.productos[3].pk).precio, Decimal('3.00'))
+
+        response = self.client.post(reverse('reajustar_precios'), {'porcentaje': '20', 'redondeo': 'centavo'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+
+        salida = StringIO()
+        call_command('reajustar_precios', '--productos', str(self.productos[1].pk), '--monto', '0.5', stdout=salida)
+        self.assertIn('1 productos', salida.getvalue())
+        self.assertEqual(Producto.objects.get(pk=self.productos[1].pk).precio, Decimal('3.00'))
+        self.assertEqual(PrecioHistorico.objects.count(), 3)
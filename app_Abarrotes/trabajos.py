@@ -0,0 +1,109 @@
+"""
+Tareas que se ejecutan en la cola (ver tareas.py). El módulo se importa al
+cargar la app, así que las vistas que encolan y el trabajador conocen las
+mismas tareas.
+"""
+import csv
+import io
+import tempfile
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import UnidentifiedImageError
+
+from . import cache_vistas, historico, miniaturas, replicas, rollups
+from .exportar import FORMATOS, exportar_ventas as generar_exportacion
+from .forms import FiltroVentasForm
+from .importar import importar_catalogo as procesar_catalogo
+from .models import Empleado, Proveedor
+from .tareas import tarea
+
+# Errores de importación que se conservan en el resultado de la tarea
+MAX_ERRORES_RESULTADO = 200
+
+
+@tarea('importar_catalogo')
+def importar_catalogo(progreso, tipo, archivo):
+    """Importa el CSV guardado en el storage como `archivo` y lo borra al terminar"""
+    tamano = default_storage.size(archivo)
+    try:
+        with default_storage.open(archivo, 'rb') as crudo:
+            texto = io.TextIOWrapper(crudo.file, encoding='utf-8-sig', newline='')
+            resultado = procesar_catalogo(
+                tipo, texto,
+                al_avanzar=lambda parcial: progreso(crudo.tell(), tamano, f'{parcial.filas} filas procesadas'),
+            )
+    except (UnicodeDecodeError, csv.Error) as e:
+        default_storage.delete(archivo)
+        raise ValidationError(f'No se pudo leer el archivo: {e}')
+    except ValidationError:
+        default_storage.delete(archivo)
+        raise
+    # Ante otros errores el archivo se conserva para el reintento
+    default_storage.delete(archivo)
+
+    errores = resultado.errores[:MAX_ERRORES_RESULTADO]
+    return {
+        'filas': resultado.filas,
+        'creados': resultado.creados,
+        'actualizados': resultado.actualizados,
+        'sin_cambios': resultado.sin_cambios,
+        'total_errores': resultado.total_errores,
+        'errores': errores,
+        'errores_omitidos': resultado.total_errores - len(errores),
+    }
+
+
+@tarea('exportar_ventas')
+def exportar_ventas(progreso, filtros=None, formato='csv', comprimir=False):
+    """Guarda en el storage (exportaciones/) la exportación de las ventas filtradas"""
+    filtro, alias = FiltroVentasForm(filtros or None), replicas.alias_lectura()
+    ventas, archivadas = historico.ambas(lambda queryset: filtro.filtrar(queryset.using(alias)))
+    nombre = f'exportaciones/ventas_{timezone.localdate():%Y%m%d}.{FORMATOS[formato][1]}'
+    if comprimir:
+        nombre += '.gz'
+    escritos = 0
+    with tempfile.TemporaryFile() as temporal:
+        for trozo in generar_exportacion(ventas, formato, comprimir, archivadas):
+            temporal.write(trozo)
+            escritos += len(trozo)
+            progreso(escritos, mensaje=f'{escritos / 1024 / 1024:.1f} MB escritos')
+        temporal.seek(0)
+        ruta = default_storage.save(nombre, File(temporal))
+    return {'archivo': ruta, 'url': default_storage.url(ruta), 'bytes': escritos}
+
+
+@tarea('generar_miniaturas', max_intentos=2)
+def generar_miniaturas(progreso, nombre):
+    """Variantes reducidas de una foto de empleado o proveedor"""
+    try:
+        escritos = miniaturas.generar(nombre)
+    except UnidentifiedImageError as e:
+        raise ValidationError(f'{nombre} no es una imagen válida: {e}')
+    if escritos:
+        # Los listados en caché todavía apuntan a la foto original
+        cache_vistas.invalidar(Empleado, Proveedor)
+    return {'archivos': escritos}
+
+
+@tarea('reconstruir_acumulados')
+def reconstruir_acumulados(progreso, desde, hasta, dias_por_lote=7):
+    """Acumulados diarios de [desde, hasta] (fechas AAAA-MM-DD), por lotes de días"""
+    desde, hasta = date.fromisoformat(desde), date.fromisoformat(hasta)
+    dias = (hasta - desde).days + 1
+    for _, fin in rollups.reconstruir_por_lotes(desde, hasta, dias_por_lote):
+        progreso((fin - desde).days + 1, dias, f'Reconstruido hasta el {fin}')
+    return {'dias': dias}
+
+
+@tarea('archivar_ventas')
+def archivar_ventas(progreso, edad_dias=None):
+    """Mueve al archivo las ventas cerradas (ver historico.py)"""
+    total = historico.archivables(edad_dias).count()
+    archivadas = historico.archivar(
+        edad_dias, al_avanzar=lambda hechas: progreso(hechas, total, f'{hechas} ventas archivadas'),
+    )
+    return {'archivadas': archivadas}
@@ -1,38 +1,67 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-
-urlpatterns = [
-    path('', views.inicio, name='inicio'),
-    
-    # URLs para Empleados
-    path('empleados/', views.ver_empleados, name='ver_empleados'),
-    path('empleados/agregar/', views.agregar_empleado, name='agregar_empleado'),
-    path('empleados/actualizar/<int:pk>/', views.actualizar_empleado, name='actualizar_empleado'),
-    path('empleados/borrar/<int:pk>/', views.borrar_empleado, name='borrar_empleado'),
-    
-    # URLs para Clientes
-    path('clientes/', views.ver_clientes, name='ver_clientes'),
-    path('clientes/agregar/', views.agregar_cliente, name='agregar_cliente'),
-    path('clientes/actualizar/<int:pk>/', views.actualizar_cliente, name='actualizar_cliente'),
-    path('clientes/borrar/<int:pk>/', views.borrar_cliente, name='borrar_cliente'),
-    path('clientes/detalle/<int:pk>/', views.detalle_cliente, name='detalle_cliente'),  # NUEVA URL
-    
-    # URLs para Ventas
-    path('ventas/', views.ver_ventas, name='ver_ventas'),
-    path('ventas/agregar/', views.agregar_venta, name='agregar_venta'),
-    path('ventas/actualizar/<int:pk>/', views.actualizar_venta, name='actualizar_venta'),
-    path('ventas/borrar/<int:pk>/', views.borrar_venta, name='borrar_venta'),
-    path('ventas/detalle/<int:pk>/', views.detalle_venta, name='detalle_venta'),
-    
-    # URLs para Proveedores
-    path('proveedores/', views.ver_proveedores, name='ver_proveedores'),
-    path('proveedores/agregar/', views.agregar_proveedor, name='agregar_proveedor'),
-    path('proveedores/actualizar/<int:pk>/', views.actualizar_proveedor, name='actualizar_proveedor'),
-    path('proveedores/borrar/<int:pk>/', views.borrar_proveedor, name='borrar_proveedor'),
-    
-    # URLs para Productos
-    path('productos/', views.ver_productos, name='ver_productos'),
-    path('productos/agregar/', views.agregar_producto, name='agregar_producto'),
-    path('productos/actualizar/<int:pk>/', views.actualizar_producto, name='actualizar_producto'),
-    path('productos/borrar/<int:pk>/', views.borrar_producto, name='borrar_producto'),
-]
\ No newline at end of file
+from . import views, views_async
+
+
+def patrones(lectura):
+    """Rutas de la app; las vistas de solo lectura se toman de `lectura` (views o views_async)"""
+    return [
+        path('', views.inicio, name='inicio'),
+
+        # URLs para Empleados
+        path('empleados/', lectura.ver_empleados, name='ver_empleados'),
+        path('empleados/agregar/', views.agregar_empleado, name='agregar_empleado'),
+        path('empleados/actualizar/<int:pk>/', views.actualizar_empleado, name='actualizar_empleado'),
+        path('empleados/borrar/<int:pk>/', views.borrar_empleado, name='borrar_empleado'),
+
+        # URLs para Clientes
+        path('clientes/', lectura.ver_clientes, name='ver_clientes'),
+        path('clientes/agregar/', views.agregar_cliente, name='agregar_cliente'),
+        path('clientes/actualizar/<int:pk>/', views.actualizar_cliente, name='actualizar_cliente'),
+        path('clientes/borrar/<int:pk>/', views.borrar_cliente, name='borrar_cliente'),
+        path('clientes/detalle/<int:pk>/', lectura.detalle_cliente, name='detalle_cliente'),  # NUEVA URL
+
+        # URLs para Ventas
+        path('ventas/', lectura.ver_ventas, name='ver_ventas'),
+        path('ventas/agregar/', views.agregar_venta, name='agregar_venta'),
+        path('ventas/lote/', views.agregar_lote_ventas, name='agregar_lote_ventas'),
+        path('ventas/actualizar/<int:pk>/', views.actualizar_venta, name='actualizar_venta'),
+        path('ventas/borrar/<int:pk>/', views.borrar_venta, name='borrar_venta'),
+        path('ventas/detalle/<int:pk>/', lectura.detalle_venta, name='detalle_venta'),
+        path('ventas/exportar/', views.exportar_ventas, name='exportar_ventas'),
+        path(
+            'ventas/exportar/segundo-plano/', views.exportar_ventas_segundo_plano, name='exportar_ventas_segundo_plano',
+        ),
+
+        # URLs para Proveedores
+        path('proveedores/', lectura.ver_proveedores, name='ver_proveedores'),
+        path('proveedores/agregar/', views.agregar_proveedor, name='agregar_proveedor'),
+        path('proveedores/actualizar/<int:pk>/', views.actualizar_proveedor, name='actualizar_proveedor'),
+        path('proveedores/borrar/<int:pk>/', views.borrar_proveedor, name='borrar_proveedor'),
+
+        # URLs para Productos
+        path('productos/', lectura.ver_productos, name='ver_productos'),
+        path('productos/agregar/', views.agregar_producto, name='agregar_producto'),
+        path('productos/actualizar/<int:pk>/', views.actualizar_producto, name='actualizar_producto'),
+        path('productos/borrar/<int:pk>/', views.borrar_producto, name='borrar_producto'),
+        path('productos/importar/', views.importar_catalogo, name='importar_catalogo'),
+        path('productos/precios/', views.reajustar_precios, name='reajustar_precios'),
+
+        # URLs de búsqueda (JSON)
+        path('buscar/productos/', lectura.buscar_productos, name='buscar_productos'),
+        path('buscar/proveedores/', lectura.buscar_proveedores, name='buscar_proveedores'),
+        path('productos/consulta/', lectura.consultar_productos, name='consultar_productos'),
+
+        # URLs de reportes
+        path('reportes/categorias/', views.reporte_categorias, name='reporte_categorias'),
+        path('reportes/compras/', views.compras_sugeridas, name='compras_sugeridas'),
+        path('reportes/compras/guardar/', views.guardar_compras_sugeridas, name='guardar_compras_sugeridas'),
+        path('reportes/cache/', views.estadisticas_cache, name='estadisticas_cache'),
+
+        # URLs de tareas en segundo plano
+        path('tareas/', lectura.ver_tareas, name='ver_tareas'),
+        path('tareas/<int:pk>/', views.detalle_tarea, name='detalle_tarea'),
+    ]
+
+
+urlpatterns = patrones(views_async if settings.VISTAS_ASYNC else views)
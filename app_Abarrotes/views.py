@@ -1,16 +1,49 @@
+import json
+from datetime import timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db import transaction
+from django.urls import reverse
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.core.exceptions import ValidationError
+from django.db.models import Sum, prefetch_related_objects
 from django.contrib import messages
-from .models import Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta
-from .forms import EmpleadoForm, ClienteForm, VentaForm, ProductoForm, ProveedorForm, DetalleVentaForm
+from django.views.decorators.csrf import csrf_exempt
+from .models import (
+    Empleado, Cliente, Venta, Producto, Proveedor, DetalleVenta, MovimientoInventario, VentaDiariaCategoria, Tarea,
+)
+from .forms import (
+    EmpleadoForm, ClienteForm, VentaForm, ProductoForm, ProveedorForm, DetalleVentaForm,
+    FiltroVentasForm, FiltroClientesForm, FiltroProductosForm, FiltroProveedoresForm, FiltroEmpleadosForm,
+    FiltroTareasForm, ImportarCatalogoForm, ReajustePreciosForm, ExportarVentasForm,
+)
+from .paginacion import paginar_keyset
+from . import busqueda, historico, precios, reabasto, tareas
+from .cache_vistas import cache_por_version, estadisticas as estadisticas_de_cache, fragmentos
+from .exportar import FORMATOS, exportar_ventas as generar_exportacion
+from .replicas import solo_lectura
+from .services import (
+    MAX_LINEAS_POR_LOTE, leer_lineas, registrar_lote, registrar_venta, editar_venta, borrar_venta as eliminar_venta,
+)
 
+@cache_por_version()
 def inicio(request):
     return render(request, 'inicio.html')
 
 # ========== VISTAS PARA EMPLEADOS ==========
+@solo_lectura
+@cache_por_version(Empleado)
 def ver_empleados(request):
-    empleados = Empleado.objects.all()
-    return render(request, 'empleado/ver_empleados.html', {'empleados': empleados})
+    filtro_form = FiltroEmpleadosForm(request.GET or None)
+    empleados = filtro_form.filtrar(Empleado.objects.all())
+    pagina = paginar_keyset(request, empleados, ['apellido', 'nombre', 'id'])
+    return render(request, 'empleado/ver_empleados.html', {
+        'empleados': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
 
 def agregar_empleado(request):
     if request.method == 'POST':
@@ -44,17 +77,23 @@ def borrar_empleado(request, pk):
     return render(request, 'empleado/borrar_empleado.html', {'empleado': empleado})
 
 # ========== VISTAS PARA CLIENTES ==========
+@solo_lectura
 def ver_clientes(request):
-    clientes = Cliente.objects.all().select_related('id_empleado').prefetch_related(
-        'compras_realizadas__detalles__producto'
-    )
+    filtro_form = FiltroClientesForm(request.GET or None)
+    clientes = filtro_form.filtrar(Cliente.objects.all()).select_related('id_empleado', 'resumen')
+    pagina = paginar_keyset(request, clientes, ['nombre', 'id'])
     
-    # Agregar información de productos comprados a cada cliente
-    for cliente in clientes:
-        cliente.productos_comprados_info = cliente.productos_comprados_str()
-        cliente.total_compras = cliente.compras_realizadas.count()
+    # Información de compras tomada del resumen materializado de cada cliente
+    for cliente in pagina:
+        resumen = cliente.obtener_resumen()
+        cliente.productos_comprados_info = resumen.productos_str()
+        cliente.total_compras = resumen.num_compras
     
-    return render(request, 'cliente/ver_clientes.html', {'clientes': clientes})
+    return render(request, 'cliente/ver_clientes.html', {
+        'clientes': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
 
 def agregar_cliente(request):
     if request.method == 'POST':
@@ -87,12 +126,14 @@ def borrar_cliente(request, pk):
         return redirect('ver_clientes')
     return render(request, 'cliente/borrar_cliente.html', {'cliente': cliente})
 
+@solo_lectura
 def detalle_cliente(request, pk):
     """Vista para ver el detalle completo de un cliente y sus productos comprados"""
-    cliente = get_object_or_404(Cliente, pk=pk)
+    cliente = get_object_or_404(Cliente.objects.select_related('id_empleado', 'resumen__ultimo_producto'), pk=pk)
+    resumen = cliente.obtener_resumen()
     
-    # Obtener todas las ventas del cliente con sus detalles
-    ventas = cliente.compras_realizadas.all().prefetch_related('detalles__producto')
+    # Obtener todas las ventas del cliente con sus detalles, también las archivadas
+    ventas = historico.ventas_de_cliente(cliente)
     
     # Obtener todos los productos comprados
     productos_comprados = []
@@ -110,88 +151,98 @@ def detalle_cliente(request, pk):
         'cliente': cliente,
         'ventas': ventas,
         'productos_comprados': productos_comprados,
-        'total_ventas': ventas.count(),
-        'total_gastado': sum(venta.total for venta in ventas)
+        'resumen': resumen,
+        'total_ventas': resumen.num_compras,
+        'total_gastado': resumen.total_gastado,
     }
     
     return render(request, 'cliente/detalle_cliente.html', context)
 
 # ========== VISTAS PARA VENTAS ==========
+@solo_lectura
 def ver_ventas(request):
-    ventas = Venta.objects.all().select_related('id_cliente', 'id_empleado').prefetch_related('detalles__producto')
-    return render(request, 'venta/ver_ventas.html', {'ventas': ventas})
+    filtro_form = FiltroVentasForm(request.GET or None)
+    ventas = filtro_form.filtrar(Venta.objects.all()).select_related('id_cliente', 'id_empleado')
+    # Más recientes primero
+    pagina = paginar_keyset(request, ventas, ['-fecha', '-id'])
+    # Los productos de cada fila salen de la caché mientras la venta no cambie;
+    # los detalles se cargan solo para las filas que hay que renderizar
+    filas = fragmentos(
+        pagina.objetos, 'venta/fila_productos.html', nombre='venta',
+        clave=lambda venta: f'{venta.pk}:{venta.modificada.timestamp()}',
+        modelos=(Producto,),
+        preparar=lambda faltantes: prefetch_related_objects(faltantes, 'detalles__producto'),
+    )
+    for venta, fila in zip(pagina.objetos, filas):
+        venta.fila_productos = fila
+    total_pagina = sum(venta.total for venta in pagina.objetos)
+    return render(request, 'venta/ver_ventas.html', {
+        'ventas': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+        'total_pagina': total_pagina,
+        'promedio_pagina': total_pagina / len(pagina.objetos) if pagina.objetos else 0,
+    })
+
+@solo_lectura
+def exportar_ventas(request):
+    """Descarga en streaming las ventas filtradas con sus líneas (CSV o JSON, opcionalmente gzip)"""
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        formato = 'csv'
+    comprimir = request.GET.get('gzip') in ('1', 'true', 'on')
+    ventas, archivadas = historico.ambas(FiltroVentasForm(request.GET or None).filtrar)
+    # El archivo se lee después de que la vista termina: la base se fija ahora
+    ventas, archivadas = ventas.using(ventas.db), archivadas.using(archivadas.db)
+
+    tipo, extension = FORMATOS[formato]
+    nombre = f'ventas_{timezone.localdate():%Y%m%d}.{extension}'
+    if comprimir:
+        tipo, nombre = 'application/gzip', f'{nombre}.gz'
+    response = StreamingHttpResponse(generar_exportacion(ventas, formato, comprimir, archivadas), content_type=tipo)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+def exportar_ventas_segundo_plano(request):
+    """
+    Exportación de ventas en la cola de tareas: GET muestra los filtros que
+    llegan del listado y POST encola la tarea (escribe, así que va a la
+    primaria y con token CSRF). El archivo se descarga desde la página de la tarea.
+    """
+    if request.method == 'POST':
+        form = ExportarVentasForm(request.POST)
+        if form.is_valid():
+            # Los filtros viajan como texto; la tarea los valida con FiltroVentasForm
+            filtros = {campo: request.POST[campo] for campo in FiltroVentasForm.base_fields if request.POST.get(campo)}
+            tarea = tareas.encolar(
+                'exportar_ventas', filtros=filtros, formato=form.cleaned_data['formato'],
+                comprimir=form.cleaned_data['gzip'],
+            )
+            messages.success(request, 'Exportación en cola. Esta página muestra su avance.')
+            return redirect('detalle_tarea', pk=tarea.pk)
+    else:
+        form = ExportarVentasForm(initial=request.GET.dict())
+    return render(request, 'venta/exportar_segundo_plano.html', {'form': form})
 
 def agregar_venta(request):
     if request.method == 'POST':
         venta_form = VentaForm(request.POST)
         if venta_form.is_valid():
+            # Validar que haya al menos un producto
+            if not any(request.POST.getlist('producto')):
+                messages.error(request, 'Debe agregar al menos un producto a la venta.')
+                return render(request, 'venta/agregar_venta.html', {
+                    'venta_form': venta_form,
+                })
+
             try:
-                with transaction.atomic():
-                    venta = venta_form.save(commit=False)
-                    venta.save()
-                    
-                    # Obtener todos los productos del formulario
-                    productos_ids = request.POST.getlist('producto')
-                    cantidades = request.POST.getlist('cantidad')
-                    precios = request.POST.getlist('precio')
-                    
-                    total_venta = 0
-                    detalles_creados = 0
-                    
-                    # Validar que haya al menos un producto
-                    if not any(productos_ids):
-                        messages.error(request, 'Debe agregar al menos un producto a la venta.')
-                        return render(request, 'venta/agregar_venta.html', {
-                            'venta_form': venta_form,
-                            'productos': Producto.objects.all(),
-                        })
-                    
-                    # Procesar todos los productos
-                    for i in range(len(productos_ids)):
-                        if productos_ids[i] and cantidades[i] and precios[i]:
-                            try:
-                                producto = Producto.objects.get(id=productos_ids[i])
-                                cantidad = int(cantidades[i])
-                                precio_unitario = float(precios[i])
-                                
-                                # Validar stock disponible
-                                if cantidad > producto.existencias:
-                                    messages.error(request, f'Stock insuficiente para {producto.nombre}. Stock disponible: {producto.existencias}')
-                                    return redirect('agregar_venta')
-                                
-                                subtotal = cantidad * precio_unitario
-                                total_venta += subtotal
-                                
-                                # Crear detalle de venta
-                                DetalleVenta.objects.create(
-                                    venta=venta,
-                                    producto=producto,
-                                    cantidad=cantidad,
-                                    precio_unitario=precio_unitario,
-                                    subtotal=subtotal
-                                )
-                                
-                                # Actualizar stock del producto
-                                producto.existencias -= cantidad
-                                producto.save()
-                                
-                                detalles_creados += 1
-                                
-                            except (Producto.DoesNotExist, ValueError) as e:
-                                messages.error(request, f'Error con el producto en posición {i+1}: {str(e)}')
-                                return redirect('agregar_venta')
-                    
-                    # Verificar que se hayan creado detalles
-                    if detalles_creados == 0:
-                        messages.error(request, 'Debe agregar al menos un producto válido a la venta.')
-                        venta.delete()  # Eliminar la venta vacía
-                        return redirect('agregar_venta')
-                    
-                    venta.total = total_venta
-                    venta.save()
-                    messages.success(request, f'Venta registrada correctamente con {detalles_creados} producto(s).')
-                    return redirect('ver_ventas')
-                    
+                lineas = leer_lineas(request.POST)
+                registrar_venta(venta_form.save(commit=False), lineas)
+                messages.success(request, f'Venta registrada correctamente con {len(lineas)} producto(s).')
+                return redirect('ver_ventas')
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('agregar_venta')
             except Exception as e:
                 messages.error(request, f'Error al agregar la venta: {str(e)}')
         else:
@@ -199,87 +250,77 @@ def agregar_venta(request):
     else:
         venta_form = VentaForm()
     
-    productos = Producto.objects.filter(existencias__gt=0)  # Solo productos con stock
+    # Los productos se consultan desde el formulario mientras se escribe
     detalle_form = DetalleVentaForm()
     
     return render(request, 'venta/agregar_venta.html', {
         'venta_form': venta_form,
         'detalle_form': detalle_form,
-        'productos': productos,
+    })
+
+# Las cajas no tienen sesión ni token CSRF; exigir Content-Type JSON impide
+# que un formulario de otro sitio la invoque (requeriría un preflight de CORS)
+@csrf_exempt
+def agregar_lote_ventas(request):
+    """
+    Ventas en lote (JSON) de cajas que vendieron sin red. POST con
+    {"ventas": [...]} (ver services.registrar_lote) responde un resultado
+    por venta; GET devuelve el formato y el límite de líneas.
+    """
+    if request.method == 'GET':
+        return JsonResponse({
+            'max_lineas': MAX_LINEAS_POR_LOTE,
+            'venta': {
+                'clave': 'texto único por venta, generado por la caja',
+                'cliente': 'id', 'empleado': 'id', 'fecha': 'ISO 8601 (opcional)',
+                'lineas': [{'producto': 'id', 'cantidad': 'entero', 'precio': 'decimal (opcional)'}],
+            },
+        })
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    if request.content_type != 'application/json':
+        return JsonResponse({'error': 'Se esperaba Content-Type: application/json.'}, status=415)
+    try:
+        datos = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'error': f'JSON inválido: {e}'}, status=400)
+    if not isinstance(datos, dict) or not isinstance(datos.get('ventas'), list):
+        return JsonResponse({'error': 'Se esperaba un objeto con la lista "ventas".'}, status=400)
+
+    try:
+        resultados = registrar_lote(datos['ventas'])
+    except ValidationError as e:
+        estado = {'lote_demasiado_grande': 413, 'conflicto': 409}.get(getattr(e, 'code', None), 400)
+        return JsonResponse({'error': ' '.join(e.messages)}, status=estado)
+    estados = [resultado['estado'] for resultado in resultados]
+    return JsonResponse({
+        'creadas': estados.count('creada'),
+        'duplicadas': estados.count('duplicada'),
+        'rechazadas': estados.count('rechazada'),
+        'resultados': resultados,
     })
 
 def actualizar_venta(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
-    detalles = venta.detalles.all()
+    detalles = venta.detalles.all().select_related('producto')
     
     if request.method == 'POST':
         venta_form = VentaForm(request.POST, instance=venta)
         
         if venta_form.is_valid():
             try:
-                with transaction.atomic():
-                    # Guardar datos básicos de la venta
-                    venta = venta_form.save()
-                    
-                    # Restaurar stock de productos anteriores
-                    for detalle in detalles:
-                        producto = detalle.producto
-                        producto.existencias += detalle.cantidad
-                        producto.save()
-                    
-                    # Eliminar detalles existentes
-                    venta.detalles.all().delete()
-                    
-                    # Procesar nuevos detalles
-                    productos_ids = request.POST.getlist('producto')
-                    cantidades = request.POST.getlist('cantidad')
-                    precios = request.POST.getlist('precio')
-                    
-                    total_venta = 0
-                    detalles_creados = 0
-                    
-                    for i in range(len(productos_ids)):
-                        if productos_ids[i] and cantidades[i] and precios[i]:
-                            producto = Producto.objects.get(id=productos_ids[i])
-                            cantidad = int(cantidades[i])
-                            precio_unitario = float(precios[i])
-                            
-                            # Validar stock disponible
-                            if cantidad > producto.existencias:
-                                messages.error(request, f'Stock insuficiente para {producto.nombre}. Stock disponible: {producto.existencias}')
-                                return redirect('actualizar_venta', pk=pk)
-                            
-                            subtotal = cantidad * precio_unitario
-                            total_venta += subtotal
-                            
-                            DetalleVenta.objects.create(
-                                venta=venta,
-                                producto=producto,
-                                cantidad=cantidad,
-                                precio_unitario=precio_unitario,
-                                subtotal=subtotal
-                            )
-                            
-                            # Actualizar stock del producto
-                            producto.existencias -= cantidad
-                            producto.save()
-                            
-                            detalles_creados += 1
-                    
-                    # Actualizar total de la venta
-                    venta.total = total_venta
-                    venta.save()
-                    
-                    messages.success(request, f'Venta actualizada correctamente con {detalles_creados} producto(s).')
-                    return redirect('ver_ventas')
-                    
+                lineas = leer_lineas(request.POST)
+                editar_venta(venta_form.save(commit=False), lineas)
+                messages.success(request, f'Venta actualizada correctamente con {len(lineas)} producto(s).')
+                return redirect('ver_ventas')
+            except ValidationError as e:
+                messages.error(request, e.messages[0])
+                return redirect('actualizar_venta', pk=pk)
             except Exception as e:
                 messages.error(request, f'Error al actualizar la venta: {str(e)}')
-                productos = Producto.objects.all()
                 return render(request, 'venta/actualizar_venta.html', {
                     'venta_form': venta_form,
                     'detalles': detalles,
-                    'productos': productos,
                     'venta': venta,
                 })
         else:
@@ -288,11 +329,9 @@ def actualizar_venta(request, pk):
     else:
         venta_form = VentaForm(instance=venta)
     
-    productos = Producto.objects.all()
     return render(request, 'venta/actualizar_venta.html', {
         'venta_form': venta_form,
         'detalles': detalles,
-        'productos': productos,
         'venta': venta,
     })
 
@@ -300,32 +339,38 @@ def borrar_venta(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
     if request.method == 'POST':
         try:
-            with transaction.atomic():
-                # Restaurar stock de productos
-                for detalle in venta.detalles.all():
-                    producto = detalle.producto
-                    producto.existencias += detalle.cantidad
-                    producto.save()
-                
-                venta.delete()
-                messages.success(request, 'Venta eliminada correctamente.')
+            # Devuelve el stock de sus productos al inventario
+            eliminar_venta(venta)
+            messages.success(request, 'Venta eliminada correctamente.')
         except Exception as e:
             messages.error(request, f'Error al eliminar la venta: {str(e)}')
         return redirect('ver_ventas')
     return render(request, 'venta/borrar_venta.html', {'venta': venta})
 
+@solo_lectura
 def detalle_venta(request, pk):
-    venta = get_object_or_404(Venta, pk=pk)
-    detalles = venta.detalles.all().select_related('producto')
+    try:
+        venta = historico.obtener_venta(pk)
+    except Venta.DoesNotExist:
+        raise Http404('No existe la venta.')
+    detalles = venta.detalles.all().select_related('producto__proveedor')
     return render(request, 'venta/detalle_venta.html', {
         'venta': venta,
         'detalles': detalles
     })
 
 # ========== VISTAS PARA PROVEEDORES ==========
+@solo_lectura
+@cache_por_version(Proveedor)
 def ver_proveedores(request):
-    proveedores = Proveedor.objects.all()
-    return render(request, 'proveedor/ver_proveedores.html', {'proveedores': proveedores})
+    filtro_form = FiltroProveedoresForm(request.GET or None)
+    proveedores = filtro_form.filtrar(Proveedor.objects.all())
+    pagina = paginar_keyset(request, proveedores, ['empresa', 'id'])
+    return render(request, 'proveedor/ver_proveedores.html', {
+        'proveedores': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
 
 def agregar_proveedor(request):
     if request.method == 'POST':
@@ -359,9 +404,19 @@ def borrar_proveedor(request, pk):
     return render(request, 'proveedor/borrar_proveedor.html', {'proveedor': proveedor})
 
 # ========== VISTAS PARA PRODUCTOS ==========
+# Depende también de los movimientos de inventario (las ventas cambian las
+# existencias sin guardar el producto) y de la empresa de cada proveedor
+@solo_lectura
+@cache_por_version(Producto, Proveedor, MovimientoInventario)
 def ver_productos(request):
-    productos = Producto.objects.all().select_related('proveedor')
-    return render(request, 'producto/ver_productos.html', {'productos': productos})
+    filtro_form = FiltroProductosForm(request.GET or None)
+    productos = filtro_form.filtrar(Producto.objects.all()).select_related('proveedor')
+    pagina = paginar_keyset(request, productos, ['nombre', 'id'])
+    return render(request, 'producto/ver_productos.html', {
+        'productos': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
 
 def agregar_producto(request):
     if request.method == 'POST':
@@ -392,4 +447,203 @@ def borrar_producto(request, pk):
         producto.delete()
         messages.success(request, 'Producto eliminado correctamente.')
         return redirect('ver_productos')
-    return render(request, 'producto/borrar_producto.html', {'producto': producto})
\ No newline at end of file
+    return render(request, 'producto/borrar_producto.html', {'producto': producto})
+
+def importar_catalogo(request):
+    """Carga masiva de productos o proveedores desde un CSV, procesada en la cola de tareas"""
+    if request.method == 'POST':
+        form = ImportarCatalogoForm(request.POST, request.FILES)
+        if form.is_valid():
+            # El archivo se guarda para que el trabajador lo lea por lotes fuera de la petición
+            archivo = form.cleaned_data['archivo']
+            ruta = default_storage.save(f'importaciones/{archivo.name}', archivo)
+            tarea = tareas.encolar('importar_catalogo', tipo=form.cleaned_data['tipo'], archivo=ruta)
+            messages.success(request, 'Importación en cola. Esta página muestra su avance.')
+            return redirect('detalle_tarea', pk=tarea.pk)
+    else:
+        form = ImportarCatalogoForm()
+    return render(request, 'producto/importar_catalogo.html', {'form': form})
+
+def reajustar_precios(request):
+    """Ajuste masivo de precios por categoría, proveedor o lista de productos (un solo UPDATE)"""
+    if request.method == 'POST':
+        form = ReajustePreciosForm(request.POST)
+        if form.is_valid():
+            datos = form.cleaned_data
+            try:
+                cambiados = precios.reajustar(
+                    precios.seleccionar(datos['categoria'], datos['proveedor'], datos['productos']),
+                    porcentaje=datos['porcentaje'] or 0, monto=datos['monto'] or 0, redondeo=datos['redondeo'],
+                )
+            except ValidationError as e:
+                messages.error(request, ' '.join(e.messages))
+            else:
+                messages.success(request, f'Precio actualizado en {cambiados} productos.')
+                return redirect('ver_productos')
+    else:
+        form = ReajustePreciosForm()
+    return render(request, 'producto/reajustar_precios.html', {'form': form})
+
+# ========== BÚSQUEDA ==========
+def _limite(request):
+    try:
+        return int(request.GET.get('limite', busqueda.LIMITE_POR_DEFECTO))
+    except ValueError:
+        return busqueda.LIMITE_POR_DEFECTO
+
+@solo_lectura
+def buscar_productos(request):
+    """Búsqueda por prefijo y sin acentos de productos, ordenada por relevancia (JSON)"""
+    productos = busqueda.buscar(Producto, request.GET.get('q', ''), _limite(request))
+    return JsonResponse({'resultados': [
+        {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'categoria': producto.categoria,
+            'precio': str(producto.precio),
+            'existencias': producto.existencias,
+            'proveedor': producto.proveedor.empresa,
+        }
+        for producto in productos
+    ]})
+
+@solo_lectura
+def buscar_proveedores(request):
+    """Búsqueda por prefijo y sin acentos de proveedores, ordenada por relevancia (JSON)"""
+    proveedores = busqueda.buscar(Proveedor, request.GET.get('q', ''), _limite(request))
+    return JsonResponse({'resultados': [
+        {
+            'id': proveedor.id,
+            'empresa': proveedor.empresa,
+            'contacto': proveedor.contacto,
+            'categoria': proveedor.categoria,
+        }
+        for proveedor in proveedores
+    ]})
+
+@solo_lectura
+def consultar_productos(request):
+    """
+    Consulta paginada de productos (id, nombre, precio, stock) para los
+    formularios de venta. Responde con ETag para que el navegador reutilice
+    su copia (304) mientras los datos no cambien.
+    """
+    productos = Producto.objects.only('id', 'nombre', 'precio', 'existencias')
+    texto = request.GET.get('q', '').strip()
+    if texto:
+        productos = busqueda.filtrar(productos, texto)
+    if request.GET.get('con_stock'):
+        productos = productos.filter(existencias__gt=0)
+    pagina = paginar_keyset(request, productos, ['nombre', 'id'], defecto=20)
+
+    response = JsonResponse({
+        'resultados': [
+            {
+                'id': producto.id,
+                'nombre': producto.nombre,
+                'precio': str(producto.precio),
+                'existencias': producto.existencias,
+            }
+            for producto in pagina
+        ],
+        'siguiente': pagina.url_siguiente,
+        'anterior': pagina.url_anterior,
+    })
+    patch_cache_control(response, private=True, max_age=30)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response.headers['ETag'], response=response)
+
+# ========== REPORTES ==========
+@solo_lectura
+def reporte_categorias(request):
+    """Ventas por categoría de los últimos N días, leídas de los acumulados diarios"""
+    try:
+        dias = max(1, min(int(request.GET.get('dias', 90)), 3660))
+    except ValueError:
+        dias = 90
+    desde = timezone.localdate() - timedelta(days=dias - 1)
+    categorias = list(
+        VentaDiariaCategoria.objects.filter(fecha__gte=desde)
+        .values('categoria')
+        .annotate(cantidad=Sum('cantidad'), importe=Sum('importe'))
+        .order_by('-importe')
+    )
+    return render(request, 'reporte/ventas_por_categoria.html', {
+        'categorias': categorias,
+        'dias': dias,
+        'desde': desde,
+        'total_importe': sum(fila['importe'] for fila in categorias),
+        'total_cantidad': sum(fila['cantidad'] for fila in categorias),
+    })
+
+def _proveedor_elegido(datos):
+    try:
+        return int(datos.get('proveedor') or 0) or None
+    except ValueError:
+        return None
+
+@solo_lectura
+def compras_sugeridas(request):
+    """
+    Productos en su punto de reorden agrupados por proveedor: el resumen de
+    todos los proveedores y las líneas del elegido. Las listas se guardan
+    como borrador con guardar_compras_sugeridas.
+    """
+    proveedor = _proveedor_elegido(request.GET)
+    listas = reabasto.por_proveedor(reabasto.sugerencias().iterator())
+    elegida = next((lista for lista in listas if lista['proveedor'] == proveedor), listas[0] if listas else None)
+    return render(request, 'reporte/compras_sugeridas.html', {
+        'listas': listas,
+        'elegida': elegida,
+        'config': reabasto.configuracion(),
+        'total_productos': sum(len(lista['lineas']) for lista in listas),
+    })
+
+def guardar_compras_sugeridas(request):
+    """
+    Guarda como órdenes de compra en borrador las compras sugeridas de un
+    proveedor o de todos. GET pide confirmación y POST escribe (en la primaria).
+    """
+    proveedor = _proveedor_elegido(request.POST if request.method == 'POST' else request.GET)
+    if request.method == 'POST':
+        ordenes = reabasto.guardar_borradores(proveedor)
+        messages.success(request, f'{len(ordenes)} órdenes de compra guardadas como borrador.')
+        url = reverse('compras_sugeridas')
+        return redirect(f'{url}?proveedor={proveedor}' if proveedor else url)
+    return render(request, 'reporte/guardar_compras_sugeridas.html', {
+        'proveedor': Proveedor.objects.filter(pk=proveedor).first() if proveedor else None,
+    })
+
+def estadisticas_cache(request):
+    """Aciertos y fallos de la caché de páginas en este proceso (JSON)"""
+    response = JsonResponse(estadisticas_de_cache.resumen())
+    patch_cache_control(response, no_store=True)
+    return response
+
+# ========== TAREAS EN SEGUNDO PLANO ==========
+def ver_tareas(request):
+    """Tareas de la cola, las más recientes primero"""
+    filtro_form = FiltroTareasForm(request.GET or None)
+    lista = filtro_form.filtrar(Tarea.objects.defer('argumentos', 'resultado', 'error'))
+    pagina = paginar_keyset(request, lista, ['-id'])
+    return render(request, 'tarea/ver_tareas.html', {
+        'tareas': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
+
+def detalle_tarea(request, pk):
+    """Estado, avance y resultado de una tarea; con ?formato=json para consultarlo desde la página"""
+    tarea = get_object_or_404(Tarea, pk=pk)
+    if request.GET.get('formato') == 'json':
+        response = JsonResponse({
+            'id': tarea.id,
+            'estado': tarea.estado,
+            'progreso': tarea.progreso,
+            'mensaje': tarea.mensaje,
+            'intentos': tarea.intentos,
+            'activa': tarea.activa,
+        })
+        patch_cache_control(response, no_store=True)
+        return response
+    return render(request, 'tarea/detalle_tarea.html', {'tarea': tarea})
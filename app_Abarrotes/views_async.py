@@ -0,0 +1,233 @@
+"""
+Versiones asíncronas de las vistas de solo lectura, para el despliegue en
+ASGI (ver settings.VISTAS_ASYNC y urls.py). Usan el ORM asíncrono y le dan
+a la plantilla los datos ya cargados: el render corre en el bucle de
+eventos y ahí no se puede consultar la base.
+
+Django todavía ejecuta cada consulta en un hilo (SQLite no tiene driver
+asíncrono); lo que se gana es que una petición no ocupa un hilo mientras
+espera a la base o a un cliente lento, y un worker atiende muchas a la vez.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import aprefetch_related_objects
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+
+from . import busqueda, historico
+from .cache_vistas import afragmentos, cache_por_version
+from .forms import (
+    FiltroClientesForm, FiltroEmpleadosForm, FiltroProductosForm, FiltroProveedoresForm, FiltroTareasForm,
+    FiltroVentasForm,
+)
+from .models import Cliente, Empleado, MovimientoInventario, Producto, Proveedor, Tarea, Venta
+from .paginacion import apaginar_keyset
+from .replicas import solo_lectura
+from .views import _limite
+
+
+# ========== VISTAS PARA EMPLEADOS ==========
+@solo_lectura
+@cache_por_version(Empleado)
+async def ver_empleados(request):
+    filtro_form = FiltroEmpleadosForm(request.GET or None)
+    empleados = await filtro_form.afiltrar(Empleado.objects.all())
+    pagina = await apaginar_keyset(request, empleados, ['apellido', 'nombre', 'id'])
+    return render(request, 'empleado/ver_empleados.html', {
+        'empleados': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
+
+
+# ========== VISTAS PARA CLIENTES ==========
+@solo_lectura
+async def ver_clientes(request):
+    filtro_form = FiltroClientesForm(request.GET or None)
+    clientes = (await filtro_form.afiltrar(Cliente.objects.all())).select_related('id_empleado', 'resumen')
+    pagina = await apaginar_keyset(request, clientes, ['nombre', 'id'])
+
+    # El resumen vino con select_related: obtener_resumen() no consulta
+    for cliente in pagina:
+        resumen = cliente.obtener_resumen()
+        cliente.productos_comprados_info = resumen.productos_str()
+        cliente.total_compras = resumen.num_compras
+
+    return render(request, 'cliente/ver_clientes.html', {
+        'clientes': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
+
+
+@solo_lectura
+async def detalle_cliente(request, pk):
+    """Detalle de un cliente y sus productos comprados"""
+    cliente = await aget_object_or_404(
+        Cliente.objects.select_related('id_empleado', 'resumen__ultimo_producto'), pk=pk,
+    )
+    resumen = cliente.obtener_resumen()
+    ventas = await historico.aventas_de_cliente(cliente)
+
+    productos_comprados = [
+        {
+            'producto': detalle.producto,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': detalle.precio_unitario,
+            'subtotal': detalle.subtotal,
+            'fecha_venta': venta.fecha,
+        }
+        for venta in ventas
+        for detalle in venta.detalles.all()
+    ]
+
+    return render(request, 'cliente/detalle_cliente.html', {
+        'cliente': cliente,
+        'ventas': ventas,
+        'productos_comprados': productos_comprados,
+        'resumen': resumen,
+        'total_ventas': resumen.num_compras,
+        'total_gastado': resumen.total_gastado,
+    })
+
+
+# ========== VISTAS PARA VENTAS ==========
+@solo_lectura
+async def ver_ventas(request):
+    filtro_form = FiltroVentasForm(request.GET or None)
+    ventas = (await filtro_form.afiltrar(Venta.objects.all())).select_related('id_cliente', 'id_empleado')
+    pagina = await apaginar_keyset(request, ventas, ['-fecha', '-id'])
+    filas = await afragmentos(
+        pagina.objetos, 'venta/fila_productos.html', nombre='venta',
+        clave=lambda venta: f'{venta.pk}:{venta.modificada.timestamp()}',
+        modelos=(Producto,),
+        preparar=lambda faltantes: aprefetch_related_objects(faltantes, 'detalles__producto'),
+    )
+    for venta, fila in zip(pagina.objetos, filas):
+        venta.fila_productos = fila
+    total_pagina = sum(venta.total for venta in pagina.objetos)
+    return render(request, 'venta/ver_ventas.html', {
+        'ventas': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+        'total_pagina': total_pagina,
+        'promedio_pagina': total_pagina / len(pagina.objetos) if pagina.objetos else 0,
+    })
+
+
+@solo_lectura
+async def detalle_venta(request, pk):
+    try:
+        venta = await historico.aobtener_venta(pk)
+    except Venta.DoesNotExist:
+        raise Http404('No existe la venta.')
+    detalles = [detalle async for detalle in venta.detalles.all().select_related('producto__proveedor')]
+    return render(request, 'venta/detalle_venta.html', {
+        'venta': venta,
+        'detalles': detalles,
+    })
+
+
+# ========== VISTAS PARA PROVEEDORES ==========
+@solo_lectura
+@cache_por_version(Proveedor)
+async def ver_proveedores(request):
+    filtro_form = FiltroProveedoresForm(request.GET or None)
+    proveedores = await filtro_form.afiltrar(Proveedor.objects.all())
+    pagina = await apaginar_keyset(request, proveedores, ['empresa', 'id'])
+    return render(request, 'proveedor/ver_proveedores.html', {
+        'proveedores': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
+
+
+# ========== VISTAS PARA PRODUCTOS ==========
+@solo_lectura
+@cache_por_version(Producto, Proveedor, MovimientoInventario)
+async def ver_productos(request):
+    filtro_form = FiltroProductosForm(request.GET or None)
+    productos = (await filtro_form.afiltrar(Producto.objects.all())).select_related('proveedor')
+    pagina = await apaginar_keyset(request, productos, ['nombre', 'id'])
+    return render(request, 'producto/ver_productos.html', {
+        'productos': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
+
+
+# ========== BÚSQUEDA ==========
+# La búsqueda usa SQL directo sobre el índice FTS, sin equivalente asíncrono:
+# se ejecuta completa en el hilo de la petición
+@solo_lectura
+async def buscar_productos(request):
+    """Búsqueda por prefijo y sin acentos de productos, ordenada por relevancia (JSON)"""
+    productos = await sync_to_async(busqueda.buscar)(Producto, request.GET.get('q', ''), _limite(request))
+    return JsonResponse({'resultados': [
+        {
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'categoria': producto.categoria,
+            'precio': str(producto.precio),
+            'existencias': producto.existencias,
+            'proveedor': producto.proveedor.empresa,
+        }
+        for producto in productos
+    ]})
+
+
+@solo_lectura
+async def buscar_proveedores(request):
+    """Búsqueda por prefijo y sin acentos de proveedores, ordenada por relevancia (JSON)"""
+    proveedores = await sync_to_async(busqueda.buscar)(Proveedor, request.GET.get('q', ''), _limite(request))
+    return JsonResponse({'resultados': [
+        {
+            'id': proveedor.id,
+            'empresa': proveedor.empresa,
+            'contacto': proveedor.contacto,
+            'categoria': proveedor.categoria,
+        }
+        for proveedor in proveedores
+    ]})
+
+
+@solo_lectura
+async def consultar_productos(request):
+    """Consulta paginada de productos para los formularios de venta, con ETag"""
+    productos = Producto.objects.only('id', 'nombre', 'precio', 'existencias')
+    texto = request.GET.get('q', '').strip()
+    if texto:
+        productos = busqueda.filtrar(productos, texto)
+    if request.GET.get('con_stock'):
+        productos = productos.filter(existencias__gt=0)
+    pagina = await apaginar_keyset(request, productos, ['nombre', 'id'], defecto=20)
+
+    response = JsonResponse({
+        'resultados': [
+            {
+                'id': producto.id,
+                'nombre': producto.nombre,
+                'precio': str(producto.precio),
+                'existencias': producto.existencias,
+            }
+            for producto in pagina
+        ],
+        'siguiente': pagina.url_siguiente,
+        'anterior': pagina.url_anterior,
+    })
+    patch_cache_control(response, private=True, max_age=30)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response.headers['ETag'], response=response)
+
+
+# ========== TAREAS EN SEGUNDO PLANO ==========
+async def ver_tareas(request):
+    """Tareas de la cola, las más recientes primero"""
+    filtro_form = FiltroTareasForm(request.GET or None)
+    lista = await filtro_form.afiltrar(Tarea.objects.defer('argumentos', 'resultado', 'error'))
+    pagina = await apaginar_keyset(request, lista, ['-id'])
+    return render(request, 'tarea/ver_tareas.html', {
+        'tareas': pagina.objetos,
+        'pagina': pagina,
+        'filtro_form': filtro_form,
+    })
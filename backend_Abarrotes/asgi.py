@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_Abarrotes.settings')
+# Bajo ASGI las vistas de solo lectura son las asíncronas (views_async.py)
+os.environ.setdefault('ABARROTES_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
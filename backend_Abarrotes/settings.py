@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa (consultas, render y tiempo total)
+    'app_Abarrotes.instrumentacion.InstrumentacionMiddleware',
+    # Antes de las sesiones: guardar la sesión también fija al cliente a la primaria
+    'app_Abarrotes.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,7 +59,8 @@ ROOT_URLCONF = 'backend_Abarrotes.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render por petición
+        'BACKEND': 'app_Abarrotes.instrumentacion.DjangoTemplatesMedidos',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,15 +76,79 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend_Abarrotes.wsgi.application'
 
+# Vistas de solo lectura asíncronas (app_Abarrotes/views_async.py). asgi.py
+# las activa; bajo WSGI cada vista asíncrona necesitaría su propio bucle de
+# eventos por petición, así que ahí se usan las síncronas.
+VISTAS_ASYNC = os.environ.get('ABARROTES_VISTAS_ASYNC') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLite preparado para varios workers (p. ej. gunicorn -w 4):
+# - WAL: los lectores no bloquean al escritor ni al revés.
+# - timeout: espera hasta 20 s por el candado de escritura antes de fallar
+#   con "database is locked" (busy timeout).
+# - IMMEDIATE: cada transacción toma el candado de escritura al empezar; con
+#   DEFERRED dos transacciones que leen y luego escriben se bloquean entre sí
+#   al intentar subir de candado y una falla sin esperar.
+# - synchronous=NORMAL es seguro con WAL (solo se pierde la última
+#   transacción si se cae el sistema operativo, no la aplicación).
+# - cache_size negativo está en KiB: 64 MiB de caché de páginas por conexión.
+# Las conexiones se reutilizan entre peticiones del mismo worker durante
+# CONN_MAX_AGE segundos (ABARROTES_CONN_MAX_AGE=0 para abrir una por petición).
+# Bajo ASGI el valor por defecto es 0: cada petición consulta desde un hilo
+# distinto y las conexiones persistentes quedarían abiertas en cada uno.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': int(os.environ.get('ABARROTES_CONN_MAX_AGE', 0 if VISTAS_ASYNC else 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-65536;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        # Las pruebas usan un archivo y no la base en memoria: la memoria
+        # compartida entre hilos no se comporta como WAL y las pruebas de
+        # concurrencia necesitan varias conexiones reales
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # Réplica de lectura (ver app_Abarrotes/replicas.py). Con SQLite es una
+    # copia local de la primaria que refresca `python manage.py
+    # refrescar_replica --cada 5`; no se migra, recibe el esquema con los datos.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('ABARROTES_REPLICA_DB', BASE_DIR / 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('ABARROTES_CONN_MAX_AGE', 0 if VISTAS_ASYNC else 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': 'PRAGMA journal_mode=WAL;PRAGMA cache_size=-65536;PRAGMA temp_store=MEMORY;',
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db_replica.sqlite3',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['app_Abarrotes.replicas.RouterReplica']
+
+# Listados, reportes, exportaciones y listados del admin se leen de la réplica
+# con ABARROTES_REPLICA=1. Quien escribe lee de la primaria durante
+# FIJAR_SEGUNDOS, que debe cubrir el intervalo entre refrescos.
+REPLICA = {
+    'ACTIVA': os.environ.get('ABARROTES_REPLICA') == '1',
+    'ALIAS': 'replica',
+    'FIJAR_SEGUNDOS': 10,
 }
 
 
@@ -123,4 +193,77 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media' # Esto creará una carpeta 'media' en la raíz de tu proyecto
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media' # Esto creará una carpeta 'media' en la raíz de tu proyecto
+
+# Presupuestos de consultas por vista (ver app_Abarrotes/instrumentacion.py).
+# Exceder uno registra una advertencia en el logger 'app_Abarrotes.consultas'.
+INSTRUMENTACION_CONSULTAS = {
+    'PRESUPUESTO_POR_DEFECTO': 20,
+    'PRESUPUESTOS': {
+        'ver_empleados': 5,
+        'ver_clientes': 5,
+        'detalle_cliente': 6,
+        'ver_ventas': 6,
+        'detalle_venta': 5,
+        'ver_proveedores': 5,
+        'ver_productos': 5,
+        'consultar_productos': 3,
+        'reporte_categorias': 3,
+        'compras_sugeridas': 3,
+        # El POST guarda los borradores: lectura, borrado e inserciones (6 consultas)
+        'guardar_compras_sugeridas': 8,
+    },
+    'MAX_REPETICIONES': 5,
+    'ESTRICTO': False,
+}
+
+# Caché de páginas de catálogo por versión de modelo (ver app_Abarrotes/cache_vistas.py).
+# En memoria del proceso por defecto; con varios workers las versiones deben
+# ser compartidas: ABARROTES_CACHE_DIR=/ruta usa una caché en archivos.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'respuestas': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['ABARROTES_CACHE_DIR'],
+    } if os.environ.get('ABARROTES_CACHE_DIR') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'respuestas',
+    },
+}
+
+CACHE_RESPUESTAS = {
+    'ACTIVO': True,
+    'ALIAS': 'respuestas',
+    'TIMEOUT': 300,
+}
+
+# Cola de tareas en segundo plano (ver app_Abarrotes/tareas.py). Las tareas
+# se guardan en la base y las ejecuta `python manage.py runworker`; sin
+# trabajador quedan pendientes. ABARROTES_TAREAS_INMEDIATAS=1 las ejecuta en
+# el mismo proceso al terminar la petición (desarrollo).
+TAREAS = {
+    'INMEDIATO': os.environ.get('ABARROTES_TAREAS_INMEDIATAS') == '1',
+    'HILOS': 4,
+    'MAX_INTENTOS': 3,
+    'RETRASO_REINTENTO': 30,
+    'CONSERVAR_DIAS': 7,
+}
+
+# Archivo de ventas históricas (ver app_Abarrotes/historico.py). Las ventas
+# sin cambios desde hace EDAD_DIAS se mueven a las tablas de archivo con
+# `python manage.py archivar_ventas`.
+ARCHIVO_VENTAS = {
+    'EDAD_DIAS': 365,
+    'LOTE': 1000,
+}
+
+# Puntos de reorden y compras sugeridas (ver app_Abarrotes/reabasto.py).
+# VENTANAS: días de cada ventana de venta -> peso en la velocidad diaria.
+REABASTO = {
+    'VENTANAS': {7: 0.5, 28: 0.3, 91: 0.2},
+    'DIAS_ENTREGA': 7,
+    'DIAS_SEGURIDAD': 3,
+    'DIAS_COBERTURA': 14,
+}